@@ -1,12 +1,84 @@
+import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterator, List, Dict, Any, Optional
+
 import requests
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
 
 from config import (
     RAKUTEN_AI_BASE_URL,
     RAKUTEN_AI_GATEWAY_KEY,
     RAKUTEN_AI_MODEL,
+    GATEWAY_POOL_SIZE,
+    GATEWAY_MAX_RETRIES,
+    GATEWAY_BACKOFF_BASE_SEC,
+    GATEWAY_BACKOFF_MAX_SEC,
+    GATEWAY_BREAKER_THRESHOLD,
+    GATEWAY_BREAKER_COOLDOWN_SEC,
+    GATEWAY_TIMEOUT_SEC,
 )
+from services.metrics import counter, span
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+GATEWAY_RESPONSES = counter("xmlchat_gateway_responses_total", "Gateway attempts by HTTP status or error class", ("status",))
+GATEWAY_TOKENS = counter("xmlchat_gateway_tokens_total", "Token usage reported by the gateway", ("kind",))
+GATEWAY_FALLBACKS = counter("xmlchat_gateway_fallbacks_total", "Grounded answers replaced by the general fallback", ("mode",))
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without touching the network while the gateway circuit is open."""
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures; lets one probe through after ``cooldown_sec``."""
+
+    def __init__(self, threshold: int, cooldown_sec: float) -> None:
+        self.threshold = threshold
+        self.cooldown_sec = cooldown_sec
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown_sec:
+                raise CircuitOpenError("Rakuten AI gateway circuit is open; skipping call")
+            self._probing = True  # half-open: this caller is the probe
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+def _retry_after_sec(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
 
 class RakutenAIClient:
@@ -15,25 +87,96 @@ class RakutenAIClient:
         base_url: Optional[str] = None,
         api_key: Optional[str] = None,
         model: Optional[str] = None,
-        timeout_sec: float = 30.0,
+        timeout_sec: float = GATEWAY_TIMEOUT_SEC,
+        pool_size: int = GATEWAY_POOL_SIZE,
+        max_retries: int = GATEWAY_MAX_RETRIES,
+        backoff_base_sec: float = GATEWAY_BACKOFF_BASE_SEC,
+        backoff_max_sec: float = GATEWAY_BACKOFF_MAX_SEC,
     ) -> None:
         self.base_url = (base_url or os.getenv("RAKUTEN_AI_BASE_URL") or RAKUTEN_AI_BASE_URL).rstrip("/")
         self.api_key = os.getenv("RAKUTEN_AI_GATEWAY_KEY") or api_key or RAKUTEN_AI_GATEWAY_KEY
         self.model = os.getenv("RAKUTEN_AI_MODEL") or model or RAKUTEN_AI_MODEL
         self.timeout_sec = timeout_sec
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.breaker = CircuitBreaker(GATEWAY_BREAKER_THRESHOLD, GATEWAY_BREAKER_COOLDOWN_SEC)
 
         # Endpoint designed to be OpenAI-compatible
         self.chat_completions_url = f"{self.base_url}/chat/completions"
 
-    def chat(self, messages: List[Dict[str, Any]], temperature: float = 0.2, max_tokens: int = 512) -> str:
-        headers = {
+        # Keep-alive connection pool shared by all threads of this worker; retries are handled in _post
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
             # Azure API Management often uses 'Ocp-Apim-Subscription-Key' or 'api-key'. We'll include both plus Authorization for compatibility.
             "api-key": self.api_key,
             "Ocp-Apim-Subscription-Key": self.api_key,
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
-        }
+        })
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="gateway")
 
+    def _backoff_sec(self, attempt: int, resp: Optional[requests.Response]) -> float:
+        retry_after = _retry_after_sec(resp) if resp is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max_sec)
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max_sec, self.backoff_base_sec * (2 ** attempt)))
+
+    def _post(self, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """POST with jittered exponential retries on 429/5xx and connection errors, behind the breaker.
+
+        With ``stream`` only the status line and headers are awaited, so retries never
+        replay a response that has already started streaming.
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            GATEWAY_RESPONSES.inc(status="circuit_open")
+            raise
+        attempt = 0
+        # Every exit records exactly one outcome, so a probe that fails in an unexpected
+        # way still releases the half-open breaker
+        ok = False
+        try:
+            while True:
+                resp: Optional[requests.Response] = None
+                try:
+                    resp = self.session.post(self.chat_completions_url, json=payload, timeout=self.timeout_sec, stream=stream)
+                    GATEWAY_RESPONSES.inc(status=str(resp.status_code))
+                    if resp.status_code not in RETRY_STATUSES:
+                        resp.raise_for_status()
+                        ok = True
+                        return resp
+                    error: requests.exceptions.RequestException = requests.exceptions.HTTPError(
+                        f"{resp.status_code} from gateway", response=resp
+                    )
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    GATEWAY_RESPONSES.inc(status=type(e).__name__)
+                    error = e
+                except requests.exceptions.HTTPError:
+                    # Non-retryable 4xx: the gateway is up, the request is wrong
+                    ok = True
+                    if stream and resp is not None:
+                        resp.close()
+                    raise
+                except requests.exceptions.RequestException as e:
+                    GATEWAY_RESPONSES.inc(status=type(e).__name__)
+                    raise
+                if resp is not None:
+                    # Hand the pooled connection back before backing off; a streamed body is never read
+                    resp.close()
+                if attempt >= self.max_retries:
+                    raise error
+                time.sleep(self._backoff_sec(attempt, resp))
+                attempt += 1
+        finally:
+            self.breaker.record(ok)
+
+    def chat(self, messages: List[Dict[str, Any]], temperature: float = 0.2, max_tokens: int = 512) -> str:
         payload = {
             "model": self.model,
             "messages": messages,
@@ -41,9 +184,15 @@ class RakutenAIClient:
             "max_tokens": max_tokens,
         }
 
-        resp = requests.post(self.chat_completions_url, json=payload, headers=headers, timeout=self.timeout_sec)
-        resp.raise_for_status()
-        data = resp.json()
+        with span("gateway.request"):
+            resp = self._post(payload)
+        with span("gateway.parse"):
+            data = resp.json()
+        usage = data.get("usage") if isinstance(data, dict) else None
+        if isinstance(usage, dict):
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if isinstance(usage.get(kind), int):
+                    GATEWAY_TOKENS.inc(usage[kind], kind=kind[:-len("_tokens")])
 
         # OpenAI-compatible response structure
         try:
@@ -52,4 +201,123 @@ class RakutenAIClient:
             # Fallback: return entire json string for debugging
             return str(data)
 
+    def chat_stream(self, messages: List[Dict[str, Any]], temperature: float = 0.2, max_tokens: int = 512) -> Iterator[str]:
+        """Yield content deltas from an OpenAI-compatible ``stream=True`` (SSE) completion.
+
+        Closing the generator early closes the HTTP connection, which stops the upstream generation.
+        """
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+        resp = self._post(payload, stream=True)
+        resp.encoding = "utf-8"  # SSE is always UTF-8; without a charset requests would assume ISO-8859-1
+        drained = False
+        try:
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    # Keep reading to the end of the body so the connection can go back to the pool
+                    continue
+                try:
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                except (ValueError, KeyError, IndexError):
+                    continue
+                if delta:
+                    yield delta
+            drained = True
+        finally:
+            if not drained:
+                resp.close()
+
+    def chat_stream_with_fallback(
+        self,
+        messages: List[Dict[str, Any]],
+        fallback_messages: List[Dict[str, Any]],
+        fallback_prefix: str,
+        temperature: float = 0.2,
+        fallback_temperature: float = 0.3,
+        max_tokens: int = 512,
+    ) -> Iterator[str]:
+        """Stream the grounded answer, switching to the fallback stream if it opens with ``fallback_prefix``.
 
+        Only the first ``len(fallback_prefix)`` characters are held back to make that
+        decision; everything after is relayed as it arrives.
+        """
+        prefix = fallback_prefix.lower()
+        held = ""
+        deltas = self.chat_stream(messages, temperature=temperature, max_tokens=max_tokens)
+        for delta in deltas:
+            if held is None:
+                yield delta
+                continue
+            held += delta
+            probe = held.lstrip().lower()
+            if probe.startswith(prefix):
+                deltas.close()
+                GATEWAY_FALLBACKS.inc(mode="stream")
+                yield from self.chat_stream(fallback_messages, temperature=fallback_temperature, max_tokens=max_tokens)
+                return
+            if len(probe) >= len(prefix) or not prefix.startswith(probe):
+                yield held
+                held = None
+        if held:
+            yield held
+
+    def chat_with_fallback(
+        self,
+        messages: List[Dict[str, Any]],
+        fallback_messages: List[Dict[str, Any]],
+        needs_fallback: Callable[[str], bool],
+        temperature: float = 0.2,
+        fallback_temperature: float = 0.3,
+        max_tokens: int = 512,
+        speculative: bool = False,
+        fallback_slot: Optional[Callable[[], Optional[Callable[[], None]]]] = None,
+    ) -> str:
+        """Grounded answer, or the fallback answer when ``needs_fallback`` rejects it.
+
+        With ``speculative`` both calls are issued in parallel, so a rejected grounded
+        answer costs one round trip instead of two. ``fallback_slot`` takes an upstream
+        slot for the parallel fallback and returns its release, or None when none is
+        free, in which case the calls run one after the other. If the grounded answer
+        is kept, a fallback that has not started is cancelled; one already sent runs to
+        completion in its slot and its answer is dropped.
+        """
+        release = None
+        if speculative and fallback_slot is not None:
+            release = fallback_slot()
+            speculative = release is not None
+        if not speculative:
+            answer = self.chat(messages, temperature=temperature, max_tokens=max_tokens)
+            if needs_fallback(answer):
+                GATEWAY_FALLBACKS.inc(mode="serial")
+                answer = self.chat(fallback_messages, temperature=fallback_temperature, max_tokens=max_tokens)
+            return answer
+
+        def run_fallback() -> str:
+            try:
+                return self.chat(fallback_messages, fallback_temperature, max_tokens)
+            finally:
+                if release is not None:
+                    release()
+
+        primary = self._executor.submit(self.chat, messages, temperature, max_tokens)
+        fallback = self._executor.submit(run_fallback)
+        try:
+            answer = primary.result()
+        except BaseException:
+            if fallback.cancel() and release is not None:
+                release()
+            raise
+        if not needs_fallback(answer):
+            if fallback.cancel() and release is not None:
+                release()
+            return answer
+        GATEWAY_FALLBACKS.inc(mode="speculative")
+        return fallback.result()
@@ -1,22 +1,210 @@
-from flask import Flask, render_template, request, jsonify
-from typing import List, Dict
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import os
+import tempfile
+import time
+import uuid
 
 from config import HOST, PORT, DEBUG
 from api_client import RakutenAIClient
 from rag.indexer import RAGIndexer
-from rag.retriever import Retriever
-from services.prompt_builder import build_messages, build_general_messages, SYSTEM_PROMPT
-from config import PRE_XML_FILE_PATH, POST_XML_FILE_PATH, MAX_FULL_CONTEXT_CHARS, MAX_TOKENS_PER_SNIPPET, MAX_SNIPPETS
+from rag.retriever import RetrievedContext
+from rag.watcher import IndexWatcher
+from services.prompt_builder import build_messages, build_general_messages, SYSTEM_PROMPT, PROMPT_VERSION
+from config import PRE_XML_FILE_PATH, POST_XML_FILE_PATH, MAX_TOKENS_PER_SNIPPET, MAX_SNIPPETS, INDEX_CACHE_DIR
+from config import INDEX_WATCH_INTERVAL_SEC, INDEX_BUILD_WORKERS, INDEX_PARALLEL_MIN_BYTES
+from config import SESSION_DIR, SESSION_MAX_BYTES, SESSION_INDEX_WORKERS, SESSION_LOAD_WAIT_SEC, SESSION_MAX_UPLOAD_BYTES
+from config import BATCH_COMPARE_ROOT, BATCH_COMPARE_WORKERS
+from config import BATCH_CHAT_MAX_QUERIES, BATCH_CHAT_CONCURRENCY, BATCH_CHAT_SLOT_WAIT_SEC, BATCH_CHAT_MAX_RPS
+from config import CHAT_FULL_CONTEXT, GATEWAY_SPECULATIVE_FALLBACK
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_SEGMENT_BYTES, RETRIEVAL_TAGS_OF_INTEREST
+from services.compact_xml import compression_ratio
+from services.diff_export import BadCursor, DiffFilter, fingerprint, iter_export, parse_cursor, to_csv, to_ndjson
+from services.concurrency import RateLimiter, SingleFlight, UpstreamBusy, UpstreamLimiter
+from services.context_packer import ContextPacker, estimate_tokens
+from services import metrics
+from config import SERVER_TIMING_HEADER, HISTORY_DIR
+from config import GATEWAY_MAX_CONCURRENCY, GATEWAY_SLOT_WAIT_SEC
+from config import ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_MAX_BYTES, ANSWER_CACHE_TTL_SEC, ANSWER_CACHE_DIR, ANSWER_CACHE_DISK_MAX_BYTES
+from services.answer_cache import AnswerCache, make_key
+from services.batch_compare import discover_pairs, iter_batch, load_manifest
+from services.fast_path import format_comparison, format_diff_context, is_compare_query
+from services.file_digest import file_digest
+from services.history_store import HistoryStore
+from services.session_store import Session, SessionNotReady, SessionStore, valid_session_id
 import requests
 
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = SESSION_MAX_UPLOAD_BYTES
 client = RakutenAIClient()
-indexer = RAGIndexer(max_chars_per_chunk=MAX_TOKENS_PER_SNIPPET)
-indexer.build(PRE_XML_FILE_PATH, POST_XML_FILE_PATH)
-retriever = Retriever(indexer)
+indexer = RAGIndexer(
+    max_chars_per_chunk=MAX_TOKENS_PER_SNIPPET, tags=RETRIEVAL_TAGS_OF_INTEREST,
+    workers=INDEX_BUILD_WORKERS, parallel_min_bytes=INDEX_PARALLEL_MIN_BYTES,
+)
+# Reuses the mmap-shared on-disk snapshot when pre/post are unchanged, so workers skip re-indexing
+indexer.load_or_build(PRE_XML_FILE_PATH, POST_XML_FILE_PATH, INDEX_CACHE_DIR)
+if INDEX_WATCH_INTERVAL_SEC:
+    # Edited dumps are picked up in place: only the changed MOs are re-tokenized
+    IndexWatcher(indexer, PRE_XML_FILE_PATH, POST_XML_FILE_PATH, INDEX_WATCH_INTERVAL_SEC, INDEX_CACHE_DIR).start()
+# The configured pre/post pair; uploaded pairs live in ``sessions``
+default_session = Session("default", PRE_XML_FILE_PATH, POST_XML_FILE_PATH, indexer)
+default_session.param_index()
+sessions = SessionStore(
+    SESSION_DIR, SESSION_MAX_BYTES, RETRIEVAL_TAGS_OF_INTEREST, MAX_TOKENS_PER_SNIPPET,
+    index_cache_dir=INDEX_CACHE_DIR, workers=SESSION_INDEX_WORKERS,
+    build_workers=INDEX_BUILD_WORKERS, parallel_min_bytes=INDEX_PARALLEL_MIN_BYTES,
+)
+packer = ContextPacker(RETRIEVAL_TAGS_OF_INTEREST, CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_SEGMENT_BYTES)
+history = HistoryStore(HISTORY_DIR)
+# Identical in-flight questions share one gateway call; gateway calls per worker are capped
+inflight = SingleFlight()
+upstream = UpstreamLimiter(GATEWAY_MAX_CONCURRENCY, GATEWAY_SLOT_WAIT_SEC)
+batch_rate = RateLimiter(BATCH_CHAT_MAX_RPS)
+answer_cache = AnswerCache(
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_MAX_BYTES, ANSWER_CACHE_TTL_SEC, ANSWER_CACHE_DIR, ANSWER_CACHE_DISK_MAX_BYTES,
+)
 
 
+HTTP_SECONDS = metrics.histogram("xmlchat_http_request_seconds", "Time to response headers", labelnames=("endpoint", "status"))
+CHAT_OUTCOMES = metrics.counter("xmlchat_chat_requests_total", "Chat requests by how they were answered", ("endpoint", "outcome"))
+PROMPT_CHARS = metrics.histogram("xmlchat_prompt_chars", "Characters sent to the gateway per grounded prompt", metrics.SIZE_BUCKETS)
+PROMPT_TOKENS = metrics.histogram(
+    "xmlchat_prompt_tokens_estimated", "Estimated tokens per grounded prompt", [b / 4 for b in metrics.SIZE_BUCKETS]
+)
+CONTEXT_COMPRESSION = metrics.histogram(
+    "xmlchat_context_compression_ratio", "XML characters per character of compact context sent", (1, 1.5, 2, 3, 4, 5, 8), ("mode",)
+)
+
+
+@app.before_request
+def _start_timing():
+    g.started = time.perf_counter()
+    g.timing_token = metrics.start_request()
+
+
+@app.after_request
+def _finish_timing(response: Response) -> Response:
+    # Streaming bodies are produced after this point, so this measures time to headers
+    token = g.pop("timing_token", None)
+    if token is None:
+        return response
+    total = time.perf_counter() - g.pop("started")
+    timings = metrics.end_request(token)
+    HTTP_SECONDS.observe(total, endpoint=request.endpoint or "unknown", status=str(response.status_code))
+    if SERVER_TIMING_HEADER:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, total)
+    return response
+
+
+def busy_response(e: UpstreamBusy, endpoint: str):
+    CHAT_OUTCOMES.inc(endpoint=endpoint, outcome="busy")
+    return jsonify({"error": f"Server busy, please retry shortly ({e})", "busy": True}), 503, {"Retry-After": "1"}
+
+
+def record_prompt(messages: List[Dict[str, str]]) -> None:
+    PROMPT_CHARS.observe(sum(len(m.get("content", "")) for m in messages))
+    PROMPT_TOKENS.observe(sum(estimate_tokens(m.get("content", "")) for m in messages))
+
+
+NOT_FOUND_PREFIX = "not found in provided context"
+GATEWAY_UNAVAILABLE = (
+    "Could not reach the Rakuten AI service right now. "
+    "Network/DNS or gateway access may be unavailable. "
+    "Here are the most relevant XML snippets for your query; please try again later."
+)
+
+
+def resolve_session(payload: Dict) -> Session:
+    """The pair a request targets: an uploaded session by ``session_id``, else the configured one."""
+    session_id = (payload or {}).get("session_id")
+    if not session_id:
+        return default_session
+    return sessions.get(str(session_id), wait_sec=SESSION_LOAD_WAIT_SEC)
+
+
+def session_error(e: Exception):
+    if isinstance(e, SessionNotReady):
+        return jsonify({"error": "session is still being indexed", "status": "indexing"}), 409
+    if isinstance(e, KeyError):
+        return jsonify({"error": "unknown session_id"}), 404
+    return jsonify({"error": f"session failed to load: {e}", "status": "error"}), 500
+
+
+def direct_answer(user_query: str, session: Session, endpoint: str) -> Optional[str]:
+    """The answer to a comparison question or parameter lookup, or None when the gateway is needed."""
+    # Comparison questions have a fixed, fully deterministic answer: no gateway call needed
+    if is_compare_query(user_query):
+        with metrics.span("chat.fast_path"):
+            answer = format_comparison(session.comparison())
+        CHAT_OUTCOMES.inc(endpoint=endpoint, outcome="fast_path")
+        return answer
+    # Single-parameter lookups are answered straight from the parameter index
+    with metrics.span("chat.param_lookup"):
+        answer = session.param_index().resolve(user_query)
+    if answer is not None:
+        CHAT_OUTCOMES.inc(endpoint=endpoint, outcome="param_lookup")
+    return answer
+
+
+def build_context(
+    user_query: str, want_full: bool, session: Session,
+    retrieved: Optional[RetrievedContext] = None, diff_context: Optional[str] = None,
+):
+    """Context for the grounded prompt plus the ids of the snippets it contains.
+
+    Batches pass ``retrieved`` and ``diff_context`` computed once for all their queries.
+    """
+    # Dual retrieval from pre and post
+    # Build context: snippets via retriever or packed files
+    if want_full:
+        # Whole managed objects, most relevant first, up to the token budget
+        packed = packer.pack(user_query, session.pre_path, session.post_path)
+        CONTEXT_COMPRESSION.observe(compression_ratio(packed.raw_chars, len(packed.text)), mode="full")
+        return packed.text or "(No content from pre/post fits the context budget)", packed.ids
+    # Computed diff plus the most relevant snippets instead of both whole files
+    if retrieved is None:
+        retrieved = session.retriever.retrieve(user_query, k=MAX_SNIPPETS)
+    if diff_context is None:
+        diff_context = format_diff_context(session.comparison())
+    CONTEXT_COMPRESSION.observe(compression_ratio(retrieved.raw_chars, len(retrieved.formatted)), mode="snippets")
+    snippets = retrieved.formatted or "(No relevant snippets found in pre/post)"
+    return f"{diff_context}\n\n{snippets}", retrieved.ids
+
+
+def answer_cache_key(user_query: str, want_full: bool, session: Session) -> str:
+    # Keyed by content, not session id: the same dump uploaded twice shares answers
+    return make_key(
+        user_query, client.model, PROMPT_VERSION, "full" if want_full else "diff+snippets",
+        file_digest(session.pre_path), file_digest(session.post_path),
+    )
+
+
+def ask_gateway(
+    user_query: str, messages: List[Dict[str, str]], snippet_ids: List[str], cache_key: str,
+    slot_wait_sec: Optional[float] = None,
+) -> Dict:
+    """Grounded gateway answer under the upstream limiter, stored in the answer cache."""
+    # If the model indicates the answer is not in context, use a general fallback
+    answer = upstream.run(lambda: client.chat_with_fallback(
+        messages,
+        build_general_messages(user_query),
+        needs_fallback=lambda a: a.strip().lower().startswith(NOT_FOUND_PREFIX),
+        temperature=0.1,
+        fallback_temperature=0.3,
+        max_tokens=900,
+        speculative=GATEWAY_SPECULATIVE_FALLBACK,
+        fallback_slot=upstream.try_acquire,  # the parallel fallback is a second upstream call
+    ), slot_wait_sec)
+    result = {
+        "answer": answer,
+        "snippets": snippet_ids,
+        "structured": False,
+    }
+    answer_cache.put(cache_key, result)
+    return result
 
 
 @app.get("/")
@@ -28,56 +216,448 @@ def index():
 def chat_api():
     payload = request.get_json(force=True)
     user_query: str = (payload or {}).get("query", "").strip()
-    want_full: bool = True
+    want_full: bool = CHAT_FULL_CONTEXT
     if not user_query:
         return jsonify({"error": "query is required"}), 400
+    try:
+        with metrics.span("chat.session"):
+            session = resolve_session(payload)
+    except Exception as e:
+        return session_error(e)
 
-    # Dual retrieval from pre and post
-    # Build context: snippets via retriever or full files
-    if want_full:
-        with open(PRE_XML_FILE_PATH, "r", encoding="utf-8", errors="ignore") as f:
-            pre_text = f.read()[:MAX_FULL_CONTEXT_CHARS]
-        with open(POST_XML_FILE_PATH, "r", encoding="utf-8", errors="ignore") as f:
-            post_text = f.read()[:MAX_FULL_CONTEXT_CHARS]
-        context = f"[PRE.xml]\n{pre_text}\n\n[POST.xml]\n{post_text}"
-        snippet_ids = []
-    else:
-        retrieved = retriever.retrieve(user_query, k=MAX_SNIPPETS)
-        context = retrieved.formatted or "(No relevant snippets found in pre/post)"
-        snippet_ids = retrieved.ids
+    answer = direct_answer(user_query, session, "chat")
+    if answer is not None:
+        return jsonify({
+            "answer": answer,
+            "snippets": [],
+            "structured": True,
+        })
+
+    with metrics.span("chat.cache"):
+        cache_key = answer_cache_key(user_query, want_full, session)
+        cached = answer_cache.get(cache_key)
+    if cached is not None:
+        CHAT_OUTCOMES.inc(endpoint="chat", outcome="cache_hit")
+        return jsonify(cached)
+
+    with metrics.span("chat.context"):
+        context, snippet_ids = build_context(user_query, want_full, session)
 
     # Let the model handle comparison formatting per the system prompt
 
-    messages: List[Dict[str, str]] = build_messages(context, user_query)
+    with metrics.span("chat.prompt"):
+        messages: List[Dict[str, str]] = build_messages(context, user_query)
+    record_prompt(messages)
 
     try:
-        answer = client.chat(messages, temperature=0.1, max_tokens=900)
-        # If the model indicates the answer is not in context, try a general fallback
-        if answer.strip().lower().startswith("not found in provided context"):
-            general_messages = build_general_messages(user_query)
-            answer = client.chat(general_messages, temperature=0.3, max_tokens=900)
-        answer_html = answer
-        return jsonify({
-            "answer": answer_html,
-            "snippets": snippet_ids,
-            "structured": False,
-        })
+        # The cache key covers query, model, prompt and file digests, so it is also the coalescing key
+        with metrics.span("chat.gateway"):
+            result, shared = inflight.do(cache_key, lambda: ask_gateway(user_query, messages, snippet_ids, cache_key))
+        CHAT_OUTCOMES.inc(endpoint="chat", outcome="coalesced" if shared else "answered")
+        return jsonify(result)
+    except UpstreamBusy as e:
+        return busy_response(e, "chat")
     except requests.exceptions.RequestException as e:
-        fallback = (
-            "Could not reach the Rakuten AI service right now. "
-            "Network/DNS or gateway access may be unavailable. "
-            "Here are the most relevant XML snippets for your query; please try again later."
-        )
+        CHAT_OUTCOMES.inc(endpoint="chat", outcome="gateway_error")
         return jsonify({
-            "answer": fallback,
+            "answer": GATEWAY_UNAVAILABLE,
             "error": str(e),
             "snippets": snippet_ids,
             "structured": False,
         }), 502
     except Exception as e:
+        CHAT_OUTCOMES.inc(endpoint="chat", outcome="error")
         return jsonify({"error": str(e)}), 500
 
 
+def _sse(data: Dict, event: str = "") -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/chat/stream")
+def chat_stream_api():
+    """Same answers as /api/chat, relayed token by token as server-sent events.
+
+    Emits ``data: {"delta": ...}`` events followed by one ``event: done`` carrying
+    the snippet ids, or ``event: error`` if the gateway fails mid-way.
+    """
+    payload = request.get_json(force=True)
+    user_query: str = (payload or {}).get("query", "").strip()
+    if not user_query:
+        return jsonify({"error": "query is required"}), 400
+    try:
+        with metrics.span("chat.session"):
+            session = resolve_session(payload)
+    except Exception as e:
+        return session_error(e)
+
+    answer = direct_answer(user_query, session, "stream")
+    if answer is not None:
+
+        def fast():
+            yield _sse({"delta": answer})
+            yield _sse({"snippets": [], "structured": True}, "done")
+
+        return Response(fast(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    with metrics.span("chat.cache"):
+        cache_key = answer_cache_key(user_query, CHAT_FULL_CONTEXT, session)
+        cached = answer_cache.get(cache_key)
+    if cached is not None:
+        CHAT_OUTCOMES.inc(endpoint="stream", outcome="cache_hit")
+
+        def replay():
+            yield _sse({"delta": cached["answer"]})
+            yield _sse({"snippets": cached["snippets"], "structured": cached["structured"]}, "done")
+
+        return Response(replay(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    with metrics.span("chat.context"):
+        context, snippet_ids = build_context(user_query, CHAT_FULL_CONTEXT, session)
+    with metrics.span("chat.prompt"):
+        messages: List[Dict[str, str]] = build_messages(context, user_query)
+    record_prompt(messages)
+    try:
+        release_slot = upstream.acquire()
+    except UpstreamBusy as e:
+        return busy_response(e, "stream")
+
+    def generate():
+        try:
+            parts: List[str] = []
+            started = time.perf_counter()
+            for delta in client.chat_stream_with_fallback(
+                messages,
+                build_general_messages(user_query),
+                NOT_FOUND_PREFIX,
+                temperature=0.1,
+                fallback_temperature=0.3,
+                max_tokens=900,
+            ):
+                if not parts:
+                    metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="stream.first_token")
+                parts.append(delta)
+                yield _sse({"delta": delta})
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="stream.gateway")
+            answer_cache.put(cache_key, {"answer": "".join(parts).strip(), "snippets": snippet_ids, "structured": False})
+            CHAT_OUTCOMES.inc(endpoint="stream", outcome="answered")
+            yield _sse({"snippets": snippet_ids, "structured": False}, "done")
+        except requests.exceptions.RequestException as e:
+            CHAT_OUTCOMES.inc(endpoint="stream", outcome="gateway_error")
+            yield _sse({"answer": GATEWAY_UNAVAILABLE, "error": str(e), "snippets": snippet_ids}, "error")
+        except Exception as e:
+            CHAT_OUTCOMES.inc(endpoint="stream", outcome="error")
+            yield _sse({"error": str(e)}, "error")
+        finally:
+            release_slot()
+
+    # X-Accel-Buffering stops nginx-style proxies from holding tokens back
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Also frees the slot when the client goes away before the body is ever iterated
+    response.call_on_close(release_slot)
+    return response
+
+
+@app.post("/api/chat/batch")
+def chat_batch_api():
+    """Answers to a list of queries about one pre/post pair, as NDJSON in completion order.
+
+    Payload ``{"queries": [...], "session_id"?, "concurrency"?}``. Each line is
+    ``{"index", "query", "answer", "snippets", "structured", "outcome"}`` (plus
+    ``"error"`` on failure), followed by one ``{"summary": ...}`` line. Direct and
+    cached answers come first; the rest share one retrieval pass and go to the
+    gateway concurrently, at most ``BATCH_CHAT_CONCURRENCY`` at a time.
+    """
+    payload = request.get_json(force=True) or {}
+    queries = payload.get("queries")
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "queries must be a non-empty list"}), 400
+    if len(queries) > BATCH_CHAT_MAX_QUERIES:
+        return jsonify({"error": f"at most {BATCH_CHAT_MAX_QUERIES} queries per batch"}), 400
+    try:
+        concurrency = max(1, min(int(payload.get("concurrency") or BATCH_CHAT_CONCURRENCY), BATCH_CHAT_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency must be an integer"}), 400
+    queries = [str(q or "").strip() for q in queries]
+    try:
+        with metrics.span("chat.session"):
+            session = resolve_session(payload)
+    except Exception as e:
+        return session_error(e)
+
+    ready: List[Dict] = []  # answered without the gateway
+    pending: Dict[str, List[int]] = {}  # cache key -> indexes of the queries asking it
+    for i, user_query in enumerate(queries):
+        if not user_query:
+            ready.append({"index": i, "query": user_query, "error": "query is required", "outcome": "error"})
+            continue
+        answer = direct_answer(user_query, session, "batch")
+        if answer is not None:
+            outcome = "fast_path" if is_compare_query(user_query) else "param_lookup"
+            ready.append({"index": i, "query": user_query, "answer": answer, "snippets": [], "structured": True, "outcome": outcome})
+            continue
+        with metrics.span("chat.cache"):
+            cache_key = answer_cache_key(user_query, CHAT_FULL_CONTEXT, session)
+            cached = answer_cache.get(cache_key) if cache_key not in pending else None
+        if cached is not None:
+            CHAT_OUTCOMES.inc(endpoint="batch", outcome="cache_hit")
+            ready.append({"index": i, "query": user_query, **cached, "outcome": "cache_hit"})
+            continue
+        pending.setdefault(cache_key, []).append(i)
+
+    # One retrieval pass and one diff rendering for every query that needs the gateway
+    keys = list(pending)
+    retrieved: List[Optional[RetrievedContext]] = [None] * len(keys)
+    diff_context = None
+    if keys and not CHAT_FULL_CONTEXT:
+        with metrics.span("chat.context"):
+            retrieved = session.retriever.retrieve_many([queries[pending[key][0]] for key in keys], k=MAX_SNIPPETS)
+            diff_context = format_diff_context(session.comparison())
+
+    def answer_one(user_query: str, cache_key: str, found: Optional[RetrievedContext]):
+        context, snippet_ids = build_context(user_query, CHAT_FULL_CONTEXT, session, found, diff_context)
+        messages = build_messages(context, user_query)
+        record_prompt(messages)
+
+        def call() -> Dict:
+            batch_rate.wait()
+            return ask_gateway(user_query, messages, snippet_ids, cache_key, BATCH_CHAT_SLOT_WAIT_SEC)
+
+        with metrics.span("chat.gateway"):
+            return inflight.do(cache_key, call)
+
+    def generate():
+        started = time.perf_counter()
+        outcomes: Dict[str, int] = {}
+        for record in ready:
+            outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+            yield json.dumps(record) + "\n"
+        pool = ThreadPoolExecutor(max_workers=min(concurrency, len(keys)) or 1, thread_name_prefix="chat-batch")
+        try:
+            futures = {
+                pool.submit(answer_one, queries[pending[key][0]], key, found): pending[key]
+                for key, found in zip(keys, retrieved)
+            }
+            for future in as_completed(futures):
+                try:
+                    body, shared = future.result()
+                    outcome = "coalesced" if shared else "answered"
+                except UpstreamBusy as e:
+                    body, outcome = {"error": f"Server busy ({e})", "busy": True}, "busy"
+                except requests.exceptions.RequestException as e:
+                    body, outcome = {"answer": GATEWAY_UNAVAILABLE, "error": str(e)}, "gateway_error"
+                except Exception as e:
+                    body, outcome = {"error": str(e)}, "error"
+                for n, i in enumerate(futures[future]):
+                    # Repeats of a question within the batch share its gateway call
+                    if n and outcome == "answered":
+                        outcome = "coalesced"
+                    CHAT_OUTCOMES.inc(endpoint="batch", outcome=outcome)
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                    yield json.dumps({"index": i, "query": queries[i], **body, "outcome": outcome}) + "\n"
+        finally:
+            # A client that disconnects stops the queries not yet sent
+            pool.shutdown(wait=False, cancel_futures=True)
+        yield json.dumps({"summary": {
+            "queries": len(queries),
+            "gateway_queries": len(keys),
+            "outcomes": outcomes,
+            "seconds": round(time.perf_counter() - started, 3),
+        }}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+def _arg_list(name: str) -> List[str]:
+    """Repeated and comma-separated query args: ``?mo=A&mo=B`` or ``?mo=A,B``."""
+    return [v.strip() for raw in request.args.getlist(name) for v in raw.split(",") if v.strip()]
+
+
+@app.get("/api/diff/export")
+def diff_export_api():
+    """Every difference of a pair, streamed as NDJSON (default) or ``?format=csv``.
+
+    Filters: ``mo`` (MO type), ``param`` (parameter name) and ``kind``. ``limit``
+    ends the page early; pass the returned ``next_cursor`` as ``cursor`` for the next.
+    """
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    try:
+        limit = request.args.get("limit", type=int)
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be positive")
+        diff_filter = DiffFilter(_arg_list("mo"), _arg_list("param"), _arg_list("kind"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        session = resolve_session(request.args)
+    except Exception as e:
+        return session_error(e)
+    cursor = request.args.get("cursor")
+    try:
+        parse_cursor(cursor, fingerprint(session.pre_path, session.post_path, diff_filter))
+    except BadCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    records = iter_export(session.pre_path, session.post_path, diff_filter, cursor, limit)
+    if fmt == "csv":
+        return Response(stream_with_context(to_csv(records)), mimetype="text/csv")
+    return Response(stream_with_context(to_ndjson(records)), mimetype="application/x-ndjson")
+
+
+@app.post("/api/sessions")
+def create_session_api():
+    """Upload a pre/post pair (multipart fields ``pre`` and ``post``); indexing runs in the background."""
+    pre_file, post_file = request.files.get("pre"), request.files.get("post")
+    if pre_file is None or post_file is None:
+        return jsonify({"error": "pre and post files are required"}), 400
+    session_id = request.form.get("session_id") or uuid.uuid4().hex
+    if not valid_session_id(session_id):
+        return jsonify({"error": "session_id may only contain letters, digits, '_', '-' and '.'"}), 400
+    try:
+        sessions.register(session_id, pre_file.stream, post_file.stream)
+    except OSError as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"session_id": session_id, "status": sessions.status(session_id)}), 202
+
+
+@app.get("/api/sessions/<session_id>")
+def session_status_api(session_id: str):
+    status = sessions.status(session_id)
+    if status is None:
+        return jsonify({"error": "unknown session_id"}), 404
+    return jsonify({"session_id": session_id, "status": status})
+
+
+@app.delete("/api/sessions/<session_id>")
+def delete_session_api(session_id: str):
+    if not sessions.delete(session_id):
+        return jsonify({"error": "unknown session_id"}), 404
+    return jsonify({"session_id": session_id, "deleted": True})
+
+
+@app.get("/api/sessions")
+def sessions_stats_api():
+    return jsonify(sessions.stats())
+
+
+@app.post("/api/history")
+def history_ingest_api():
+    """Add an uploaded dump (multipart field ``dump``) as the next snapshot of each ManagedElement in it."""
+    dump = request.files.get("dump")
+    if dump is None:
+        return jsonify({"error": "dump file is required"}), 400
+    fd, tmp = tempfile.mkstemp(suffix=".xml")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            dump.save(f)
+        snapshots = history.ingest(tmp, label=request.form.get("label") or dump.filename or "")
+    except Exception as e:
+        return jsonify({"error": f"could not ingest dump: {e}"}), 400
+    finally:
+        os.unlink(tmp)
+    return jsonify({"snapshots": snapshots})
+
+
+@app.get("/api/history")
+def history_nodes_api():
+    return jsonify({"nodes": history.nodes()})
+
+
+def _history_node(node_id: str):
+    node = history.node(node_id)
+    if node is None:
+        return None, (jsonify({"error": "unknown node"}), 404)
+    return node, None
+
+
+@app.get("/api/history/<node_id>/snapshots")
+def history_snapshots_api(node_id: str):
+    node, error = _history_node(node_id)
+    if error:
+        return error
+    return jsonify({"node": node_id, "snapshots": node.summary()})
+
+
+@app.get("/api/history/<node_id>/diff")
+def history_diff_api(node_id: str):
+    node, error = _history_node(node_id)
+    if error:
+        return error
+    try:
+        a = request.args.get("a", -2, type=int)
+        b = request.args.get("b", -1, type=int)
+        return jsonify({"node": node_id, "a": a, "b": b, "differences": node.diff(a, b)})
+    except IndexError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.get("/api/history/<node_id>/param")
+def history_param_api(node_id: str):
+    node, error = _history_node(node_id)
+    if error:
+        return error
+    name = request.args.get("name", "")
+    if not name:
+        return jsonify({"error": "name is required"}), 400
+    return jsonify({"node": node_id, "history": node.history(name, request.args.get("mo", ""))})
+
+
+@app.get("/metrics")
+def metrics_api():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.get("/api/cache/stats")
+def cache_stats_api():
+    return jsonify(answer_cache.stats())
+
+
+def _batch_path(path: str) -> str:
+    """Resolve a client-supplied path, refusing anything outside BATCH_COMPARE_ROOT."""
+    root = os.path.realpath(BATCH_COMPARE_ROOT)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"path outside batch root: {path}")
+    return full
+
+
+@app.post("/api/compare/batch")
+def compare_batch_api():
+    payload = request.get_json(force=True) or {}
+    try:
+        if payload.get("manifest"):
+            pairs = load_manifest(_batch_path(payload["manifest"]))
+            for _, pre, post in pairs:
+                _batch_path(pre)
+                _batch_path(post)
+        elif payload.get("pre_dir") and payload.get("post_dir"):
+            pairs = discover_pairs(_batch_path(payload["pre_dir"]), _batch_path(payload["post_dir"]))
+        else:
+            return jsonify({"error": "manifest or pre_dir and post_dir are required"}), 400
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    # The client may ask for fewer processes than the machine has, never more
+    max_workers = os.cpu_count() or 1
+    try:
+        workers = max(1, min(int(payload.get("workers") or BATCH_COMPARE_WORKERS or max_workers), max_workers))
+    except (TypeError, ValueError):
+        return jsonify({"error": "workers must be an integer"}), 400
+
+    def generate():
+        for record in iter_batch(pairs, workers=workers):
+            yield json.dumps(record) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 if __name__ == "__main__":
     app.run(host=HOST, port=PORT, debug=DEBUG)
 
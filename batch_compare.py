@@ -0,0 +1,36 @@
+"""Batch pre/post comparison over many nodes, streamed as NDJSON.
+
+    python batch_compare.py --pre-dir dumps/pre --post-dir dumps/post
+    python batch_compare.py --manifest pairs.csv --workers 8 > results.ndjson
+"""
+import argparse
+import json
+import sys
+
+from config import BATCH_COMPARE_WORKERS
+from services.batch_compare import discover_pairs, iter_batch, load_manifest
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Compare pre/post XML pairs for many nodes in parallel.")
+    ap.add_argument("--pre-dir", help="directory of pre dumps")
+    ap.add_argument("--post-dir", help="directory of post dumps (matched to --pre-dir by file name)")
+    ap.add_argument("--manifest", help="CSV (node,pre,post) or JSON lines manifest of pairs")
+    ap.add_argument("--workers", type=int, default=BATCH_COMPARE_WORKERS, help="worker processes (default: CPU count)")
+    args = ap.parse_args()
+
+    if args.manifest:
+        pairs = load_manifest(args.manifest)
+    elif args.pre_dir and args.post_dir:
+        pairs = discover_pairs(args.pre_dir, args.post_dir)
+    else:
+        ap.error("give --manifest or both --pre-dir and --post-dir")
+
+    for record in iter_batch(pairs, workers=args.workers):
+        sys.stdout.write(json.dumps(record) + "\n")
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Query latency of SimpleBM25 as the chunk count grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_bm25 --sizes 1000 10000 50000
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import List
+
+from rag.indexer import SimpleBM25
+
+
+PARAMS = [
+    "pci", "tac", "earfcnDl", "earfcnUl", "enbId", "cellLocalId", "administrativeState",
+    "radioType", "aldSupport", "qRxLevelMin", "pMax", "siWindowLength", "b1NrReportInterval",
+    "maxNbIotUsers", "dlEarfcn", "severity", "alarmCondition", "retTilt", "antennaBearing",
+]
+MOS = ["EUtranCellFDD", "RadioObj", "EUtranNeighbourCell", "NBIOTService", "SIB1NB", "RadioCarrier"]
+QUERIES = [
+    "what is the pci of EUtranCellFDD 3",
+    "earfcnDl in post",
+    "adminState of RadioObj 7",
+    "compare pre and post",
+    "alarm severity major",
+]
+
+
+def synthetic_chunks(n: int, seed: int = 7) -> List[str]:
+    rnd = random.Random(seed)
+    chunks: List[str] = []
+    for i in range(n):
+        mo = rnd.choice(MOS)
+        lines = [f'<ioc:{mo} id="{i}"> <ioc:attributes>']
+        for p in rnd.sample(PARAMS, 8):
+            lines.append(f"<ioc:{p}>{rnd.randint(0, 50000)}</ioc:{p}>")
+        lines.append(f"</ioc:attributes> </ioc:{mo}>")
+        chunks.append(" ".join(lines))
+    return chunks
+
+
+def bench(sizes: List[int], k: int, repeat: int) -> None:
+    print(f"{'chunks':>8} {'build_s':>9} {'p50_ms':>9} {'p95_ms':>9}")
+    for n in sizes:
+        docs = synthetic_chunks(n)
+        t0 = time.perf_counter()
+        bm25 = SimpleBM25(docs)
+        build_s = time.perf_counter() - t0
+        samples: List[float] = []
+        for _ in range(repeat):
+            for q in QUERIES:
+                t = time.perf_counter()
+                bm25.top_k(q, k)
+                samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{n:>8} {build_s:>9.2f} {statistics.median(samples):>9.3f} {p95:>9.3f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+    bench(args.sizes, args.k, args.repeat)
@@ -0,0 +1,65 @@
+"""Gateway transport benchmark against the local stub.
+
+    python -m benchmarks.bench_gateway --calls 200 --latency-ms 50
+
+Compares a bare ``requests.post`` per call with the pooled RakutenAIClient, and the
+serial vs speculative not-found fallback.
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import requests
+
+from api_client import RakutenAIClient
+from benchmarks.stub_gateway import StubState, serve
+
+
+def _timed(fn: Callable[[], object], n: int) -> List[float]:
+    samples: List[float] = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return samples
+
+
+def _report(label: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+    print(f"{label:<28} p50={statistics.median(samples):8.2f}ms p95={p95:8.2f}ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--calls", type=int, default=100)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    state = StubState(latency_ms=args.latency_ms)
+    server = serve(0, state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    client = RakutenAIClient(base_url=base, api_key="stub", model="stub")
+    messages = [{"role": "user", "content": "Question: what is the enbId"}]
+    payload = {"model": "stub", "messages": messages}
+
+    before = state.connections
+    _report("bare requests.post", _timed(lambda: requests.post(f"{base}/chat/completions", json=payload, timeout=30), args.calls))
+    bare_conns = state.connections - before
+    before = state.connections
+    _report("pooled client.chat", _timed(lambda: client.chat(messages), args.calls))
+    print(f"connections opened: bare={bare_conns} pooled={state.connections - before}")
+
+    state.not_found = True
+    general = [{"role": "user", "content": "what is the enbId"}]
+    not_found = lambda a: a.lower().startswith("not found in provided context")
+    _report("fallback serial", _timed(lambda: client.chat_with_fallback(messages, general, not_found), args.calls // 4 or 1))
+    _report("fallback speculative", _timed(
+        lambda: client.chat_with_fallback(messages, general, not_found, speculative=True), args.calls // 4 or 1
+    ))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Index, retrieval, compare and end-to-end chat benchmarks over synthetic dumps.
+
+    python -m benchmarks.bench_suite --cells 10 100 1000 --out bench.json
+
+For each size a pre/post pair is generated (benchmarks.gen_bulkcm), then:
+
+- ``build``: ``RAGIndexer.build`` wall time, and peak traced memory in a second run
+- ``top_k``: retrieval latency percentiles over a fixed query mix
+- ``context``: XML-to-compact compression ratio of the retrieved snippets over the
+  query mix
+- ``compare`` / ``compare_streaming``: ``compare_xml`` and the streaming comparator
+- ``chat``: ``POST /api/chat`` through the Flask test client against the local stub
+  gateway, for the session holding the generated pair (answer-cache misses, then hits)
+
+The result is one JSON document (environment, arguments and one record per size)
+meant to be stored and diffed between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.gen_bulkcm import generate
+from benchmarks.stub_gateway import StubState, serve
+from config import MAX_SNIPPETS, MAX_TOKENS_PER_SNIPPET, RETRIEVAL_TAGS_OF_INTEREST
+from rag.indexer import RAGIndexer
+from rag.retriever import Retriever
+from services.comparator import compare_xml, compare_xml_streaming
+from services.compact_xml import compression_ratio
+
+
+QUERIES = [
+    "what is the pci of EUtranCellFDD Sec2",
+    "earfcnDl of the neighbour cells",
+    "administrativeState of cell Sec1",
+    "RadioExternalAlarm severity",
+    "threshXHigh SIB5EutranInterFreqCellReselection",
+    "p0UePusch UEUplinkPowerControl",
+]
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    s = sorted(samples_ms)
+    return {
+        "p50_ms": round(statistics.median(s), 3),
+        "p95_ms": round(s[max(int(len(s) * 0.95) - 1, 0)], 3),
+        "max_ms": round(s[-1], 3),
+    }
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+def _peak_mb(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+    finally:
+        tracemalloc.stop()
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def bench_index(pre: str, post: str, repeat: int, memory: bool) -> Dict[str, Any]:
+    indexer = RAGIndexer(MAX_TOKENS_PER_SNIPPET, tags=RETRIEVAL_TAGS_OF_INTEREST)
+    build_sec = _timed(lambda: indexer.build(pre, post))
+    samples = []
+    for _ in range(repeat):
+        for q in QUERIES:
+            samples.append(_timed(lambda: indexer.top_k(q, MAX_SNIPPETS)) * 1000)
+    build: Dict[str, Any] = {"sec": round(build_sec, 4), "chunks": len(indexer.chunks)}
+    if memory:
+        build["peak_mb"] = _peak_mb(lambda: RAGIndexer(MAX_TOKENS_PER_SNIPPET, tags=RETRIEVAL_TAGS_OF_INTEREST).build(pre, post))
+    retriever = Retriever(indexer)
+    raw = sent = 0
+    for q in QUERIES:
+        retrieved = retriever.retrieve(q, MAX_SNIPPETS)
+        raw += retrieved.raw_chars
+        sent += len(retrieved.formatted)
+    context = {"raw_chars": raw, "chars": sent, "ratio": round(compression_ratio(raw, sent), 2)}
+    return {"build": build, "top_k": _percentiles(samples), "context": context}
+
+
+def bench_compare(pre: str, post: str, memory: bool, full_parse: bool) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    if full_parse:
+        holder: Dict[str, Any] = {}
+        sec = _timed(lambda: holder.update(r=compare_xml(_read(pre), _read(post))))
+        out["compare"] = {"sec": round(sec, 4), "value_differences": holder["r"].get("value_difference_count")}
+        if memory:
+            out["compare"]["peak_mb"] = _peak_mb(lambda: compare_xml(_read(pre), _read(post)))
+    sec = _timed(lambda: compare_xml_streaming(pre, post))
+    out["compare_streaming"] = {"sec": round(sec, 4)}
+    if memory:
+        out["compare_streaming"]["peak_mb"] = _peak_mb(lambda: compare_xml_streaming(pre, post))
+    return out
+
+
+def bench_chat(pre: str, post: str, session_id: str, repeat: int, latency_ms: float) -> Dict[str, Any]:
+    import app as app_module
+    from api_client import RakutenAIClient
+    from services.answer_cache import AnswerCache
+    from services.session_store import SessionStore
+
+    state = StubState(latency_ms=latency_ms)
+    server = serve(0, state)
+    work = tempfile.mkdtemp(prefix="bench_sessions_")
+    # Point the app at the stub and keep its caches out of the working tree
+    saved = app_module.client, app_module.answer_cache, app_module.sessions
+    app_module.client = RakutenAIClient(base_url=f"http://127.0.0.1:{server.server_address[1]}", api_key="stub", model="stub")
+    app_module.answer_cache = AnswerCache(disk_dir=None)
+    app_module.sessions = SessionStore(
+        os.path.join(work, "sessions"), 1 << 30, RETRIEVAL_TAGS_OF_INTEREST, MAX_TOKENS_PER_SNIPPET,
+        index_cache_dir=os.path.join(work, "index"),
+    )
+    try:
+        client = app_module.app.test_client()
+        with open(pre, "rb") as fp, open(post, "rb") as fq:
+            resp = client.post("/api/sessions", data={"session_id": session_id, "pre": (fp, "pre.xml"), "post": (fq, "post.xml")})
+        if resp.status_code != 202:
+            raise RuntimeError(f"upload failed: {resp.status_code} {resp.get_data(as_text=True)}")
+        load_sec = _timed(lambda: app_module.sessions.get(session_id, wait_sec=3600))
+
+        def ask(q: str) -> None:
+            r = client.post("/api/chat", json={"query": q, "session_id": session_id})
+            if r.status_code != 200:
+                raise RuntimeError(f"/api/chat returned {r.status_code}")
+
+        misses, hits = [], []
+        for i in range(repeat):
+            for q in QUERIES:
+                misses.append(_timed(lambda: ask(f"{q} #{i}")) * 1000)
+        for q in QUERIES:
+            hits.append(_timed(lambda: ask(f"{q} #0")) * 1000)
+
+        # The same cold questions in one /api/chat/batch request, gateway calls concurrent
+        batch = [f"{q} #batch{i}" for i in range(repeat) for q in QUERIES]
+
+        def ask_batch() -> None:
+            r = client.post("/api/chat/batch", json={"queries": batch, "session_id": session_id})
+            if r.status_code != 200 or '"summary"' not in r.get_data(as_text=True):
+                raise RuntimeError(f"/api/chat/batch returned {r.status_code}")
+
+        return {
+            "session_load_sec": round(load_sec, 4),
+            "stub_latency_ms": latency_ms,
+            "miss": _percentiles(misses),
+            "hit": _percentiles(hits),
+            "batch": {"queries": len(batch), "ms": round(_timed(ask_batch) * 1000, 2), "serial_ms": round(sum(misses), 2)},
+        }
+    finally:
+        app_module.client, app_module.answer_cache, app_module.sessions = saved
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    data_root = args.data_dir or tempfile.mkdtemp(prefix="bench_data_")
+    results = []
+    try:
+        for cells in args.cells:
+            info = generate(
+                os.path.join(data_root, str(cells)), cells,
+                value_rate=args.value_rate, remove_rate=args.remove_rate, add_rate=args.add_rate, seed=args.seed,
+            )
+            record: Dict[str, Any] = {k: info[k] for k in ("cells", "pre_bytes", "post_bytes", "mutations")}
+            record.update(bench_index(info["pre"], info["post"], args.repeat, args.memory))
+            record.update(bench_compare(info["pre"], info["post"], args.memory, cells <= args.full_parse_max_cells))
+            if args.chat:
+                record["chat"] = bench_chat(info["pre"], info["post"], f"bench{cells}", args.repeat, args.stub_latency_ms)
+            results.append(record)
+            print(f"{cells} cells done", file=sys.stderr)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_root, ignore_errors=True)
+    return {
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "args": {k: v for k, v in vars(args).items() if k != "out"},
+        "results": results,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--cells", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--value-rate", type=float, default=0.01)
+    ap.add_argument("--remove-rate", type=float, default=0.01)
+    ap.add_argument("--add-rate", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=5, help="passes over the query mix")
+    ap.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc runs")
+    ap.add_argument("--no-chat", dest="chat", action="store_false", help="skip the /api/chat benchmark")
+    ap.add_argument("--stub-latency-ms", type=float, default=0.0)
+    ap.add_argument("--full-parse-max-cells", type=int, default=20000, help="run the in-memory compare_xml only up to this size")
+    ap.add_argument("--data-dir", help="keep generated dumps here instead of a temp dir")
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
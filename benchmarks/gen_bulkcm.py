@@ -0,0 +1,234 @@
+"""Synthetic bulkCmConfigDataFile pre/post pairs for benchmarks.
+
+    python -m benchmarks.gen_bulkcm --cells 3000 --out bench_data/3000 --value-rate 0.01
+
+Documents use the namespaces and ``SubNetwork/ManagedElement/ENBFunction`` layout
+of the real dumps: per eNB, ``cells_per_enb`` cells, each with its RadioObj,
+RETGroup and GroupRTS siblings and an ``EUtranCellFDD`` holding EUtranCell,
+NBIOTService and LTEService subtrees (SIBs, power control, L2 and lists of
+neighbour cells, reselection entries and measurement profiles). A real cell is
+~140 KB; these are ~18 KB with the same shape, so 100k cells come to about 1.8 GB
+per file.
+
+pre and post are written in one streaming pass. post differs from pre by
+``value_rate`` (fraction of leaf parameters changed) and by list entries
+(neighbours, reselections, profiles) removed with ``remove_rate`` or added with
+``add_rate`` per cell. The same seed always gives the same files.
+"""
+import argparse
+import json
+import os
+import random
+from typing import Dict, List, Optional, TextIO, Tuple
+
+
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<bulkCmConfigDataFile xmlns="http://www.3gpp.org/ftp/specs/archive/32_series/32.616/V3_5_4g_133#configData"'
+    ' xmlns:ns2="http://www.3gpp.org/ftp/specs/archive/32_series/32.626#genericNrm"'
+    ' xmlns:ns3="http://www.3gpp.org/ftp/specs/archive/32_series/32.766/V3_5_4g_133#eutranNrm"'
+    ' xmlns:ioc="http://www.3gpp.org/ftp/specs/archive/32_series/V3_5_4g_133#ioc">\n'
+    '    <fileHeader fileFormatVersion="32.616 V10.2" senderName="DC=altiostar.com,SubNetwork=ANIEMS,'
+    'ManagementNode=ANIEMS,IRPAgent=ANIIRPAgent" vendorName="Altiostar Networks Inc."/>\n'
+    '    <configData dnPrefix="altiostar.com">\n'
+    '        <ns2:SubNetwork id="ANIEMS">\n'
+)
+FOOTER = (
+    '        </ns2:SubNetwork>\n'
+    '    </configData>\n'
+    '    <fileFooter dateTime="2025-09-12T03:04:23.229+09:00"/>\n'
+    '</bulkCmConfigDataFile>\n'
+)
+
+# (tag, id, [(param, value)], children)
+Node = Tuple[str, str, List[Tuple[str, str]], List["Node"]]
+
+EARFCNS = ["1500", "1850", "5900", "5925", "8750", "8775"]
+LIST_TAGS = {"ioc:EUtranNeighbourCell", "ioc:SIB5EutranInterFreqCellReselection", "ioc:ProfileEventInterFrequency"}
+
+
+def _cell(rnd: random.Random, enb: int, k: int, neighbours: int) -> List[Node]:
+    sec = f"Sec{k}"
+    earfcn = rnd.choice(EARFCNS)
+    nbrs = rnd.sample(range(1, 5000), neighbours)
+    lte_children: List[Node] = [
+        ("ioc:SIB1", sec, [
+            ("intraFreqResel", "allowed"), ("qRxMinLevel", str(rnd.randint(-70, -44))), ("qRxMinLevelOffset", "4"),
+            ("freqBandIndicator", "3"), ("siWindowLength", "ms10"), ("siRepetitionFactor", "1"),
+        ], [
+            ("ioc:SIBScheduling", "1", [("sibType", "sib3"), ("periodicity", "rf16")], []),
+            ("ioc:SIBScheduling", "2", [("sibType", "sib5"), ("periodicity", "rf32")], []),
+            ("ioc:PLMN", "44011", [("mcc", "440"), ("mnc", "11"), ("cellReservedForOperatorUse", "notReserved")], []),
+        ]),
+        ("ioc:SIB2", sec, [
+            ("timeAlignmentTimerCommon", "infinity"), ("ulBandwidth", "n100"), ("additionalSpectrumEmission", "1"),
+        ], []),
+        ("ioc:UEUplinkPowerControl", sec, [
+            ("p0UePusch", "0"), ("deltaMcsEnabled", "en0"), ("accumulationEn", "true"), ("p0UePucch", "0"), ("filterCoeff", "fc4"),
+        ], []),
+        ("ioc:IRAT", sec, [("b1NrThreshold", str(rnd.randint(-120, -90))), ("b1NrReportInterval", "ms480")], []),
+        ("ioc:L2", sec, [("maxHarqTx", "5")], [
+            ("ioc:UlPrescheduling", sec, [
+                ("ulPrescheduling", "true"), ("ueCapsRemovalTimer", "ms1200"), ("preschedPeriodicity", "ms5"),
+                ("unsolicitGrantSize", str(rnd.choice([1480, 1200, 960]))),
+            ], []),
+        ]),
+    ]
+    for n in nbrs:
+        lte_children.append(("ioc:EUtranNeighbourCell", str(n), [
+            ("neighbourEnbId", str(rnd.randint(300000, 320000))), ("cellLocalId", str(rnd.randint(1, 12))),
+            ("pci", str(rnd.randint(0, 503))), ("earfcnDl", rnd.choice(EARFCNS)), ("qOffset", "dB0"),
+            ("isRemoveAllowed", "true"), ("isHoAllowed", "true"),
+        ], []))
+    for e in EARFCNS[:3]:
+        lte_children.append(("ioc:SIB5EutranInterFreqCellReselection", e, [
+            ("dlCarrierFreq", e), ("qRxLevMin", "-64"), ("threshXHigh", str(rnd.randint(4, 20))), ("threshXLow", "6"),
+        ], []))
+    for p in range(1, 5):
+        lte_children.append(("ioc:ProfileEventInterFrequency", str(p), [
+            ("eventInterFrequencyId", str(p)), ("a3Offset", str(rnd.randint(0, 6))), ("hysteresis", "2"), ("timeToTrigger", "ms320"),
+        ], []))
+    return [
+        ("ioc:RadioObj", str(k), [
+            ("radioType", "radio-nokia"), ("aldSupport", "disabled"), ("aldPort", "aisg0"),
+            ("powerSavingMode", "disabled"), ("iqMapping", "ferrybridge"),
+        ], [
+            ("ioc:RadioExternalAlarm", str(a), [
+                ("name", "Battery Exchange"), ("alarmCondition", "close"), ("adminState", "enabled"), ("severity", "minor"),
+            ], []) for a in range(1, 3)
+        ] + [("ioc:EntityInfo", str(k), [("radioSerialNum", f"EA{enb:06d}{k:03d}"), ("radioModelNum", "473484A")], [])]),
+        ("ioc:RETGroup", str(k), [("radioIdList", str(k))], [("ioc:GroupRETList", "1", [("retTilt", str(rnd.randint(0, 100)))], [])]),
+        ("ioc:GroupRTS", str(k), [], [("ioc:RTS", "1", [("rtsEnabled", "true")], [])]),
+        ("ns3:EUtranCellFDD", sec, [
+            ("cellLocalId", str(k)), ("tac", str(rnd.randint(12000, 12999))), ("pci", str(rnd.randint(0, 503))),
+            ("maximumTransmissionPower", "23"), ("administrativeState", "unlocked"),
+            ("earfcnDl", earfcn), ("earfcnUl", str(int(earfcn) + 18000)),
+        ], [
+            ("ioc:EUtranCell", sec, [("cuCellId", str(k)), ("lteServiceEnabled", "enabled"), ("nbiotServiceEnabled", "enabled")], []),
+            ("ioc:NBIOTService", sec, [("dlEarfcn", str(int(earfcn) - 92)), ("maxNbIotUsers", "6000"), ("maxNbIotActiveUsers", "100")], [
+                ("ioc:SIB1NB", sec, [("nbSchedulingInfoSib1", "4"), ("eutraControlRegionSize", "3")], []),
+                ("ioc:SIB2NB", sec, [("nbTimeAlignmentTimerCommon", "infinity")], []),
+            ]),
+            ("ioc:LTEService", sec, [
+                ("emergencyAreaIds", "002FAD 002FCA"), ("dynCfiEnable", "enabled"), ("caEnabled", "disabled"), ("longDrxEnable", "enabled"),
+            ], lte_children),
+        ]),
+    ]
+
+
+def _mutate_value(rnd: random.Random, value: str) -> str:
+    if value.lstrip("-").isdigit():
+        return str(int(value) + rnd.randint(1, 5))
+    swaps = {"enabled": "disabled", "disabled": "enabled", "true": "false", "false": "true", "unlocked": "locked", "locked": "unlocked"}
+    return swaps.get(value, value + "_x")
+
+
+class Mutator:
+    def __init__(self, seed: int, value_rate: float, remove_rate: float, add_rate: float) -> None:
+        self.rnd = random.Random(seed ^ 0x5EED)
+        self.value_rate = value_rate
+        self.remove_rate = remove_rate
+        self.add_rate = add_rate
+        self.counts: Dict[str, int] = {"values": 0, "removed": 0, "added": 0}
+
+    def node(self, node: Node) -> Node:
+        tag, mo_id, params, children = node
+        new_params = []
+        for p, v in params:
+            if self.value_rate and self.rnd.random() < self.value_rate:
+                v = _mutate_value(self.rnd, v)
+                self.counts["values"] += 1
+            new_params.append((p, v))
+        new_children: List[Node] = []
+        for c in children:
+            if c[0] in LIST_TAGS and self.remove_rate and self.rnd.random() < self.remove_rate:
+                self.counts["removed"] += 1
+                continue
+            new_children.append(self.node(c))
+        if tag == "ioc:LTEService" and self.add_rate and self.rnd.random() < self.add_rate:
+            # ids above the generated range never collide with existing neighbours
+            new_children.append(("ioc:EUtranNeighbourCell", str(self.rnd.randint(5000, 9999)), [
+                ("neighbourEnbId", str(self.rnd.randint(300000, 320000))), ("pci", str(self.rnd.randint(0, 503))),
+                ("earfcnDl", self.rnd.choice(EARFCNS)), ("qOffset", "dB0"),
+            ], []))
+            self.counts["added"] += 1
+        return tag, mo_id, new_params, new_children
+
+
+def _write(out: TextIO, node: Node, depth: int) -> None:
+    tag, mo_id, params, children = node
+    pad = "    " * depth
+    out.write(f'{pad}<{tag} id="{mo_id}">\n')
+    if params:
+        ns = tag.split(":")[0]
+        out.write(f"{pad}    <{ns}:attributes>\n")
+        for p, v in params:
+            out.write(f"{pad}        <{ns}:{p}>{v}</{ns}:{p}>\n")
+        out.write(f"{pad}    </{ns}:attributes>\n")
+    for c in children:
+        _write(out, c, depth + 1)
+    out.write(f"{pad}</{tag}>\n")
+
+
+def generate(
+    out_dir: str,
+    cells: int,
+    cells_per_enb: int = 3,
+    neighbours: int = 6,
+    value_rate: float = 0.0,
+    remove_rate: float = 0.0,
+    add_rate: float = 0.0,
+    seed: int = 7,
+) -> Dict[str, object]:
+    """Write ``pre.xml`` and ``post.xml`` under ``out_dir``; returns paths, sizes and mutation counts."""
+    os.makedirs(out_dir, exist_ok=True)
+    rnd = random.Random(seed)
+    mutator = Mutator(seed, value_rate, remove_rate, add_rate)
+    pre_path, post_path = os.path.join(out_dir, "pre.xml"), os.path.join(out_dir, "post.xml")
+    with open(pre_path, "w", encoding="utf-8") as pre, open(post_path, "w", encoding="utf-8") as post:
+        pre.write(HEADER)
+        post.write(HEADER)
+        enbs = -(-cells // cells_per_enb)
+        for e in range(enbs):
+            enb_id = 300000 + e
+            first = e * cells_per_enb
+            children: List[Node] = []
+            for k in range(first + 1, min(first + cells_per_enb, cells) + 1):
+                children.extend(_cell(rnd, e, k, neighbours))
+            me_id = f"uhn1chba{enb_id:08d}"
+            enb: Node = ("ns3:ENBFunction", me_id, [("enbId", str(enb_id))], children)
+            me: Node = ("ns2:ManagedElement", me_id, [], [enb])
+            _write(pre, me, 3)
+            _write(post, mutator.node(me), 3)
+        pre.write(FOOTER)
+        post.write(FOOTER)
+    return {
+        "pre": pre_path,
+        "post": post_path,
+        "cells": cells,
+        "pre_bytes": os.path.getsize(pre_path),
+        "post_bytes": os.path.getsize(post_path),
+        "mutations": mutator.counts,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--cells", type=int, required=True)
+    ap.add_argument("--out", required=True, help="directory for pre.xml and post.xml")
+    ap.add_argument("--cells-per-enb", type=int, default=3)
+    ap.add_argument("--neighbours", type=int, default=6, help="EUtranNeighbourCell entries per cell")
+    ap.add_argument("--value-rate", type=float, default=0.0, help="fraction of parameters changed in post")
+    ap.add_argument("--remove-rate", type=float, default=0.0, help="fraction of list entries missing from post")
+    ap.add_argument("--add-rate", type=float, default=0.0, help="probability that a cell gains a neighbour in post")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+    info = generate(
+        args.out, args.cells, args.cells_per_enb, args.neighbours,
+        args.value_rate, args.remove_rate, args.add_rate, args.seed,
+    )
+    print(json.dumps(info))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Local OpenAI-compatible /chat/completions stub for tests and benchmarks.
+
+    python -m benchmarks.stub_gateway --port 8088 --latency-ms 200 --fail-rate 0.1
+
+Point the app at it with RAKUTEN_AI_BASE_URL=http://127.0.0.1:8088. GET /stats
+reports requests served and TCP connections opened, which shows whether the
+client reuses keep-alive connections.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+class StubState:
+    def __init__(
+        self, latency_ms: float = 0.0, fail_rate: float = 0.0, not_found: bool = False, token_delay_ms: float = 0.0,
+        answer: Optional[str] = None,
+    ) -> None:
+        self.answer = answer  # fixed reply instead of the prompt-length one
+        self.latency_ms = latency_ms
+        self.token_delay_ms = token_delay_ms
+        self.fail_rate = fail_rate
+        self.not_found = not_found
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+def _answer(payload: Dict[str, Any], state: StubState) -> str:
+    messages = payload.get("messages") or [{}]
+    question = str(messages[-1].get("content", ""))
+    if state.answer is not None:
+        return state.answer
+    if state.not_found and "Question:" in question:
+        return "Not found in provided context."
+    return f"stub answer ({len(question)} chars of prompt)"
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+
+        def setup(self) -> None:
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _send_json(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = {}) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, content: str, model: str) -> None:
+            """SSE chat.completion.chunk events, one word per chunk, over chunked transfer encoding."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = content.split(" ")
+            events = [
+                {"id": "stub", "object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {"content": (w if i == 0 else " " + w)}, "finish_reason": None}]}
+                for i, w in enumerate(words)
+            ]
+            for ev in events:
+                # Raw UTF-8 and no charset parameter, as real gateways send it
+                self._write_chunk(f"data: {json.dumps(ev, ensure_ascii=False)}\n\n".encode("utf-8"))
+                if state.token_delay_ms:
+                    time.sleep(state.token_delay_ms / 1000.0)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                self._send_json(200, {"requests": state.requests, "connections": state.connections})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            with state.lock:
+                state.requests += 1
+            if state.latency_ms:
+                time.sleep(state.latency_ms / 1000.0)
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": "not found"})
+                return
+            if random.random() < state.fail_rate:
+                status = random.choice([429, 503])
+                self._send_json(status, {"error": "stub failure"}, {"Retry-After": "0"})
+                return
+            content = _answer(payload, state)
+            if payload.get("stream"):
+                self._send_stream(content, payload.get("model", "stub"))
+                return
+            self._send_json(200, {
+                "id": "stub",
+                "object": "chat.completion",
+                "model": payload.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": length // 4, "completion_tokens": len(content) // 4, "total_tokens": (length + len(content)) // 4},
+            })
+
+    return Handler
+
+
+def serve(port: int = 0, state: StubState = None) -> ThreadingHTTPServer:
+    """Start the stub on a daemon thread; ``port=0`` picks a free port (see ``server_address``)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state or StubState()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="OpenAI-compatible stub gateway")
+    ap.add_argument("--port", type=int, default=8088)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with 429/503")
+    ap.add_argument("--token-delay-ms", type=float, default=0.0, help="delay between streamed chunks")
+    ap.add_argument("--not-found", action="store_true", help="answer grounded questions with 'Not found in provided context.'")
+    args = ap.parse_args()
+    srv = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(StubState(args.latency_ms, args.fail_rate, args.not_found, args.token_delay_ms)))
+    print(f"stub gateway on http://127.0.0.1:{args.port}")
+    srv.serve_forever()
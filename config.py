@@ -4,6 +4,18 @@ RAKUTEN_AI_BASE_URL = "xxx"
 RAKUTEN_AI_GATEWAY_KEY = "xxx"
 RAKUTEN_AI_MODEL = "gpt-4o-mini"
 
+# Gateway transport
+GATEWAY_POOL_SIZE = 10  # keep-alive connections per worker
+GATEWAY_TIMEOUT_SEC = 30.0  # per attempt (connect and read)
+GATEWAY_MAX_RETRIES = 3  # retries on 429/5xx/connection errors (jittered exponential backoff, honors Retry-After)
+GATEWAY_BACKOFF_BASE_SEC = 0.5
+GATEWAY_BACKOFF_MAX_SEC = 8.0
+GATEWAY_BREAKER_THRESHOLD = 5  # consecutive failed calls before the circuit opens
+GATEWAY_BREAKER_COOLDOWN_SEC = 30.0
+GATEWAY_SPECULATIVE_FALLBACK = False  # issue the general fallback in parallel with the grounded call
+GATEWAY_MAX_CONCURRENCY = 16  # gateway calls in flight per worker process; None disables the limit
+GATEWAY_SLOT_WAIT_SEC = 0.0  # wait this long for a free slot before answering 503 (0 = fail fast)
+
 # Server configuration
 HOST = "127.0.0.1"
 PORT = 8000
@@ -15,7 +27,14 @@ PRE_XML_FILE_PATH = "pre.xml"
 POST_XML_FILE_PATH = "post.xml"
 MAX_SNIPPETS = 8
 MAX_TOKENS_PER_SNIPPET = 1600  # characters per snippet
-MAX_FULL_CONTEXT_CHARS = 1500000  # increase cap to reduce truncation risk
+MAX_FULL_CONTEXT_CHARS = 1500000  # legacy character cap, superseded by CONTEXT_TOKEN_BUDGET
+CHAT_FULL_CONTEXT = False  # True: MO-packed pre/post context; False: computed diff + retrieved snippets
+CONTEXT_TOKEN_BUDGET = 24000  # estimated prompt tokens for the MO-packed context
+CONTEXT_MAX_SEGMENT_BYTES = 8000  # soft cap per MO segment before it is split at a child boundary
+INDEX_CACHE_DIR = ".index_cache"  # versioned, mmap-shared RAG index snapshots keyed by pre/post digest
+INDEX_WATCH_INTERVAL_SEC = 2.0  # poll pre/post and re-index only changed MOs; 0 or None disables
+INDEX_BUILD_WORKERS = 0  # tokenizer processes for large index builds; 0 = one per CPU, 1 = in-process
+INDEX_PARALLEL_MIN_BYTES = 16 * 1024 * 1024  # pre+post chunk bytes below which a build stays in-process
 RETRIEVAL_TAGS_OF_INTEREST = {
     "ENBFunction",
     "EUtranCellFDD",
@@ -28,4 +47,32 @@ RETRIEVAL_TAGS_OF_INTEREST = {
     "UEUplinkPowerControl",
 }
 
+# Answer cache (keyed by query, model, prompt version and pre/post digests)
+ANSWER_CACHE_MAX_ENTRIES = 1024
+ANSWER_CACHE_MAX_BYTES = 16 * 1024 * 1024
+ANSWER_CACHE_TTL_SEC = 3600
+ANSWER_CACHE_DIR = ".answer_cache"  # shared on-disk tier for all workers; None disables it
+ANSWER_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024  # the disk tier is pruned back to this, oldest answers first
+
+# Uploaded pre/post sessions (/api/sessions)
+SESSION_DIR = ".sessions"  # one sub-directory per session; the source for lazy reloads
+SESSION_MAX_BYTES = 512 * 1024 * 1024  # in-memory budget for session indexes and diffs (LRU)
+SESSION_INDEX_WORKERS = 2  # background indexing threads
+SESSION_LOAD_WAIT_SEC = 10.0  # how long a chat request waits for a session that is still indexing
+SESSION_MAX_UPLOAD_BYTES = 512 * 1024 * 1024  # request body limit for uploads
+
+# Snapshot history of repeated dumps (/api/history)
+HISTORY_DIR = ".history"  # one delta-encoded file per ManagedElement
+
+# Metrics (/metrics is always served; the header exposes stage timings to clients)
+SERVER_TIMING_HEADER = False  # add a per-request Server-Timing header
+
+# Batch compare (CLI and /api/compare/batch)
+BATCH_COMPARE_WORKERS = None  # None -> os.cpu_count()
+BATCH_COMPARE_ROOT = "."  # the HTTP endpoint only reads pairs below this directory
 
+# Batch chat (/api/chat/batch)
+BATCH_CHAT_MAX_QUERIES = 200  # queries accepted per request
+BATCH_CHAT_CONCURRENCY = 8  # gateway calls in flight per batch; they also count against GATEWAY_MAX_CONCURRENCY
+BATCH_CHAT_SLOT_WAIT_SEC = 30.0  # batch calls queue this long for a gateway slot instead of failing fast
+BATCH_CHAT_MAX_RPS = None  # gateway calls started per second by batches in a worker; None disables the limit
@@ -0,0 +1,25 @@
+"""Production serving: ``gunicorn app:app`` picks this file up from the working directory.
+
+Chat requests spend nearly all their time waiting on the gateway, so each worker
+process runs a pool of threads (``gthread``) instead of one request at a time; a
+slow LLM call then holds a thread, not a whole worker. The index snapshot is
+memory-mapped and shared, so extra threads and workers cost little memory.
+Gateway concurrency per worker is capped separately by GATEWAY_MAX_CONCURRENCY.
+"""
+import multiprocessing
+import os
+
+from config import HOST, PORT
+from config import GATEWAY_BACKOFF_MAX_SEC, GATEWAY_MAX_RETRIES, GATEWAY_TIMEOUT_SEC
+
+
+bind = os.getenv("BIND", f"{HOST}:{PORT}")
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+threads = int(os.getenv("GUNICORN_THREADS", 32))
+# Slowest possible answer: the grounded call and then the general fallback, each timing
+# out on every attempt with the longest backoff in between; a worker is never killed mid-retry
+_gateway_call_sec = GATEWAY_TIMEOUT_SEC * (GATEWAY_MAX_RETRIES + 1) + GATEWAY_BACKOFF_MAX_SEC * GATEWAY_MAX_RETRIES
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 2 * _gateway_call_sec + 30))
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,102 @@
+"""Split bulkCm XML along managed-object boundaries instead of line counts.
+
+Works on raw bytes (a ``bytes`` object or an ``mmap``) with a single regex pass over
+the tags, so segments are plain byte ranges and no tree is built. Every MO whose
+tag is in the tags of interest owns the bytes between its start and end tag, minus
+nested MOs of interest, which get segments of their own. An oversized segment is
+split only where a direct child or a nested MO (any element with an ``id``) has
+just closed, so no managed object is ever cut in half.
+"""
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass
+import re
+
+
+_TAG_RE = re.compile(rb"<(/?)(?:[A-Za-z_][\w.\-]*:)?([A-Za-z_][\w.\-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*?)(/?)>")
+_ID_RE = re.compile(rb"""\bid\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+
+@dataclass
+class MOSegment:
+    dn: str  # DN of the owning MO ("" for content outside every MO of interest)
+    tag: str  # local tag of the owning MO
+    part: int  # 0.. when the owner's content was split into several segments
+    start: int  # byte offsets into the source
+    end: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.dn}#{self.part}" if self.part else self.dn
+
+
+def iter_mo_segments(data, tags: Iterable[str], max_bytes: int = 0) -> Iterator[MOSegment]:
+    """Yield non-overlapping segments covering ``data`` in document order.
+
+    ``max_bytes`` (0 = unlimited) is a soft cap: a segment is closed at the first
+    child or nested-MO boundary after it is exceeded.
+    """
+    interest: Set[bytes] = {t.encode("utf-8") for t in tags}
+    # (local tag, has id) per open element; dn parts for id-bearing ones
+    stack: List[Tuple[bytes, bool]] = []
+    dn_parts: List[str] = []
+    # Owners of interest: (stack depth of the owning element, dn, tag, next part number)
+    owners: List[List] = [[0, "", "", 0]]
+    seg_start = 0
+
+    def close(end: int) -> Optional[MOSegment]:
+        owner = owners[-1]
+        if end <= seg_start or not data[seg_start:end].strip():
+            return None
+        seg = MOSegment(owner[1], owner[2], owner[3], seg_start, end)
+        owner[3] += 1
+        return seg
+
+    for m in _TAG_RE.finditer(data):
+        closing, name, attrs, selfclosing = m.group(1), m.group(2), m.group(3), m.group(4)
+        if not closing:
+            idm = _ID_RE.search(attrs)
+            if idm is not None:
+                dn_parts.append(f"{name.decode('utf-8')}={(idm.group(1) or idm.group(2) or b'').decode('utf-8')}")
+            is_mo = idm is not None and name in interest
+            if is_mo:
+                seg = close(m.start())
+                if seg:
+                    yield seg
+                seg_start = m.start()
+                owners.append([len(stack), ",".join(dn_parts), name.decode("utf-8"), 0])
+            if selfclosing:
+                if idm is not None:
+                    dn_parts.pop()
+                if is_mo:
+                    seg = close(m.end())
+                    if seg:
+                        yield seg
+                    owners.pop()
+                    seg_start = m.end()
+                continue
+            stack.append((name, idm is not None))
+            continue
+
+        if not stack:
+            continue
+        name, has_id = stack.pop()
+        owner = owners[-1]
+        if len(owners) > 1 and len(stack) == owner[0]:
+            # End tag of the current owner: its segment ends here, the enclosing owner resumes
+            seg = close(m.end())
+            if seg:
+                yield seg
+            owners.pop()
+            seg_start = m.end()
+        elif max_bytes and (has_id or len(stack) == owner[0] + 1) and m.end() - seg_start >= max_bytes:
+            # Over budget and a complete child (a direct child of the owner, or any nested MO) just closed
+            seg = close(m.end())
+            if seg:
+                yield seg
+            seg_start = m.end()
+        if has_id:
+            dn_parts.pop()
+
+    seg = close(len(data))
+    if seg:
+        yield seg
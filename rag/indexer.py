@@ -1,101 +1,753 @@
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Optional, Sequence, Set, Tuple
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import heapq
+import mmap
 import os
 import re
 from dataclasses import dataclass
 
+from services.file_digest import combined_digest, file_digest
+from .chunker import iter_mo_segments
 
-def _read_text(path: str) -> str:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_\-]+")
+
+Postings = Dict[str, Tuple[array, array]]  # term -> (ascending doc ids, term frequencies)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
         return f.read()
 
 
+def _map_file(path: str):
+    """Read-only map of ``path`` (``b""`` when empty, which mmap refuses)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
 def _normalize_space(text: str) -> str:
     return re.sub(r"\s+", " ", text).strip()
 
 
-def _chunk_xml(text: str, max_chars: int) -> List[str]:
-    chunks: List[str] = []
-    current: List[str] = []
+def _segment_hash(raw) -> bytes:
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def _postings(texts: Iterable[str]) -> Tuple[array, Postings]:
+    """Document lengths and postings of ``texts``, doc ids counted from 0."""
+    doc_len = array("I")
+    postings: Postings = {}
+    for idx, text in enumerate(texts):
+        tf: Dict[str, int] = {}
+        for t in _TOKEN_RE.findall(text.lower()):
+            tf[t] = tf.get(t, 0) + 1
+        doc_len.append(sum(tf.values()))
+        for t, n in tf.items():
+            entry = postings.get(t)
+            if entry is None:
+                entry = postings[t] = (array("I"), array("I"))
+            entry[0].append(idx)
+            entry[1].append(n)
+    return doc_len, postings
+
+
+def _shard_postings(paths: Sequence[str], ranges: Sequence[Tuple[int, int, int]]) -> Tuple[array, Postings]:
+    """Process-pool task: postings of (file index, start, end) byte ranges, with shard-local doc ids.
+
+    Whitespace normalization never changes tokens, so the raw bytes are tokenized
+    as they are and no chunk text is kept.
+    """
+    data = [_map_file(p) for p in paths]
+    return _postings(data[f][start:end].decode("utf-8", errors="ignore") for f, start, end in ranges)
+
+
+def _merge_postings(shards: Iterable[Tuple[array, Postings]]) -> Tuple[array, Postings]:
+    """Concatenate shard results in order, offsetting each shard's doc ids."""
+    doc_len = array("I")
+    merged: Postings = {}
+    for shard_len, postings in shards:
+        base = len(doc_len)
+        doc_len.extend(shard_len)
+        for t, (ids, tfs) in postings.items():
+            entry = merged.get(t)
+            if entry is None:
+                entry = merged[t] = (array("I"), array("I"))
+            entry[0].extend(ids if not base else (i + base for i in ids))
+            entry[1].extend(tfs)
+    return doc_len, merged
+
+
+def _split_shards(ranges: List[Tuple[int, int, int]], count: int) -> List[List[Tuple[int, int, int]]]:
+    """Consecutive runs of ``ranges`` with roughly equal byte totals."""
+    target = sum(end - start for _, start, end in ranges) / max(count, 1)
+    shards: List[List[Tuple[int, int, int]]] = [[]]
     size = 0
-    for line in text.splitlines():
-        current.append(line)
-        size += len(line) + 1
-        if size >= max_chars and line.strip().endswith('>'):
-            chunks.append("\n".join(current))
-            current = []
+    for r in ranges:
+        if size >= target and shards[-1]:
+            shards.append([])
             size = 0
-    if current:
-        chunks.append("\n".join(current))
-    return chunks
+        shards[-1].append(r)
+        size += r[2] - r[1]
+    return shards
+
+
+# Source label of a chunk whose bytes are identical in pre and post; it is stored once
+SHARED = "pre+post"
 
 
 @dataclass
 class DocumentChunk:
-    source: str
-    chunk_id: int
+    source: str  # "pre", "post" or SHARED
+    chunk_id: int  # segment position in its file; for SHARED chunks, in pre
     text: str
+    dn: str = ""  # DN of the managed object the chunk belongs to
+    twin_id: int = -1  # for SHARED chunks, the segment position in post
+
+    @property
+    def ids(self) -> List[str]:
+        if self.source == SHARED:
+            return [f"pre:{self.chunk_id}", f"post:{self.twin_id}"]
+        return [f"{self.source}:{self.chunk_id}"]
+
+    @property
+    def label(self) -> str:
+        if self.source != SHARED:
+            return f"{self.source.upper()} #{self.chunk_id}"
+        if self.twin_id == self.chunk_id:
+            return f"PRE+POST #{self.chunk_id}"
+        return f"PRE #{self.chunk_id} + POST #{self.twin_id}"
 
 
 class SimpleBM25:
-    """Lightweight BM25-like scorer to reduce dependencies and keep payload minimal."""
+    """Lightweight BM25-like scorer to reduce dependencies and keep payload minimal.
+
+    Backed by an inverted index: each term maps to a contiguous slice of the flat
+    ``post_docs``/``post_tfs`` arrays, so a query only touches the postings of its
+    own terms instead of rescanning every document.
+
+    Incremental edits (``with_changes``) never rewrite those arrays: removed documents
+    are tombstoned, added documents go to a small per-term overlay, and document
+    frequencies carry a delta. ``compact`` folds the overlay back into flat arrays.
+    """
 
     def __init__(self, docs: List[str]):
-        self.docs = docs
-        self.doc_terms: List[List[str]] = [self._tokenize(d) for d in docs]
-        self.term_df: Dict[str, int] = {}
-        for terms in self.doc_terms:
-            seen = set(terms)
-            for t in seen:
-                self.term_df[t] = self.term_df.get(t, 0) + 1
-        self.avgdl = sum(len(t) for t in self.doc_terms) / max(len(self.doc_terms), 1)
         self.k1 = 1.5
         self.b = 0.75
+        doc_len, postings = _postings(docs)
+        self._set_postings(doc_len, postings)
+
+    @classmethod
+    def from_postings(cls, doc_len: array, postings: Postings, k1: float = 1.5, b: float = 0.75) -> "SimpleBM25":
+        """Scorer over postings computed elsewhere, e.g. merged from tokenizer shards."""
+        self = cls.__new__(cls)
+        self.k1 = k1
+        self.b = b
+        self._set_postings(doc_len, postings)
+        return self
+
+    def _set_postings(self, doc_len: array, postings: Postings) -> None:
+        self.doc_len = doc_len
+        # term -> (offset, df) into the flat postings arrays; doc ids ascend within a slice
+        self.vocab: Dict[str, Tuple[int, int]] = {}
+        self.post_docs = array("I")
+        self.post_tfs = array("I")
+        for t, (idxs, tfs) in postings.items():
+            self.vocab[t] = (len(self.post_docs), len(idxs))
+            self.post_docs.extend(idxs)
+            self.post_tfs.extend(tfs)
+        self._reset_overlay()
+        self._refresh_stats()
+
+    @classmethod
+    def from_arrays(cls, vocab, post_docs, post_tfs, doc_len, norm=None, avgdl=None, k1: float = 1.5, b: float = 0.75) -> "SimpleBM25":
+        """Wrap prebuilt postings (arrays or memoryviews, e.g. from a snapshot) without re-tokenizing."""
+        self = cls.__new__(cls)
+        self.k1 = k1
+        self.b = b
+        self.vocab = vocab
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.doc_len = doc_len
+        self._reset_overlay()
+        if norm is None or avgdl is None:
+            self._refresh_stats()
+        else:
+            self.N = len(doc_len)
+            self.avgdl = avgdl
+            self._norm = norm
+        return self
+
+    def _reset_overlay(self) -> None:
+        self.deleted: Set[int] = set()
+        self.extra: Dict[str, Tuple[array, array]] = {}  # term -> (doc ids, tfs) of appended docs
+        self.df_delta: Dict[str, int] = {}
+
+    def _refresh_stats(self) -> None:
+        self.N = len(self.doc_len) - len(self.deleted)
+        total = sum(self.doc_len) - sum(self.doc_len[i] for i in self.deleted)
+        self.avgdl = total / max(self.N, 1)
+        # Per-document length normalisation, k1 * (1 - b + b * dl / avgdl)
+        scale = self.k1 * self.b / max(self.avgdl, 1e-6)
+        base = self.k1 * (1 - self.b)
+        self._norm = array("d", (base + scale * dl for dl in self.doc_len))
+
+    @property
+    def term_df(self) -> Dict[str, int]:
+        df = {t: d for t, (_, d) in self.vocab.items()}
+        for t, delta in self.df_delta.items():
+            df[t] = df.get(t, 0) + delta
+        return {t: d for t, d in df.items() if d > 0}
+
+    @property
+    def overlay_size(self) -> int:
+        return len(self.deleted) + sum(len(docs) for docs, _ in self.extra.values())
 
     def _tokenize(self, text: str) -> List[str]:
-        return re.findall(r"[A-Za-z0-9_\-]+", text.lower())
+        return _TOKEN_RE.findall(text.lower())
 
-    def score_query(self, query: str) -> List[Tuple[int, float]]:
-        q_terms = self._tokenize(query)
+    def _term_freqs(self, text: str) -> Dict[str, int]:
+        tf: Dict[str, int] = {}
+        for t in self._tokenize(text):
+            tf[t] = tf.get(t, 0) + 1
+        return tf
+
+    def with_changes(self, removed: Dict[int, str], added: List[str]) -> "SimpleBM25":
+        """Copy-on-write edit: tombstone ``removed`` (doc id -> its text) and append ``added``.
+
+        Only the changed documents are tokenized; the flat base postings are shared
+        with ``self``, so readers of the old object are unaffected. Appended documents
+        get ids ``len(doc_len)``, ``len(doc_len) + 1``, ...
+        """
+        new = SimpleBM25.from_arrays(self.vocab, self.post_docs, self.post_tfs, array("I", self.doc_len), k1=self.k1, b=self.b)
+        new.deleted = set(self.deleted)
+        new.extra = dict(self.extra)
+        new.df_delta = dict(self.df_delta)
+        copied: Set[str] = set()
+        for idx, text in removed.items():
+            if idx in new.deleted:
+                continue
+            new.deleted.add(idx)
+            for t in self._term_freqs(text):
+                new.df_delta[t] = new.df_delta.get(t, 0) - 1
+        for text in added:
+            idx = len(new.doc_len)
+            tf = self._term_freqs(text)
+            new.doc_len.append(sum(tf.values()))
+            for t, n in tf.items():
+                if t not in copied:
+                    docs, tfs = new.extra.get(t, (array("I"), array("I")))
+                    new.extra[t] = (array("I", docs), array("I", tfs))
+                    copied.add(t)
+                new.extra[t][0].append(idx)
+                new.extra[t][1].append(n)
+                new.df_delta[t] = new.df_delta.get(t, 0) + 1
+        new._refresh_stats()
+        return new
+
+    def compact(self) -> Tuple["SimpleBM25", List[int]]:
+        """Fold tombstones and the overlay into fresh flat arrays, without re-tokenizing.
+
+        Returns the compacted scorer and, for each of its doc ids, the old doc id.
+        """
+        keep = [i for i in range(len(self.doc_len)) if i not in self.deleted]
+        remap = {old: new for new, old in enumerate(keep)}
+        new = SimpleBM25.from_arrays({}, array("I"), array("I"), array("I", (self.doc_len[i] for i in keep)), k1=self.k1, b=self.b)
+        terms = set(self.vocab) | set(self.extra)
+        for t in terms:
+            docs: List[int] = []
+            tfs: List[int] = []
+            entry = self.vocab.get(t)
+            if entry is not None:
+                off, df = entry
+                for idx, tf in zip(self.post_docs[off:off + df], self.post_tfs[off:off + df]):
+                    if idx in remap:
+                        docs.append(remap[idx])
+                        tfs.append(tf)
+            if t in self.extra:
+                for idx, tf in zip(*self.extra[t]):
+                    if idx in remap:
+                        docs.append(remap[idx])
+                        tfs.append(tf)
+            if docs:
+                new.vocab[t] = (len(new.post_docs), len(docs))
+                new.post_docs.extend(docs)
+                new.post_tfs.extend(tfs)
+        new._refresh_stats()
+        return new, keep
+
+    def _accumulate(self, query: str) -> Dict[int, float]:
+        return self._accumulate_terms(set(self._tokenize(query)))
+
+    def _accumulate_terms(self, terms: Iterable[str]) -> Dict[int, float]:
         scores: Dict[int, float] = {}
-        N = len(self.docs)
-        for qi in set(q_terms):
-            df = self.term_df.get(qi, 0) or 0
-            if df == 0:
+        get = scores.get
+        norm = self._norm
+        k1p1 = self.k1 + 1
+        N = self.N
+        deleted = self.deleted
+        for qi in terms:
+            entry = self.vocab.get(qi)
+            extra = self.extra.get(qi)
+            df = (entry[1] if entry else 0) + self.df_delta.get(qi, 0)
+            if df <= 0:
+                continue
+            idf = max(0.0, ((N - df + 0.5) / (df + 0.5)))
+            if idf == 0.0:
                 continue
-            idf = max(0.0, ( (N - df + 0.5) / (df + 0.5) ))
-            for idx, terms in enumerate(self.doc_terms):
-                tf = terms.count(qi)
-                if tf == 0:
-                    continue
-                dl = len(terms)
-                denom = tf + self.k1 * (1 - self.b + self.b * (dl / max(self.avgdl, 1e-6)))
-                scores[idx] = scores.get(idx, 0.0) + idf * ((tf * (self.k1 + 1)) / denom)
-        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+            w = idf * k1p1
+            if entry is not None:
+                off, base_df = entry
+                docs = self.post_docs[off:off + base_df]
+                tfs = self.post_tfs[off:off + base_df]
+                if deleted:
+                    for idx, tf in zip(docs, tfs):
+                        if idx not in deleted:
+                            scores[idx] = get(idx, 0.0) + w * tf / (tf + norm[idx])
+                else:
+                    for idx, tf in zip(docs, tfs):
+                        scores[idx] = get(idx, 0.0) + w * tf / (tf + norm[idx])
+            if extra is not None:
+                for idx, tf in zip(*extra):
+                    if idx not in deleted:
+                        scores[idx] = get(idx, 0.0) + w * tf / (tf + norm[idx])
+        return scores
+
+    def score_query(self, query: str) -> List[Tuple[int, float]]:
+        scores = self._accumulate(query)
+        return sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+
+    def top_k(self, query: str, k: int, weights: Optional[Sequence[float]] = None) -> List[Tuple[int, float]]:
+        """Best ``k`` (doc index, score) pairs, highest first; ties keep index order.
+
+        ``weights`` optionally scales each document's score by a per-doc-id factor.
+        """
+        if k <= 0:
+            return []
+        scores = self._accumulate(query)
+        if weights is not None:
+            scores = {idx: score * weights[idx] for idx, score in scores.items()}
+        return heapq.nsmallest(k, scores.items(), key=lambda x: (-x[1], x[0]))
+
+    def top_k_many(self, queries: Sequence[str], k: int, weights: Optional[Sequence[float]] = None) -> List[List[Tuple[int, float]]]:
+        """``top_k`` for several queries in one pass: each distinct term's postings are scored once.
+
+        Audit-style question lists repeat the same parameter and MO names, so the
+        per-term score maps are shared and a query only sums the maps of its terms.
+        """
+        if k <= 0:
+            return [[] for _ in queries]
+        term_sets = [set(self._tokenize(q)) for q in queries]
+        per_term = {t: self._accumulate_terms((t,)) for t in set().union(*term_sets)}
+        out = []
+        for terms in term_sets:
+            scores: Dict[int, float] = {}
+            get = scores.get
+            for t in terms:
+                for idx, score in per_term[t].items():
+                    scores[idx] = get(idx, 0.0) + score
+            if weights is not None:
+                scores = {idx: score * weights[idx] for idx, score in scores.items()}
+            out.append(heapq.nsmallest(k, scores.items(), key=lambda x: (-x[1], x[0])))
+        return out
+
+
+class _AppendedChunks(Sequence):
+    """``base`` followed by ``extra`` without copying ``base`` (which may be mmap-backed)."""
+
+    def __init__(self, base: Sequence, extra: List[DocumentChunk]) -> None:
+        self.base = base
+        self.extra = extra
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.extra)
+
+    def __getitem__(self, i: int) -> DocumentChunk:  # type: ignore[override]
+        n = len(self.base)
+        if i < 0:
+            i += len(self)
+        return self.base[i] if i < n else self.extra[i - n]
+
+    def meta(self, i: int) -> Tuple[str, int, int]:
+        n = len(self.base)
+        if i < n:
+            return chunk_meta(self.base, i)
+        c = self.extra[i - n]
+        return c.source, c.chunk_id, c.twin_id
+
+
+class RangeChunks(Sequence):
+    """DocumentChunks stored as byte ranges into read-only maps of the pre/post files.
+
+    Nothing but the range, ids and DN is kept per chunk; the text is decoded and
+    whitespace-normalized only when a chunk is accessed, i.e. when it goes into a
+    prompt. Maps are only read while building: a served index uses its snapshot, or
+    ``detach`` copies the bytes into memory, since the files can be truncated or
+    rewritten in place under a map.
+    """
+
+    _SOURCES = ("pre", "post", SHARED)
+
+    def __init__(self, paths: Sequence[str], data: Sequence) -> None:
+        self.paths = list(paths)
+        self._data = list(data)
+        self._source_idx = array("B")
+        self._chunk_ids = array("I")
+        self._twin_ids = array("i")
+        self._file = array("B")
+        self._starts = array("Q")
+        self._ends = array("Q")
+        self._dns: List[str] = []
+
+    def append(self, source: str, chunk_id: int, twin_id: int, file_idx: int, start: int, end: int, dn: str) -> None:
+        self._source_idx.append(self._SOURCES.index(source))
+        self._chunk_ids.append(chunk_id)
+        self._twin_ids.append(twin_id)
+        self._file.append(file_idx)
+        self._starts.append(start)
+        self._ends.append(end)
+        self._dns.append(dn)
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    def __getitem__(self, i: int) -> DocumentChunk:  # type: ignore[override]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        raw = self._data[self._file[i]][self._starts[i]:self._ends[i]]
+        source, cid, twin = self.meta(i)
+        return DocumentChunk(source, cid, _normalize_space(raw.decode("utf-8", errors="ignore")), self._dns[i], twin)
+
+    def meta(self, i: int) -> Tuple[str, int, int]:
+        return self._SOURCES[self._source_idx[i]], self._chunk_ids[i], self._twin_ids[i]
+
+    def ranges(self) -> List[Tuple[int, int, int]]:
+        return list(zip(self._file, self._starts, self._ends))
+
+    def detach(self) -> None:
+        """Hold private copies of the files instead of maps, so truncating them cannot fault a reader."""
+        # Maps are dropped rather than closed: a reader may still be slicing one
+        self._data = [bytes(d) for d in self._data]
+
+    def approx_bytes(self) -> int:
+        arrays = (self._source_idx, self._chunk_ids, self._twin_ids, self._file, self._starts, self._ends)
+        return (
+            sum(len(a) * a.itemsize for a in arrays)
+            + sum(len(dn) + 50 for dn in self._dns)
+            + sum(len(d) for d in self._data)
+        )
+
+
+def chunk_meta(chunks: Sequence[DocumentChunk], i: int) -> Tuple[str, int, int]:
+    """(source, chunk_id, twin_id) of chunk ``i`` without materializing its text when the store allows it."""
+    meta = getattr(chunks, "meta", None)
+    if meta is not None:
+        return meta(i)
+    c = chunks[i]
+    return c.source, c.chunk_id, c.twin_id
+
+
+def _pair_segments(pre: List[tuple], post: List[tuple]):
+    """(source, chunk_id, twin_id, file index, segment) per distinct chunk of a pre/post pair.
+
+    Segments are tuples starting with (hash, dn). A post segment with the same bytes
+    as a pre segment is folded into one SHARED chunk, stored from the pre file (file
+    index 0); repeated identical segments pair up in document order. A post-only
+    chunk follows the pre-only chunk of the same DN, so the two versions of a changed
+    MO get neighbouring doc ids and tie-break together in ``top_k``.
+    """
+    unpaired: Dict[bytes, List[int]] = {}
+    for j in range(len(post) - 1, -1, -1):
+        unpaired.setdefault(post[j][0], []).append(j)
+    twin_of: List[int] = []
+    for seg in pre:
+        twins = unpaired.get(seg[0])
+        twin_of.append(twins.pop() if twins else -1)
+    paired = set(twin_of)
+    post_only: Dict[str, List[int]] = {}
+    for j in range(len(post)):
+        if j not in paired:
+            post_only.setdefault(post[j][1], []).append(j)
+    for i, seg in enumerate(pre):
+        if twin_of[i] >= 0:
+            yield SHARED, i, twin_of[i], 0, seg
+            continue
+        yield "pre", i, -1, 0, seg
+        for j in post_only.pop(seg[1], ()):
+            yield "post", j, -1, 1, post[j]
+    for j in sorted(j for js in post_only.values() for j in js):
+        yield "post", j, -1, 1, post[j]
+
+
+@dataclass
+class _IndexState:
+    chunks: Sequence[DocumentChunk]
+    bm25: Optional[SimpleBM25]
+    hashes: List[bytes]  # per chunk id: digest of the raw segment bytes
+    weights: Sequence[float]  # per chunk id: retrieval boost, CHANGED_BOOST unless SHARED
+    digest: Optional[str] = None
 
 
 class RAGIndexer:
-    def __init__(self, max_chars_per_chunk: int) -> None:
+    # Compact the postings overlay once it holds this fraction of the documents
+    COMPACT_RATIO = 0.25
+    # Score multiplier for chunks whose content differs between pre and post
+    CHANGED_BOOST = 2.0
+
+    def __init__(
+        self, max_chars_per_chunk: int, tags: Iterable[str] = (), workers: int = 1, parallel_min_bytes: int = 16 << 20,
+    ) -> None:
         self.max_chars_per_chunk = max_chars_per_chunk
-        self.chunks: List[DocumentChunk] = []
-        self.bm25: SimpleBM25 | None = None
+        self.tags = frozenset(tags)
+        # Tokenizer processes for builds of at least ``parallel_min_bytes``; 0 = one per CPU
+        self.workers = workers
+        self.parallel_min_bytes = parallel_min_bytes
+        # Replaced wholesale on every (re)build so readers always see a consistent chunks/bm25 pair
+        self._state = _IndexState([], None, [], array("d"))
+
+    @property
+    def chunks(self) -> Sequence[DocumentChunk]:
+        return self._state.chunks
+
+    @property
+    def bm25(self) -> Optional[SimpleBM25]:
+        return self._state.bm25
+
+    @property
+    def digest(self) -> Optional[str]:
+        return self._state.digest
+
+    def _weights(self, chunks: Sequence[DocumentChunk]) -> array:
+        return array("d", (1.0 if chunk_meta(chunks, i)[0] == SHARED else self.CHANGED_BOOST for i in range(len(chunks))))
+
+    def approx_bytes(self) -> int:
+        """Rough resident size of the index, for memory-budgeted stores.
+
+        Memory-mapped sections are counted at their mapped size even though the page
+        cache may share or drop them, so the figure errs on the high side.
+        """
+        state = self._state
+        size = 48 * len(state.hashes) + 8 * len(state.weights)
+        bm25 = state.bm25
+        if bm25 is not None:
+            for arr in (bm25.post_docs, bm25.post_tfs, bm25.doc_len, bm25._norm):
+                size += len(arr) * arr.itemsize
+            if isinstance(bm25.vocab, dict):
+                size += 120 * len(bm25.vocab)  # dict slot, key str and value tuple
+            size += 64 * bm25.overlay_size
+        chunks, extra = state.chunks, []
+        if isinstance(chunks, _AppendedChunks):
+            chunks, extra = chunks.base, chunks.extra
+        blob = getattr(chunks, "_blob", None)
+        if blob is not None:
+            size += blob.nbytes + 24 * len(chunks)
+            chunks = []
+        elif isinstance(chunks, RangeChunks):
+            size += chunks.approx_bytes()
+            chunks = []
+        size += sum(len(c.text) + len(c.dn) + 150 for c in (*chunks, *extra))
+        return size
+
+    def content_digest(self, pre_path: str, post_path: str) -> str:
+        """Snapshot key: both file contents plus everything that shapes the index."""
+        from .snapshot import SNAPSHOT_VERSION
+        return combined_digest(
+            f"v{SNAPSHOT_VERSION}", str(self.max_chars_per_chunk), ",".join(sorted(self.tags)),
+            file_digest(pre_path), file_digest(post_path),
+        )
+
+    def _snapshot_path(self, cache_dir: str, digest: str) -> str:
+        return os.path.join(cache_dir, f"{digest}.idx")
+
+    def _load(self, cache_dir: str, digest: str) -> Optional[_IndexState]:
+        from .snapshot import load_snapshot
+        loaded = load_snapshot(self._snapshot_path(cache_dir, digest))
+        if loaded is None:
+            return None
+        chunks, bm25, hashes, _ = loaded
+        return _IndexState(chunks, bm25, hashes, self._weights(chunks), digest)
+
+    def load_or_build(self, pre_path: str, post_path: str, cache_dir: Optional[str]) -> bool:
+        """Load the mmap-backed snapshot for the current file contents, building and saving it if absent.
+
+        Returns True when an existing snapshot was reused. Without ``cache_dir`` this is ``build``.
+        """
+        if not cache_dir:
+            self.build(pre_path, post_path)
+            return False
+        digest = self.content_digest(pre_path, post_path)
+        state = self._load(cache_dir, digest)
+        if state is not None:
+            self._state = state
+            return True
+        state = self._build_state(pre_path, post_path)
+        state.digest = digest
+        self._state = self._settled(state, pre_path, post_path, cache_dir)
+        return False
+
+    def _settled(self, state: _IndexState, pre_path: str, post_path: str, cache_dir: Optional[str]) -> _IndexState:
+        """A freshly built ``state`` made safe to serve.
+
+        Its chunks read from maps of the source files, which a user can truncate or
+        rewrite. It is served from the snapshot written for it instead: shared with
+        other workers and never rewritten in place. Without one, the source bytes are
+        copied into memory.
+        """
+        if cache_dir and state.digest is not None and self._save_state(state, cache_dir, pre_path, post_path):
+            loaded = self._load(cache_dir, state.digest)
+            if loaded is not None:
+                return loaded
+        if isinstance(state.chunks, RangeChunks):
+            state.chunks.detach()
+        return state
+
+    def save(self, cache_dir: str, pre_path: str, post_path: str) -> None:
+        self._save_state(self._state, cache_dir, pre_path, post_path)
+
+    def _save_state(self, state: _IndexState, cache_dir: str, pre_path: str, post_path: str) -> bool:
+        """Write ``state``'s snapshot; False when it could not be written."""
+        from .snapshot import remove_snapshots, save_snapshot
+        if state.bm25 is None or state.digest is None:
+            return False
+        chunks, bm25, hashes = state.chunks, state.bm25, state.hashes
+        if bm25.overlay_size:
+            bm25, keep = bm25.compact()
+            chunks = [chunks[i] for i in keep]
+            hashes = [hashes[i] for i in keep]
+        path = self._snapshot_path(cache_dir, state.digest)
+        try:
+            save_snapshot(path, chunks, bm25, hashes, {"pre": os.path.abspath(pre_path), "post": os.path.abspath(post_path)})
+            # Snapshots of earlier revisions of this pair are never loaded again
+            remove_snapshots(cache_dir, pre_path, post_path, keep=path)
+        except OSError:
+            # A read-only or full cache dir only costs us the next cold start.
+            return False
+        return True
+
+    def _segments(self, data) -> List[Tuple[bytes, str, int, int]]:
+        """(segment hash, dn, start, end) per MO-aligned segment of ``data`` (bytes or mmap)."""
+        out = []
+        view = memoryview(data)
+        try:
+            for seg in iter_mo_segments(data, self.tags, self.max_chars_per_chunk):
+                out.append((_segment_hash(view[seg.start:seg.end]), seg.dn, seg.start, seg.end))
+        finally:
+            view.release()
+        return out
+
+    def _tokenize(self, paths: Sequence[str], data: Sequence, ranges: List[Tuple[int, int, int]]) -> Tuple[array, Postings]:
+        """Postings for the chunk byte ranges, fanned out over a process pool for large builds."""
+        workers = self.workers or os.cpu_count() or 1
+        if workers <= 1 or len(ranges) < 2 or sum(end - start for _, start, end in ranges) < self.parallel_min_bytes:
+            return _postings(data[f][start:end].decode("utf-8", errors="ignore") for f, start, end in ranges)
+        # A few shards per worker evens out MOs of very different sizes
+        shards = _split_shards(ranges, workers * 4)
+        with ProcessPoolExecutor(workers) as pool:
+            return _merge_postings(pool.map(_shard_postings, [paths] * len(shards), shards))
 
     def build(self, pre_path: str, post_path: str) -> None:
-        self.chunks.clear()
-        pre_text = _read_text(pre_path)
-        post_text = _read_text(post_path)
-        pre_chunks = _chunk_xml(pre_text, self.max_chars_per_chunk)
-        post_chunks = _chunk_xml(post_text, self.max_chars_per_chunk)
-        for i, c in enumerate(pre_chunks):
-            self.chunks.append(DocumentChunk("pre", i, _normalize_space(c)))
-        for i, c in enumerate(post_chunks):
-            self.chunks.append(DocumentChunk("post", i, _normalize_space(c)))
-        self.bm25 = SimpleBM25([c.text for c in self.chunks])
+        """Index both files without a snapshot; the chunks hold a private copy of the file bytes."""
+        self._state = self._settled(self._build_state(pre_path, post_path), pre_path, post_path, None)
+
+    def _build_state(self, pre_path: str, post_path: str) -> _IndexState:
+        """Index both files as byte ranges into read-only maps of them; no chunk text is materialized."""
+        paths = (pre_path, post_path)
+        data = [_map_file(p) for p in paths]
+        chunks = RangeChunks(paths, data)
+        hashes: List[bytes] = []
+        for source, cid, twin, file_idx, (h, dn, start, end) in _pair_segments(self._segments(data[0]), self._segments(data[1])):
+            chunks.append(source, cid, twin, file_idx, start, end, dn)
+            hashes.append(h)
+        bm25 = SimpleBM25.from_postings(*self._tokenize(paths, data, chunks.ranges()))
+        return _IndexState(chunks, bm25, hashes, self._weights(chunks))
+
+    def refresh(self, pre_path: str, post_path: str, cache_dir: Optional[str] = None) -> Dict[str, int]:
+        """Re-index only what changed on disk and swap the result in atomically.
+
+        Files are re-segmented (a cheap tag scan) and paired, and each chunk's raw-byte
+        hash is matched against the live chunks of the same source; only unmatched
+        chunks are normalized and tokenized. A chunk that stops being shared by pre and
+        post is replaced by its one-sided version. In-flight queries keep using the
+        previous state. A full rebuild is served from its snapshot in ``cache_dir``
+        like ``load_or_build``.
+        """
+        state = self._state
+        # Live chunks never read the files (see _settled), so they can be diffed against whatever is on disk now
+        if state.bm25 is None:
+            fresh = self._build_state(pre_path, post_path)
+            fresh.digest = self.content_digest(pre_path, post_path)
+            self._state = self._settled(fresh, pre_path, post_path, cache_dir)
+            return {"added": len(self.chunks), "removed": 0, "unchanged": 0}
+
+        live: Dict[Tuple[str, bytes], List[int]] = {}
+        # Fresh ids never collide with live ones, so snippet ids stay stable across refreshes
+        next_id = {"pre": 0, "post": 0}
+        for idx, h in enumerate(state.hashes):
+            if idx in state.bm25.deleted:
+                continue
+            source, cid, twin = chunk_meta(state.chunks, idx)
+            live.setdefault((source, h), []).append(idx)
+            side = "post" if source == "post" else "pre"
+            next_id[side] = max(next_id[side], cid + 1)
+            if twin >= 0:
+                next_id["post"] = max(next_id["post"], twin + 1)
+
+        added: List[DocumentChunk] = []
+        added_hashes: List[bytes] = []
+        unchanged = 0
+        data = [_read_bytes(pre_path), _read_bytes(post_path)]
+        for source, _, _, file_idx, (h, dn, start, end) in _pair_segments(self._segments(data[0]), self._segments(data[1])):
+            ids = live.get((source, h))
+            if ids:
+                ids.pop()
+                unchanged += 1
+                continue
+            side = "post" if source == "post" else "pre"
+            cid = next_id[side]
+            next_id[side] += 1
+            twin = -1
+            if source == SHARED:
+                twin = next_id["post"]
+                next_id["post"] += 1
+            raw = data[file_idx][start:end]
+            added.append(DocumentChunk(source, cid, _normalize_space(raw.decode("utf-8", errors="ignore")), dn, twin))
+            added_hashes.append(h)
+        removed = {idx: state.chunks[idx].text for ids in live.values() for idx in ids}
+
+        bm25 = state.bm25.with_changes(removed, [c.text for c in added])
+        chunks: Sequence[DocumentChunk] = state.chunks
+        if added:
+            if isinstance(chunks, _AppendedChunks):
+                chunks = _AppendedChunks(chunks.base, chunks.extra + added)
+            else:
+                chunks = _AppendedChunks(chunks, added)
+        hashes = state.hashes + added_hashes
+        weights = array("d", state.weights)
+        weights.extend(self._weights(added))
+        if bm25.overlay_size > self.COMPACT_RATIO * max(bm25.N, 1):
+            bm25, keep = bm25.compact()
+            chunks = [chunks[i] for i in keep]
+            hashes = [hashes[i] for i in keep]
+            weights = array("d", (weights[i] for i in keep))
+        self._state = _IndexState(chunks, bm25, hashes, weights, self.content_digest(pre_path, post_path))
+        return {"added": len(added), "removed": len(removed), "unchanged": unchanged}
 
     def top_k(self, query: str, k: int) -> List[DocumentChunk]:
-        if not self.bm25:
+        state = self._state
+        if not state.bm25:
             return []
-        scored = self.bm25.score_query(query)
-        top = [self.chunks[idx] for idx, _ in scored[:k]]
+        scored = state.bm25.top_k(query, k, state.weights)
+        top = [state.chunks[idx] for idx, _ in scored]
         return top
 
-
+    def top_k_many(self, queries: Sequence[str], k: int) -> List[List[DocumentChunk]]:
+        state = self._state
+        if not state.bm25:
+            return [[] for _ in queries]
+        return [[state.chunks[idx] for idx, _ in scored] for scored in state.bm25.top_k_many(queries, k, state.weights)]
@@ -1,6 +1,8 @@
-from typing import List
+from typing import List, Sequence, Set
 from dataclasses import dataclass
-from .indexer import RAGIndexer, DocumentChunk
+from services.compact_xml import common_prefix, diff_lines, iter_params, param_lines, relative, render
+from services.metrics import span
+from .indexer import SHARED, RAGIndexer, DocumentChunk
 
 
 @dataclass
@@ -8,6 +10,7 @@ class RetrievedContext:
     """Small, minimal payload to send to LLM to reduce tokens."""
     formatted: str  # Pre-formatted context with source labels and chunk ids
     ids: List[str]  # e.g., ["pre:1", "post:3"]
+    raw_chars: int = 0  # size of the retrieved chunks as XML, before compact rendering
 
 
 class Retriever:
@@ -15,9 +18,43 @@ class Retriever:
         self.indexer = indexer
 
     def retrieve(self, query: str, k: int) -> RetrievedContext:
-        top: List[DocumentChunk] = self.indexer.top_k(query, k)
-        ids: List[str] = [f"{c.source}:{c.chunk_id}" for c in top]
-        blocks: List[str] = [f"[{c.source.upper()} #{c.chunk_id}]\n{c.text}" for c in top]
-        return RetrievedContext(formatted="\n\n".join(blocks), ids=ids)
+        with span("retrieve.top_k"):
+            top: List[DocumentChunk] = self.indexer.top_k(query, k)
+        with span("retrieve.format"):
+            return self._format(top)
 
+    def retrieve_many(self, queries: Sequence[str], k: int) -> List[RetrievedContext]:
+        """``retrieve`` for a batch of queries, scoring the index once for all of them."""
+        with span("retrieve.top_k"):
+            tops = self.indexer.top_k_many(queries, k)
+        with span("retrieve.format"):
+            return [self._format(top) for top in tops]
 
+    def _format(self, top: List[DocumentChunk]) -> RetrievedContext:
+        ids: List[str] = [i for c in top for i in c.ids]
+        prefix = common_prefix(c.dn for c in top if c.dn)
+        blocks: List[str] = [f"DN prefix: {prefix}"] if top and prefix else []
+        merged: Set[int] = set()
+        for n, c in enumerate(top):
+            if n in merged:
+                continue
+            where = relative(c.dn, prefix)
+            where = f" {where}" if where else ""
+            # Content shared by pre and post is one chunk, shown once
+            if c.source == SHARED:
+                blocks.append(f"[{c.label}{where}] (identical)\n{render(param_lines(iter_params(c.text, c.dn)), c.dn)}")
+                continue
+            # Both versions of a changed chunk retrieved: one block with only the differences spelled out
+            twin = next((m for m in range(n + 1, len(top)) if m not in merged and top[m].dn == c.dn
+                         and {top[m].source, c.source} == {"pre", "post"}), None)
+            if twin is not None:
+                pre, post = (c, top[twin]) if c.source == "pre" else (top[twin], c)
+                params = diff_lines(list(iter_params(pre.text, c.dn)), list(iter_params(post.text, c.dn)))
+                changed = sum(1 for _, _, value in params if not value.startswith("="))
+                # Parts of a split MO share a DN; only merge versions that are mostly the same
+                if changed * 2 <= len(params):
+                    merged.add(twin)
+                    blocks.append(f"[{pre.label} / {post.label}{where}] (changed)\n{render(params, c.dn)}")
+                    continue
+            blocks.append(f"[{c.label}{where}]\n{render(param_lines(iter_params(c.text, c.dn)), c.dn)}")
+        return RetrievedContext(formatted="\n\n".join(blocks), ids=ids, raw_chars=sum(len(c.text) for c in top))
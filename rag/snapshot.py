@@ -0,0 +1,276 @@
+"""Versioned on-disk snapshots of a built RAGIndexer.
+
+A snapshot is one binary file: a small JSON header followed by 8-byte aligned
+array sections (document lengths, postings, a sorted term table and the chunk
+text blob). Loading memory-maps the file and exposes every section as a
+``memoryview`` cast to its array type, so gunicorn workers that load the same
+snapshot share the physical pages instead of each holding a private copy.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections.abc import Mapping, Sequence
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from .indexer import DocumentChunk, SimpleBM25
+
+
+MAGIC = b"RAGIDX\0\0"
+SNAPSHOT_VERSION = 3
+_ALIGN = 8
+
+
+class MappedVocab(Mapping):
+    """Read-only term -> (postings offset, df) lookup by binary search over the sorted term table."""
+
+    def __init__(self, term_offsets: memoryview, term_blob: memoryview, term_post: memoryview, term_df: memoryview) -> None:
+        self._offsets = term_offsets
+        self._blob = term_blob
+        self._post = term_post
+        self._df = term_df
+
+    def _term(self, i: int) -> bytes:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+    def __len__(self) -> int:
+        return len(self._post)
+
+    def __getitem__(self, term: str) -> Tuple[int, int]:
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self._post)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._post) and self._term(lo) == key:
+            return self._post[lo], self._df[lo]
+        raise KeyError(term)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self._post)):
+            yield self._term(i).decode("utf-8")
+
+
+class MappedChunks(Sequence):
+    """DocumentChunk view over the snapshot; chunk text is decoded only when accessed."""
+
+    def __init__(self, sources: List[str], source_idx: memoryview, chunk_ids: memoryview, twin_ids: memoryview, offsets: memoryview,
+                 blob: memoryview, dn_offsets: memoryview, dn_blob: memoryview) -> None:
+        self._sources = sources
+        self._source_idx = source_idx
+        self._chunk_ids = chunk_ids
+        self._twin_ids = twin_ids
+        self._offsets = offsets
+        self._blob = blob
+        self._dn_offsets = dn_offsets
+        self._dn_blob = dn_blob
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    def __getitem__(self, i: int) -> DocumentChunk:  # type: ignore[override]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        text = bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+        dn = bytes(self._dn_blob[self._dn_offsets[i]:self._dn_offsets[i + 1]]).decode("utf-8")
+        return DocumentChunk(self._sources[self._source_idx[i]], self._chunk_ids[i], text, dn, self._twin_ids[i])
+
+    def meta(self, i: int) -> Tuple[str, int, int]:
+        return self._sources[self._source_idx[i]], self._chunk_ids[i], self._twin_ids[i]
+
+
+def _sections_for(chunks: Sequence, bm25: SimpleBM25, hashes: Sequence[bytes]) -> Tuple[Dict[str, Any], List[str]]:
+    sources: List[str] = []
+    source_idx = array("B")
+    chunk_ids = array("I")
+    twin_ids = array("i")
+    chunk_offsets = array("Q", [0])
+    chunk_blob = bytearray()
+    dn_offsets = array("Q", [0])
+    dn_blob = bytearray()
+    for c in chunks:
+        if c.source not in sources:
+            sources.append(c.source)
+        source_idx.append(sources.index(c.source))
+        chunk_ids.append(c.chunk_id)
+        twin_ids.append(c.twin_id)
+        chunk_blob += c.text.encode("utf-8")
+        chunk_offsets.append(len(chunk_blob))
+        dn_blob += c.dn.encode("utf-8")
+        dn_offsets.append(len(dn_blob))
+
+    term_offsets = array("Q", [0])
+    term_blob = bytearray()
+    term_post = array("I")
+    term_df = array("I")
+    for term in sorted(bm25.vocab, key=lambda t: t.encode("utf-8")):
+        off, df = bm25.vocab[term]
+        term_blob += term.encode("utf-8")
+        term_offsets.append(len(term_blob))
+        term_post.append(off)
+        term_df.append(df)
+
+    sections = {
+        "doc_len": array("I", bm25.doc_len),
+        "norm": array("d", bm25._norm),
+        "post_docs": array("I", bm25.post_docs),
+        "post_tfs": array("I", bm25.post_tfs),
+        "term_offsets": term_offsets,
+        "term_blob": array("B", term_blob),
+        "term_post": term_post,
+        "term_df": term_df,
+        "chunk_source": source_idx,
+        "chunk_id": chunk_ids,
+        "chunk_twin": twin_ids,
+        "chunk_offsets": chunk_offsets,
+        "chunk_blob": array("B", chunk_blob),
+        "chunk_dn_offsets": dn_offsets,
+        "chunk_dn_blob": array("B", dn_blob),
+        "chunk_hashes": array("B", b"".join(hashes)),
+    }
+    return sections, sources
+
+
+def save_snapshot(path: str, chunks: Sequence, bm25: SimpleBM25, hashes: Sequence[bytes], meta: Optional[Dict[str, Any]] = None) -> None:
+    """Write the snapshot atomically (temp file + rename) so concurrent workers never see a partial file.
+
+    ``bm25`` must be compacted (no tombstones or overlay) and ``hashes`` holds one
+    16-byte segment digest per chunk.
+    """
+    sections, sources = _sections_for(chunks, bm25, hashes)
+    header: Dict[str, Any] = {
+        "version": SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "k1": bm25.k1,
+        "b": bm25.b,
+        "avgdl": bm25.avgdl,
+        "sources": sources,
+        "meta": meta or {},
+        "sections": {},
+    }
+    # Section offsets are relative to the data area that follows the padded header.
+    pos = 0
+    for name, arr in sections.items():
+        nbytes = len(arr) * arr.itemsize
+        header["sections"][name] = [pos, nbytes, arr.typecode]
+        pos += nbytes + (-nbytes % _ALIGN)
+    header_bytes = json.dumps(header).encode("utf-8")
+    prefix_len = len(MAGIC) + 4 + len(header_bytes)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * (-prefix_len % _ALIGN))
+            for arr in sections.values():
+                f.write(arr.tobytes())
+                f.write(b"\0" * (-(len(arr) * arr.itemsize) % _ALIGN))
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _read_header(f) -> Optional[Dict[str, Any]]:
+    prefix = f.read(len(MAGIC) + 4)
+    if len(prefix) < len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+        return None
+    (header_len,) = struct.unpack_from("<I", prefix, len(MAGIC))
+    raw = f.read(header_len)
+    if len(raw) < header_len:
+        return None
+    try:
+        header = json.loads(raw.decode("utf-8"))
+    except ValueError:
+        return None
+    return header if isinstance(header, dict) else None
+
+
+def load_snapshot(path: str) -> Optional[Tuple[MappedChunks, SimpleBM25, List[bytes], Dict[str, Any]]]:
+    """Memory-map a snapshot; returns None when it is missing, foreign, from another version or damaged.
+
+    An unreadable or unmappable file (cache dir is a file, no permission, empty file)
+    counts as missing too, so the caller rebuilds instead of failing to start.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            if header is None or header.get("version") != SNAPSHOT_VERSION or header.get("byteorder") != sys.byteorder:
+                return None
+            data_start = f.tell()
+            data_start += -data_start % _ALIGN
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        return _map_sections(mm, data_start, header)
+    except (KeyError, IndexError, TypeError, ValueError, struct.error):
+        # Truncated or corrupted past the header: the caller rebuilds the index
+        return None
+
+
+def _map_sections(mm: mmap.mmap, data_start: int, header: Dict[str, Any]) -> Tuple[MappedChunks, SimpleBM25, List[bytes], Dict[str, Any]]:
+    view = memoryview(mm)
+    s: Dict[str, memoryview] = {}
+    for name, (off, nbytes, typecode) in header["sections"].items():
+        end = data_start + off + nbytes
+        if off < 0 or nbytes < 0 or end > len(mm):
+            raise ValueError(f"section {name} runs past the end of the file")
+        s[name] = view[data_start + off:end].cast(typecode)
+
+    vocab = MappedVocab(s["term_offsets"], s["term_blob"], s["term_post"], s["term_df"])
+    bm25 = SimpleBM25.from_arrays(
+        vocab, s["post_docs"], s["post_tfs"], s["doc_len"],
+        norm=s["norm"], avgdl=header["avgdl"], k1=header["k1"], b=header["b"],
+    )
+    chunks = MappedChunks(
+        header["sources"], s["chunk_source"], s["chunk_id"], s["chunk_twin"], s["chunk_offsets"], s["chunk_blob"],
+        s["chunk_dn_offsets"], s["chunk_dn_blob"],
+    )
+    if len(chunks) != len(s["doc_len"]):
+        raise ValueError("chunk and document counts differ")
+    raw_hashes = s["chunk_hashes"]
+    hashes = [bytes(raw_hashes[i:i + 16]) for i in range(0, len(raw_hashes), 16)]
+    return chunks, bm25, hashes, header["meta"]
+
+
+def remove_snapshots(cache_dir: str, pre_path: str, post_path: str, keep: Optional[str] = None) -> int:
+    """Delete the snapshots in ``cache_dir`` built from ``pre_path``/``post_path``, except ``keep``.
+
+    Used once a newer snapshot of the same pair is saved, and when a session is
+    deleted. Workers that still map a removed file keep their pages until they let
+    go of it. Returns the number of files removed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    wanted = (os.path.abspath(pre_path), os.path.abspath(post_path))
+    keep = os.path.abspath(keep) if keep else None
+    removed = 0
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(".idx") or os.path.abspath(entry.path) == keep:
+            continue
+        try:
+            with open(entry.path, "rb") as f:
+                header = _read_header(f)
+            meta = (header or {}).get("meta") or {}
+            if (os.path.abspath(meta.get("pre", "")), os.path.abspath(meta.get("post", ""))) != wanted:
+                continue
+            os.unlink(entry.path)
+            removed += 1
+        except (OSError, struct.error):
+            continue
+    return removed
@@ -0,0 +1,78 @@
+"""Poll the pre/post files and refresh the RAG index in place when they change."""
+from typing import Callable, Dict, Optional, Tuple
+import logging
+import os
+import threading
+
+from .indexer import RAGIndexer
+
+
+log = logging.getLogger(__name__)
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class IndexWatcher:
+    """Background thread that calls ``indexer.refresh`` after the watched files change.
+
+    A change is acted on only once the files' (mtime, size) have been stable for one
+    extra poll, so a dump that is still being copied in is not indexed half-written.
+    """
+
+    def __init__(
+        self,
+        indexer: RAGIndexer,
+        pre_path: str,
+        post_path: str,
+        interval_sec: float = 2.0,
+        cache_dir: Optional[str] = None,
+        on_refresh: Optional[Callable[[Dict[str, int]], None]] = None,
+    ) -> None:
+        self.indexer = indexer
+        self.paths = (pre_path, post_path)
+        self.interval_sec = interval_sec
+        self.cache_dir = cache_dir
+        self.on_refresh = on_refresh
+        self._seen = tuple(_stat_key(p) for p in self.paths)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "IndexWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def check(self) -> Optional[Dict[str, int]]:
+        """One poll; returns refresh stats when a settled change was indexed."""
+        current = tuple(_stat_key(p) for p in self.paths)
+        if current == self._seen or None in current:
+            return None
+        if self._stop.wait(self.interval_sec):
+            return None
+        if tuple(_stat_key(p) for p in self.paths) != current:
+            return None  # still being written; look again next poll
+        stats = self.indexer.refresh(*self.paths, cache_dir=self.cache_dir)
+        self._seen = current
+        if self.cache_dir:
+            self.indexer.save(self.cache_dir, *self.paths)
+        log.info("reindexed %s: %s", ", ".join(self.paths), stats)
+        if self.on_refresh:
+            self.on_refresh(stats)
+        return stats
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.check()
+            except Exception:
+                log.exception("incremental reindex failed; keeping the previous index")
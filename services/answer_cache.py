@@ -0,0 +1,195 @@
+"""Two-tier cache for chat answers.
+
+Keys combine the normalised question with the model, the prompt version and the
+content digests of pre/post, so a new dump or a prompt change simply stops hitting
+old entries; nothing has to be invalidated explicitly. The first tier is an
+in-process LRU bounded by entry count and bytes; the optional second tier is a
+directory of JSON files that every gunicorn worker on the host shares. Writers
+prune that directory every ``prune_interval_sec``: files older than the TTL go
+first, then the oldest ones until it fits ``disk_max_bytes``.
+"""
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+
+def normalize_query(query: str) -> str:
+    q = re.sub(r"\s+", " ", (query or "").strip().lower())
+    return q.rstrip(" ?.!")
+
+
+def make_key(query: str, *parts: str) -> str:
+    h = hashlib.sha256(normalize_query(query).encode("utf-8"))
+    for p in parts:
+        h.update(b"\0")
+        h.update(str(p).encode("utf-8"))
+    return h.hexdigest()
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 16 << 20,
+        ttl_sec: float = 3600.0,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 256 << 20,
+        prune_interval_sec: float = 60.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.prune_interval_sec = prune_interval_sec
+        self._next_prune = 0.0  # monotonic time of the next disk prune; the first write prunes
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._mem.move_to_end(key)
+                    self.hits_memory += 1
+                    return entry[2]
+                self._drop(key)
+        value = self._disk_get(key, now) if self.disk_dir else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+        self._mem_put(key, value, now + self.ttl_sec)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl_sec
+        self._mem_put(key, value, expires_at)
+        if self.disk_dir:
+            self._disk_put(key, value, expires_at)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "entries": len(self._mem),
+                "bytes": self._bytes,
+            }
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._mem.pop(key)
+        self._bytes -= size
+
+    def _mem_put(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._mem:
+                self._drop(key)
+            self._mem[key] = (expires_at, size, value)
+            self._bytes += size
+            while len(self._mem) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._mem)))
+                self.evictions += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("expires_at", 0) <= now:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return record.get("value")
+
+    def _disk_put(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f)
+            os.replace(tmp, path)
+        except OSError:
+            # The shared tier is best effort; the in-process tier already holds the answer
+            pass
+        with self._lock:
+            due = time.monotonic() >= self._next_prune
+            if due:
+                self._next_prune = time.monotonic() + self.prune_interval_sec
+        if due:
+            self.prune_disk()
+
+    def prune_disk(self) -> int:
+        """Remove expired disk entries, then the oldest until the tier fits ``disk_max_bytes``; returns the count.
+
+        Age is the file's mtime, i.e. when the answer was written, so no file is read.
+        Other workers may prune or write concurrently; vanished files are skipped.
+        """
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return 0
+        files = []
+        cutoff = time.time() - self.ttl_sec
+        removed = 0
+        for sub in os.scandir(self.disk_dir):
+            try:
+                entries = list(os.scandir(sub.path)) if sub.is_dir() else []
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                # Expired answers, and temp files left behind by an interrupted write
+                if st.st_mtime <= cutoff or (entry.name.endswith(".tmp") and st.st_mtime <= time.time() - 60):
+                    removed += _unlink(entry.path)
+                else:
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if total > self.disk_max_bytes:
+            files.sort()
+            for _, size, path in files:
+                if total <= self.disk_max_bytes:
+                    break
+                removed += _unlink(path)
+                total -= size
+        with self._lock:
+            self.disk_evictions += removed
+        return removed
+
+
+def _unlink(path: str) -> int:
+    try:
+        os.unlink(path)
+        return 1
+    except OSError:
+        return 0
@@ -0,0 +1,128 @@
+"""Compare many pre/post node pairs in parallel and stream per-node results.
+
+Pairs come from two directories (matched by file name) or from a manifest. Each
+pair is compared in a worker process with the streaming comparator, so a worker
+only ever holds one managed element, and only a small per-node summary travels
+back to the parent. Submission is bounded and largest-first: idle workers pull the
+next pending pair as soon as they finish, so a few huge nodes start early instead
+of stalling the tail of the batch.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import csv
+import json
+import os
+
+from services.comparator import iter_differences
+
+
+NodePair = Tuple[str, str, str]  # (node id, pre path, post path)
+
+SAMPLE_DIFFERENCES = 20
+TOP_PARAMETERS = 10
+
+
+def discover_pairs(pre_dir: str, post_dir: str) -> List[NodePair]:
+    """Pair ``*.xml`` files present under the same name in both directories."""
+    pre_files = {n for n in os.listdir(pre_dir) if n.lower().endswith(".xml")}
+    post_files = {n for n in os.listdir(post_dir) if n.lower().endswith(".xml")}
+    return [
+        (os.path.splitext(name)[0], os.path.join(pre_dir, name), os.path.join(post_dir, name))
+        for name in sorted(pre_files & post_files)
+    ]
+
+
+def load_manifest(path: str) -> List[NodePair]:
+    """Read pairs from JSON lines (``{"node", "pre", "post"}``) or CSV (``node,pre,post``).
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    rows: List[Tuple[str, str, str]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith((".json", ".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    obj = json.loads(line)
+                    rows.append((str(obj["node"]), obj["pre"], obj["post"]))
+        else:
+            for rec in csv.reader(f):
+                if not rec or rec[0].startswith("#") or rec[0] == "node":
+                    continue
+                rows.append((rec[0], rec[1], rec[2]))
+    return [(node, os.path.join(base, pre), os.path.join(base, post)) for node, pre, post in rows]
+
+
+def compare_pair(node: str, pre_path: str, post_path: str) -> Dict[str, Any]:
+    """Worker entry point: summarise one node's differences without keeping them all."""
+    params: Counter = Counter()
+    samples: List[Dict[str, Any]] = []
+    counts = {"value": 0, "only_in_pre": 0, "only_in_post": 0, "path": 0, "frequency": 0}
+    try:
+        for diff in iter_differences(pre_path, post_path):
+            kind = diff.pop("kind")
+            counts[kind] += 1
+            if kind == "value":
+                params[diff["tag"]] += 1
+            if kind in ("value", "only_in_pre", "only_in_post") and len(samples) < SAMPLE_DIFFERENCES:
+                diff["kind"] = kind
+                samples.append(diff)
+    except Exception as e:
+        return {"node": node, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "node": node,
+        "changed": any(counts.values()),
+        "value_difference_count": counts["value"],
+        "only_in_pre_mos": counts["only_in_pre"],
+        "only_in_post_mos": counts["only_in_post"],
+        "structure_same": counts["path"] == 0,
+        "changed_parameters": dict(params.most_common()),
+        "differences": samples,
+    }
+
+
+def _size(pair: NodePair) -> int:
+    try:
+        return os.path.getsize(pair[1]) + os.path.getsize(pair[2])
+    except OSError:
+        return 0
+
+
+def iter_batch(pairs: List[NodePair], workers: Optional[int] = None, max_in_flight: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield one result per node as it completes, then a final ``{"summary": ...}`` record."""
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    queue = sorted(pairs, key=_size)  # pop() from the end hands out the largest pairs first
+
+    params: Counter = Counter()
+    nodes = changed = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running: Dict[Future, str] = {}
+        while queue or running:
+            while queue and len(running) < max_in_flight:
+                pair = queue.pop()
+                running[pool.submit(compare_pair, *pair)] = pair[0]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                node = running.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    result = {"node": node, "error": f"{type(e).__name__}: {e}"}
+                nodes += 1
+                if "error" in result:
+                    failed += 1
+                elif result["changed"]:
+                    changed += 1
+                    params.update(result["changed_parameters"])
+                yield result
+
+    yield {
+        "summary": {
+            "nodes": nodes,
+            "nodes_changed": changed,
+            "nodes_failed": failed,
+            "top_changed_parameters": params.most_common(TOP_PARAMETERS),
+        }
+    }
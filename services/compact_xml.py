@@ -0,0 +1,144 @@
+"""Render bulkCm XML fragments as compact ``DN.param=value`` lines for prompts.
+
+Most of a raw chunk's tokens are markup: namespaced open and close tags, the
+``attributes`` wrappers, ``xmlns`` declarations. Here each leaf becomes one line,
+``param=value`` inside the fragment's own MO or ``Tag=id.param=value`` for nested
+MOs, with the DN shared by every line of the context stated once as a prefix.
+
+The input is a chunk or MO segment: a byte range of the file that need not be
+well-formed (a split segment can start or end inside its owner), so tags are read
+with a regex, the same way ``rag.chunker`` does, and unmatched tags are skipped.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import re
+
+
+_TAG_RE = re.compile(r"<(/?)(?:[A-Za-z_][\w.\-]*:)?([A-Za-z_][\w.\-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*?)(/?)>")
+_ATTR_RE = re.compile(r"""(?:([A-Za-z_][\w.\-]*):)?([A-Za-z_][\w.\-]*)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_WRAPPERS = {"attributes"}  # elements that only group parameters, dropped from parameter paths
+
+
+def iter_params(text: str, dn: str = "") -> Iterator[Tuple[str, str, str]]:
+    """(DN, parameter path, value) per leaf of ``text``, whose own MO is ``dn``."""
+    # Open elements: (local name, DN, parameter path inside that DN, has child elements)
+    stack: List[list] = []
+    owner_seen = False
+    start = 0
+    for m in _TAG_RE.finditer(text):
+        closing, name, attrs, selfclosing = m.groups()
+        if closing:
+            if not stack or stack[-1][0] != name:
+                continue  # closes something opened before this fragment
+            frame = stack.pop()
+            if not frame[3] and frame[2]:
+                yield frame[1], frame[2], text[start:m.start()].strip()
+            continue
+        cur_dn, cur_path = (stack[-1][1], stack[-1][2]) if stack else (dn, "")
+        if stack:
+            stack[-1][3] = True
+        mo_id = None
+        extra = []
+        for am in _ATTR_RE.finditer(attrs):
+            prefix, key, value = am.group(1), am.group(2), am.group(3) if am.group(3) is not None else am.group(4)
+            if prefix == "xmlns" or (prefix is None and key == "xmlns"):
+                continue
+            if key == "id":
+                mo_id = value
+            else:
+                extra.append((key, value))
+        if mo_id is not None:
+            part = f"{name}={mo_id}"
+            if not owner_seen and not stack and dn.rsplit(",", 1)[-1] == part:
+                new_dn = dn  # the fragment's own MO, already named by ``dn``
+            else:
+                new_dn = f"{cur_dn},{part}" if cur_dn else part
+            owner_seen = True
+            new_path = ""
+        else:
+            new_dn = cur_dn
+            new_path = cur_path if name in _WRAPPERS else (f"{cur_path}/{name}" if cur_path else name)
+        for key, value in extra:
+            yield new_dn, f"{new_path}@{key}" if new_path else f"@{key}", value
+        if selfclosing:
+            if mo_id is None and new_path and not extra:
+                yield new_dn, new_path, ""
+            continue
+        stack.append([name, new_dn, new_path, False])
+        start = m.end()
+
+
+def common_prefix(dns: Iterable[str]) -> str:
+    """Longest run of leading DN components shared by every DN."""
+    common: Optional[List[str]] = None
+    for dn in dns:
+        parts = dn.split(",") if dn else []
+        if common is None:
+            common = parts
+            continue
+        n = 0
+        while n < len(common) and n < len(parts) and common[n] == parts[n]:
+            n += 1
+        del common[n:]
+    return ",".join(common or [])
+
+
+def relative(dn: str, prefix: str) -> str:
+    if not prefix:
+        return dn
+    if dn == prefix:
+        return ""
+    return dn[len(prefix) + 1:] if dn.startswith(prefix + ",") else dn
+
+
+def param_lines(params: Iterable[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+    """(DN, parameter path, rendered value) per leaf, ready for ``render``."""
+    return [(dn, param, f"={value}") for dn, param, value in params]
+
+
+def diff_lines(pre: Sequence[Tuple[str, str, str]], post: Sequence[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+    """Two versions of a fragment for ``render``: shared leaves once, the rest as ``param: pre=X post=Y``.
+
+    Repeated leaves are matched by occurrence; leaves missing from pre follow the
+    pre-ordered ones.
+    """
+    def keyed(params):
+        seen: Dict[Tuple[str, str], int] = {}
+        out = {}
+        for dn, param, value in params:
+            n = seen.get((dn, param), 0)
+            seen[(dn, param)] = n + 1
+            out[(dn, param, n)] = value
+        return out
+
+    before, after = keyed(pre), keyed(post)
+    items = []
+    for (dn, param, n), value in before.items():
+        other = after.get((dn, param, n))
+        if other == value:
+            items.append((dn, param, f"={value}"))
+        else:
+            items.append((dn, param, f": pre={value} post={'(absent)' if other is None else other}"))
+    items.extend((dn, param, f": pre=(absent) post={value}") for (dn, param, n), value in after.items() if (dn, param, n) not in before)
+    return items
+
+
+def render(items: Sequence[Tuple[str, str, str]], dn: str = "") -> str:
+    """One line per leaf under a ``Tag=id.path:`` header (relative to ``dn``) whenever the MO or parent path changes."""
+    out = []
+    current = (dn, "")
+    for item_dn, param, value in items:
+        parent, _, leaf = param.rpartition("/")
+        if (item_dn, parent) != current:
+            current = (item_dn, parent)
+            rel = relative(item_dn, dn)
+            out.append(f"{rel}.{parent}:" if rel and parent else f"{rel or parent or '.'}:")
+        out.append(leaf + value)
+    return "\n".join(out)
+
+
+def compact(text: str, dn: str = "") -> str:
+    return render(param_lines(iter_params(text, dn)), dn)
+
+
+def compression_ratio(raw_chars: int, compact_chars: int) -> float:
+    return raw_chars / compact_chars if compact_chars else 1.0
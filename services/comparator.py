@@ -1,34 +1,72 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union, IO
 import xml.etree.ElementTree as ET
 
+from services.metrics import span
+from services.mo_tree import MONode, build_mo_tree, diff_mo_trees
+
+
+# Subtrees the streaming compare works on, innermost first; each is released once compared.
+STREAM_UNIT_TAGS = ("ENBFunction", "ManagedElement")
+
+
+def _local(tag: str) -> str:
+    return tag.split('}')[-1] if '}' in tag else tag
+
 
 def _iter_paths(root: ET.Element) -> List[str]:
     paths: List[str] = []
-    def walk(node: ET.Element, path: List[str]):
-        tag_name = node.tag.split('}')[-1] if '}' in node.tag else node.tag
-        cur = path + [tag_name]
-        paths.append('/'.join(cur))
-        for child in list(node):
-            walk(child, cur)
-    walk(root, [])
+    # Explicit stack instead of recursion so deep trees cannot hit the recursion limit
+    stack: List[Tuple[ET.Element, str]] = [(root, _local(root.tag))]
+    while stack:
+        node, path = stack.pop()
+        paths.append(path)
+        for child in reversed(list(node)):
+            stack.append((child, path + '/' + _local(child.tag)))
     return paths
 
 
 def _tag_counts(root: ET.Element) -> Dict[str, int]:
     counts: Dict[str, int] = {}
     for elem in root.iter():
-        tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
+        tag_name = _local(elem.tag)
         counts[tag_name] = counts.get(tag_name, 0) + 1
     return counts
 
 
+def _collect_mo_differences(diffs: Iterator[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str], List[str], int]:
+    """Split a diff stream into capped value/MO lists plus the uncapped value-difference count."""
+    values: List[Dict[str, Any]] = []
+    only_pre: List[str] = []
+    only_post: List[str] = []
+    count = 0
+    for diff in diffs:
+        kind = diff.pop("kind")
+        if kind == "value":
+            count += 1
+            if len(values) < 200:
+                values.append(diff)
+        elif kind == "only_in_pre":
+            if len(only_pre) < 50:
+                only_pre.append(diff["dn"])
+        elif kind == "only_in_post":
+            if len(only_post) < 50:
+                only_post.append(diff["dn"])
+    return values, only_pre, only_post, count
+
+
 def compare_xml(pre_text: str, post_text: str) -> Dict[str, Any]:
     try:
-        pre_root = ET.fromstring(pre_text)
-        post_root = ET.fromstring(post_text)
+        with span("compare.parse"):
+            pre_root = ET.fromstring(pre_text)
+            post_root = ET.fromstring(post_text)
     except Exception as e:
         return {"error": f"Failed to parse XML: {e}"}
 
+    with span("compare.diff"):
+        return _compare_roots(pre_root, post_root)
+
+
+def _compare_roots(pre_root: ET.Element, post_root: ET.Element) -> Dict[str, Any]:
     pre_paths = set(_iter_paths(pre_root))
     post_paths = set(_iter_paths(post_root))
 
@@ -46,47 +84,10 @@ def compare_xml(pre_text: str, post_text: str) -> Dict[str, Any]:
         if a != b:
             freq_diffs.append({"tag": t, "pre": a, "post": b})
 
-    # Collect value-level differences for nodes that exist in both trees along the same paths
-    def _collect_leaf_values(root: ET.Element) -> Dict[str, List[str]]:
-        values: Dict[str, List[str]] = {}
-        def walk(node: ET.Element, path: List[str]):
-            tag_name = node.tag.split('}')[-1] if '}' in node.tag else node.tag
-            cur_path = path + [tag_name]
-            children = list(node)
-            # Build a simple value signature: attributes + text content (trimmed)
-            attrs = " ".join(f"{k}={v}" for k, v in sorted(node.attrib.items()))
-            text = (node.text or "").strip()
-            value_sig = (attrs + "|" + text).strip("|")
-            if not children:
-                key = '/'.join(cur_path)
-                values.setdefault(key, []).append(value_sig)
-            for child in children:
-                walk(child, cur_path)
-        walk(root, [])
-        return values
-
-    pre_value_map = _collect_leaf_values(pre_root)
-    post_value_map = _collect_leaf_values(post_root)
-
-    value_differences: List[Dict[str, Any]] = []
-    for path in sorted(set(pre_value_map.keys()) & set(post_value_map.keys())):
-        pre_list = pre_value_map[path]
-        post_list = post_value_map[path]
-        n = min(len(pre_list), len(post_list))
-        for i in range(n):
-            if pre_list[i] != post_list[i]:
-                # Last tag name is the most informative label
-                tag = path.split('/')[-1]
-                value_differences.append({
-                    "tag": tag,
-                    "path": path,
-                    "pre": pre_list[i],
-                    "post": post_list[i],
-                })
-                if len(value_differences) >= 200:
-                    break
-        if len(value_differences) >= 200:
-            break
+    # Value-level differences between managed objects matched by DN; identical subtrees are skipped by digest
+    value_differences, only_in_pre_mos, only_in_post_mos, value_count = _collect_mo_differences(
+        diff_mo_trees(build_mo_tree(pre_root), build_mo_tree(post_root))
+    )
 
     return {
         "structure_same": structure_same,
@@ -95,7 +96,156 @@ def compare_xml(pre_text: str, post_text: str) -> Dict[str, Any]:
         "only_in_pre_paths": only_in_pre,
         "only_in_post_paths": only_in_post,
         "frequency_differences": freq_diffs[:100],
-        "value_differences": value_differences[:200],
+        "value_differences": value_differences,
+        "value_difference_count": value_count,
+        "only_in_pre_mos": only_in_pre_mos,
+        "only_in_post_mos": only_in_post_mos,
     }
 
 
+XmlSource = Union[str, IO[bytes]]
+
+
+class _StreamStats:
+    """Whole-file structure stats gathered during the streaming pass (sized by the schema, not the file)."""
+
+    def __init__(self) -> None:
+        self.paths: set = set()
+        self.counts: Dict[str, int] = {}
+
+
+def _iter_units(source: XmlSource, stats: _StreamStats) -> Iterator[Tuple[str, ET.Element]]:
+    """Yield (dn, element) for each ManagedElement/ENBFunction once it is fully parsed.
+
+    The element is detached from its parent and cleared when the consumer resumes, so
+    only the unit currently being compared is held in memory. Whatever remains outside
+    every unit (file header/footer, SubNetwork attributes) is yielded last as the root.
+    """
+    stack: List[ET.Element] = []
+    names: List[str] = []
+    dn_parts: List[str] = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            stack.append(elem)
+            names.append(tag)
+            if elem.get('id') is not None:
+                dn_parts.append(f"{tag}={elem.get('id')}")
+            stats.paths.add('/'.join(names))
+            stats.counts[tag] = stats.counts.get(tag, 0) + 1
+            continue
+        stack.pop()
+        names.pop()
+        dn = ','.join(dn_parts)
+        if elem.get('id') is not None:
+            dn_parts.pop()
+        if tag in STREAM_UNIT_TAGS or not stack:
+            yield dn, elem
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+
+def iter_differences(pre_source: XmlSource, post_source: XmlSource, stats: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Stream differences between two bulkCm files without loading either whole document.
+
+    Both files are parsed in lockstep and compared one ManagedElement/ENBFunction at a
+    time, so peak memory tracks the largest managed element rather than the file.
+    Units are matched by DN and diffed with diff_mo_trees (``value``, ``only_in_pre``,
+    ``only_in_post`` events); ``path`` and ``frequency`` differences follow once both
+    files are exhausted. When ``stats`` is given it is filled with element totals.
+    """
+    pre_stats, post_stats = _StreamStats(), _StreamStats()
+    pre_units = _iter_units(pre_source, pre_stats)
+    post_units = _iter_units(post_source, post_stats)
+    # Units seen on one side only so far; stays empty while both files list units in the same order
+    pending_pre: Dict[str, MONode] = {}
+    pending_post: Dict[str, MONode] = {}
+
+    pre_done = post_done = False
+    while not (pre_done and post_done):
+        pairs: List[Tuple[MONode, MONode]] = []
+        if not pre_done:
+            unit = next(pre_units, None)
+            if unit is None:
+                pre_done = True
+            else:
+                tree = build_mo_tree(unit[1], unit[0])
+                if unit[0] in pending_post:
+                    pairs.append((tree, pending_post.pop(unit[0])))
+                else:
+                    pending_pre[unit[0]] = tree
+        if not post_done:
+            unit = next(post_units, None)
+            if unit is None:
+                post_done = True
+            else:
+                tree = build_mo_tree(unit[1], unit[0])
+                if unit[0] in pending_pre:
+                    pairs.append((pending_pre.pop(unit[0]), tree))
+                else:
+                    pending_post[unit[0]] = tree
+        for pre_tree, post_tree in pairs:
+            yield from diff_mo_trees(pre_tree, post_tree)
+
+    for dn, tree in pending_pre.items():
+        yield {"kind": "only_in_pre", "tag": tree.tag, "dn": dn}
+    for dn, tree in pending_post.items():
+        yield {"kind": "only_in_post", "tag": tree.tag, "dn": dn}
+    for path in sorted(pre_stats.paths - post_stats.paths):
+        yield {"kind": "path", "side": "pre", "path": path}
+    for path in sorted(post_stats.paths - pre_stats.paths):
+        yield {"kind": "path", "side": "post", "path": path}
+    for t in sorted(set(pre_stats.counts) | set(post_stats.counts)):
+        a = pre_stats.counts.get(t, 0)
+        b = post_stats.counts.get(t, 0)
+        if a != b:
+            yield {"kind": "frequency", "tag": t, "pre": a, "post": b}
+    if stats is not None:
+        stats["total_elements_pre"] = sum(pre_stats.counts.values())
+        stats["total_elements_post"] = sum(post_stats.counts.values())
+
+
+def compare_xml_streaming(pre_source: XmlSource, post_source: XmlSource) -> Dict[str, Any]:
+    """Same result shape as compare_xml, aggregated from iter_differences."""
+    stats: Dict[str, Any] = {}
+    only_in_pre: List[str] = []
+    only_in_post: List[str] = []
+    freq_diffs: List[Dict[str, Any]] = []
+    structure_same = True
+
+    def mo_diffs(diffs: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        nonlocal structure_same
+        for diff in diffs:
+            kind = diff["kind"]
+            if kind == "path":
+                structure_same = False
+                target = only_in_pre if diff["side"] == "pre" else only_in_post
+                if len(target) < 50:
+                    target.append(diff["path"])
+            elif kind == "frequency":
+                if len(freq_diffs) < 100:
+                    freq_diffs.append({"tag": diff["tag"], "pre": diff["pre"], "post": diff["post"]})
+            else:
+                yield diff
+
+    try:
+        with span("compare.streaming"):
+            value_differences, only_in_pre_mos, only_in_post_mos, value_count = _collect_mo_differences(
+                mo_diffs(iter_differences(pre_source, post_source, stats))
+            )
+    except ET.ParseError as e:
+        return {"error": f"Failed to parse XML: {e}"}
+
+    return {
+        "structure_same": structure_same,
+        "total_elements_pre": stats.get("total_elements_pre", 0),
+        "total_elements_post": stats.get("total_elements_post", 0),
+        "only_in_pre_paths": only_in_pre,
+        "only_in_post_paths": only_in_post,
+        "frequency_differences": freq_diffs,
+        "value_differences": value_differences,
+        "value_difference_count": value_count,
+        "only_in_pre_mos": only_in_pre_mos,
+        "only_in_post_mos": only_in_post_mos,
+    }
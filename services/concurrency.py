@@ -0,0 +1,141 @@
+"""Request coalescing and upstream concurrency limits for the gateway-bound endpoints.
+
+``SingleFlight`` lets concurrent callers with the same key share one execution:
+the first caller runs the function, the others wait for its result (or exception).
+``UpstreamLimiter`` bounds how many gateway calls a worker process has in flight
+and fails fast with ``UpstreamBusy`` when it is saturated, so excess load turns
+into quick 503s instead of a queue of threads each holding a connection.
+``RateLimiter`` spaces out call starts, for batch jobs that should not burst.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+import threading
+import time
+
+
+class UpstreamBusy(Exception):
+    """Every upstream slot is taken."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` once per key among concurrent callers; returns (result, shared).
+
+        ``shared`` is True for callers that received another caller's result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking followers, so a later request starts a fresh call
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class UpstreamLimiter:
+    """Counting semaphore around upstream calls; ``max_concurrent`` of None or 0 disables it."""
+
+    def __init__(self, max_concurrent: Optional[int], wait_sec: float = 0.0) -> None:
+        self.max_concurrent = max_concurrent or 0
+        self.wait_sec = wait_sec
+        self._sem = threading.BoundedSemaphore(self.max_concurrent) if self.max_concurrent else None
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, wait_sec: Optional[float] = None) -> Callable[[], None]:
+        """Take a slot or raise UpstreamBusy; returns an idempotent release function.
+
+        ``wait_sec`` overrides the limiter's own wait, e.g. for batch callers that can queue.
+        """
+        wait_sec = self.wait_sec if wait_sec is None else wait_sec
+        if self._sem is not None:
+            if wait_sec > 0:
+                acquired = self._sem.acquire(timeout=wait_sec)
+            else:
+                acquired = self._sem.acquire(blocking=False)
+            if not acquired:
+                raise UpstreamBusy(f"{self.max_concurrent} gateway calls already in flight")
+        with self._lock:
+            self._active += 1
+        released = [False]
+
+        def release() -> None:
+            with self._lock:
+                if released[0]:
+                    return
+                released[0] = True
+                self._active -= 1
+            if self._sem is not None:
+                self._sem.release()
+
+        return release
+
+    def try_acquire(self) -> Optional[Callable[[], None]]:
+        """Take a slot without waiting; its release function, or None when every slot is taken."""
+        try:
+            return self.acquire(0)
+        except UpstreamBusy:
+            return None
+
+    def run(self, fn: Callable[[], Any], wait_sec: Optional[float] = None) -> Any:
+        release = self.acquire(wait_sec)
+        try:
+            return fn()
+        finally:
+            release()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+
+class RateLimiter:
+    """Lets at most ``rate_per_sec`` callers through per second, evenly spaced; None or 0 disables it."""
+
+    def __init__(self, rate_per_sec: Optional[float]) -> None:
+        self.interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
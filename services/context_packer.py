@@ -0,0 +1,146 @@
+"""Token-budgeted prompt context built from whole managed objects.
+
+Replaces blind ``MAX_FULL_CONTEXT_CHARS`` slicing: both files are cut into MO
+segments (rag.chunker), segments of the same DN in pre and post are paired, pairs
+are ranked by BM25 relevance to the question (pairs whose pre and post differ get a
+boost), and the budget is filled greedily. Whatever is included is complete, and
+identical pre/post segments are sent once. Segments are rendered as compact
+parameter lines (services.compact_xml) rather than XML, and a changed pair shows
+its unchanged parameters once.
+"""
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+import math
+import re
+import threading
+
+from rag.chunker import MOSegment, iter_mo_segments
+from rag.indexer import SimpleBM25
+from services.compact_xml import common_prefix, diff_lines, iter_params, param_lines, relative, render
+from services.file_digest import file_digest
+
+
+CHARS_PER_TOKEN = 4  # conservative for tag-heavy XML, generous for parameter lines
+CHANGED_BOOST = 2.0
+_INDENT_RE = re.compile(r"\n[ \t]+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _compact(raw: bytes) -> str:
+    # Indentation is pure token cost; line breaks keep the XML readable
+    return _INDENT_RE.sub("\n", raw.decode("utf-8", errors="ignore")).strip()
+
+
+Params = List[Tuple[str, str, str]]
+
+
+@dataclass
+class SegmentPair:
+    key: str
+    dn: str
+    order: int  # first appearance in document order, pre before post
+    pre: Optional[Params]
+    post: Optional[Params]
+    tokens: int = 0  # estimated cost of render(), filled once the pair is complete
+    raw_chars: int = 0  # size of the same content as indentation-stripped XML
+
+    @property
+    def changed(self) -> bool:
+        return self.pre != self.post
+
+    def render(self, prefix: str = "") -> str:
+        label = relative(self.dn, prefix) or self.dn or "document"
+        if not self.changed:
+            return f"[PRE+POST {label}] (identical)\n{render(param_lines(self.pre or []), self.dn)}"
+        if self.pre is not None and self.post is not None:
+            return f"[PRE/POST {label}] (changed)\n{render(diff_lines(self.pre, self.post), self.dn)}"
+        side, params = ("PRE", self.pre) if self.pre is not None else ("POST", self.post)
+        return f"[{side} {label}]\n{render(param_lines(params or []), self.dn)}"
+
+
+@dataclass
+class PackedContext:
+    text: str
+    ids: List[str]  # pair keys in the order they appear in ``text``
+    tokens: int
+    included: int
+    dropped: int
+    raw_chars: int = 0  # what the included pairs would take as XML
+
+
+class ContextPacker:
+    """Caches the segmented, paired files per content digest; packing is per question."""
+
+    def __init__(self, tags, budget_tokens: int, max_segment_bytes: int = 8000) -> None:
+        self.tags = set(tags)
+        self.budget_tokens = budget_tokens
+        self.max_segment_bytes = max_segment_bytes
+        self._cached: Tuple[Tuple[str, str], List[SegmentPair], Optional[SimpleBM25], str] = (("", ""), [], None, "")
+        self._lock = threading.Lock()
+
+    def _segments(self, path: str) -> List[Tuple[MOSegment, str]]:
+        with open(path, "rb") as f:
+            data = f.read()
+        return [(s, _compact(data[s.start:s.end])) for s in iter_mo_segments(data, self.tags, self.max_segment_bytes)]
+
+    def pairs(self, pre_path: str, post_path: str) -> Tuple[List[SegmentPair], SimpleBM25, str]:
+        """Segment pairs, their BM25 index and the DN prefix shared by all of them."""
+        key = (file_digest(pre_path), file_digest(post_path))
+        with self._lock:
+            if self._cached[0] == key and self._cached[2] is not None:
+                return self._cached[1], self._cached[2], self._cached[3]
+        by_key: Dict[str, SegmentPair] = {}
+        xml: Dict[Tuple[str, str], str] = {}
+        order = 0
+        for side, path in (("pre", pre_path), ("post", post_path)):
+            for seg, text in self._segments(path):
+                pair = by_key.get(seg.key)
+                if pair is None:
+                    pair = by_key[seg.key] = SegmentPair(seg.key, seg.dn, order, None, None)
+                    order += 1
+                setattr(pair, side, list(iter_params(text, seg.dn)))
+                xml[(side, seg.key)] = text
+        pairs = list(by_key.values())
+        prefix = common_prefix(p.dn for p in pairs if p.dn)
+        docs = []
+        for p in pairs:
+            pre_xml, post_xml = xml.get(("pre", p.key)), xml.get(("post", p.key))
+            p.raw_chars = len(pre_xml or "") + (len(post_xml or "") if pre_xml != post_xml else 0)
+            rendered = p.render(prefix)
+            p.tokens = estimate_tokens(rendered) + 1
+            docs.append(rendered)
+        bm25 = SimpleBM25(docs)
+        with self._lock:
+            self._cached = (key, pairs, bm25, prefix)
+        return pairs, bm25, prefix
+
+    def pack(self, query: str, pre_path: str, post_path: str, budget_tokens: Optional[int] = None) -> PackedContext:
+        budget = self.budget_tokens if budget_tokens is None else budget_tokens
+        pairs, bm25, prefix = self.pairs(pre_path, post_path)
+        relevance = dict(bm25.score_query(query))
+        ranked = sorted(
+            range(len(pairs)),
+            key=lambda i: (-(relevance.get(i, 0.0) * (CHANGED_BOOST if pairs[i].changed else 1.0)), pairs[i].order),
+        )
+        chosen: List[int] = []
+        used = 0
+        for i in ranked:
+            if used + pairs[i].tokens <= budget:
+                chosen.append(i)
+                used += pairs[i].tokens
+        # Present in document order so the model sees the hierarchy the way the file has it
+        chosen.sort(key=lambda i: pairs[i].order)
+        blocks = [pairs[i].render(prefix) for i in chosen]
+        if blocks and prefix:
+            blocks.insert(0, f"DN prefix: {prefix}")
+        return PackedContext(
+            text="\n\n".join(blocks),
+            ids=[pairs[i].key for i in chosen],
+            tokens=used,
+            included=len(chosen),
+            dropped=len(pairs) - len(chosen),
+            raw_chars=sum(pairs[i].raw_chars for i in chosen),
+        )
@@ -0,0 +1,145 @@
+"""Every difference between a pre/post pair, filtered, paged and written as NDJSON or CSV.
+
+``compare_xml`` caps its lists for prompts and the UI. This streams
+``iter_differences`` straight through instead, so an export holds one managed
+element at a time however many differences there are. Records keep the
+comparator's order: MO differences in document (DN) order as the two files are
+walked in lockstep, then MOs present on one side only, then path and tag count
+differences. Nothing is sorted or buffered.
+
+A page ends after ``limit`` records with a cursor naming the position reached.
+The cursor is bound to the pair's content digests and to the filters, so it cannot
+resume a different export. Resuming re-reads the files and skips to that
+position: each page costs a streaming pass but no server-side state.
+"""
+from typing import Any, Dict, Iterable, Iterator, Optional
+import csv
+import io
+import json
+import xml.etree.ElementTree as ET
+
+from services.comparator import iter_differences
+from services.file_digest import combined_digest, file_digest
+
+
+EXPORT_KINDS = ("value", "only_in_pre", "only_in_post", "path", "frequency")
+CSV_FIELDS = ("kind", "dn", "mo", "param", "pre", "post", "side", "path")
+
+
+class BadCursor(ValueError):
+    """The cursor is malformed or belongs to other files or filters."""
+
+
+class DiffFilter:
+    """Which differences to export: MO types, parameter names and kinds, all case-insensitive.
+
+    A parameter matches by leaf name (``pci``) or full path inside the MO
+    (``triggerType/event``); only value differences have one. An MO
+    type matches the MO of a value difference, the MO added or removed, or the tag
+    of a count difference.
+    """
+
+    def __init__(self, mo: Iterable[str] = (), param: Iterable[str] = (), kind: Iterable[str] = ()) -> None:
+        self.mo = frozenset(m.lower() for m in mo if m)
+        self.param = frozenset(p.lower() for p in param if p)
+        self.kind = frozenset(k for k in kind if k)
+        unknown = self.kind - set(EXPORT_KINDS)
+        if unknown:
+            raise ValueError(f"unknown kind: {', '.join(sorted(unknown))}")
+
+    def key(self) -> str:
+        return json.dumps([sorted(self.mo), sorted(self.param), sorted(self.kind)])
+
+    def __call__(self, diff: Dict[str, Any]) -> bool:
+        kind = diff["kind"]
+        if self.kind and kind not in self.kind:
+            return False
+        if self.param and (kind != "value" or not ({diff["tag"].lower(), diff["param"].lower()} & self.param)):
+            return False
+        if self.mo:
+            mo = diff.get("mo") if kind == "value" else diff.get("tag")
+            if mo is None or mo.lower() not in self.mo:
+                return False
+        return True
+
+
+def fingerprint(pre_path: str, post_path: str, diff_filter: DiffFilter) -> str:
+    return combined_digest(file_digest(pre_path), file_digest(post_path), diff_filter.key())[:16]
+
+
+def make_cursor(position: int, pair_fingerprint: str) -> str:
+    return f"{position}.{pair_fingerprint}"
+
+
+def parse_cursor(cursor: Optional[str], pair_fingerprint: str) -> int:
+    """Position a cursor resumes from; 0 without one."""
+    if not cursor:
+        return 0
+    position, _, fp = cursor.partition(".")
+    if not position.isdigit() or fp != pair_fingerprint:
+        raise BadCursor("cursor does not match these files and filters; restart the export without it")
+    return int(position)
+
+
+def iter_export(
+    pre_path: str, post_path: str, diff_filter: Optional[DiffFilter] = None,
+    cursor: Optional[str] = None, limit: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the matching differences after ``cursor``, then ``{"summary": ...}``.
+
+    The summary carries ``next_cursor`` when ``limit`` stopped the page early, or None
+    once the export is complete. Raises BadCursor before yielding anything; a file
+    that fails to parse ends the export with an ``{"error": ...}`` record instead.
+    """
+    diff_filter = diff_filter or DiffFilter()
+    fp = fingerprint(pre_path, post_path, diff_filter)
+    start = parse_cursor(cursor, fp)
+    position = emitted = 0
+    next_cursor = None
+    try:
+        for diff in iter_differences(pre_path, post_path):
+            if not diff_filter(diff):
+                continue
+            if position >= start:
+                if limit is not None and emitted >= limit:
+                    next_cursor = make_cursor(position, fp)
+                    break
+                yield diff
+                emitted += 1
+            position += 1
+    except ET.ParseError as e:
+        yield {"error": f"Failed to parse XML: {e}"}
+        return
+    yield {"summary": {"differences": emitted, "start": start, "next_cursor": next_cursor}}
+
+
+def _csv_row(diff: Dict[str, Any]) -> Dict[str, Any]:
+    row = dict(diff)
+    if diff["kind"] == "value":
+        row.pop("path", None)  # DN plus parameter, already in their own columns
+    else:
+        row["mo"] = diff.get("tag")  # the MO added/removed, or the tag whose count differs
+    return row
+
+
+def to_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def to_csv(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """A header, one row per difference, and a ``# next_cursor=...`` (or ``# error=...``) line when the page is cut short."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        if "error" in record:
+            buf.write(f"# error={record['error']}\n")
+        elif "summary" in record:
+            if record["summary"]["next_cursor"]:
+                buf.write(f"# next_cursor={record['summary']['next_cursor']}\n")
+        else:
+            writer.writerow(_csv_row(record))
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
@@ -0,0 +1,94 @@
+"""Answer comparison questions straight from the comparator, without the LLM.
+
+``SYSTEM_PROMPT`` asks the model to reply to compare/difference questions with a
+fixed three-line Structure/Values/Differences block. That block is fully determined
+by ``compare_xml`` output, so it is rendered here instead of round-tripping ~1 MB of
+XML through the gateway; the same diff also serves as compact context for other
+questions.
+"""
+from typing import Any, Dict, List
+import re
+
+
+_COMPARE_RE = re.compile(
+    r"\b(compare|comparison|comparing|differences?|diff|delta|what\s+changed|changes?)\b",
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r"[A-Za-z0-9_\-]+")
+# Naming the two sides is what makes a question about pre vs post
+_SIDE_WORDS = {"pre", "post", "before", "after", "files", "file", "xml", "xmls", "dumps", "dump"}
+# Everything else a whole-pair comparison question may say; any other word names
+# an MO, a parameter or an action, and the question goes to the lookup or the model
+_COMPARE_WORDS = _SIDE_WORDS | {
+    "compare", "comparison", "comparing", "difference", "differences", "diff", "diffs", "delta", "changed",
+    "change", "changes", "what", "whats", "which", "are", "is", "was", "were", "there", "any", "the", "a", "an",
+    "and", "vs", "versus", "between", "of", "in", "from", "to", "with", "me", "show", "list", "give", "tell",
+    "summarize", "summarise", "summary", "please", "all", "two", "both", "config", "configuration", "did",
+    "has", "have", "anything", "overall", "s",
+}
+MAX_LISTED_DIFFERENCES = 3
+
+
+def is_compare_query(query: str) -> bool:
+    """True for questions comparing the pre and post files as a whole.
+
+    "Compare pre and post" or "what changed between the before and after files"
+    qualify. "Difference between earfcnDl and earfcnUl" or "what changes if I lock the
+    cell" do not: they never name the two sides, or they name something else.
+    """
+    query = query or ""
+    if not _COMPARE_RE.search(query):
+        return False
+    words = {w.lower() for w in _WORD_RE.findall(query)}
+    return bool(words & _SIDE_WORDS) and words <= _COMPARE_WORDS
+
+
+def _short(value: Any) -> str:
+    return "-" if value is None else (str(value) or '""')
+
+
+def format_comparison(result: Dict[str, Any]) -> str:
+    """Render the three-line answer SYSTEM_PROMPT specifies for comparison queries."""
+    if "error" in result:
+        return f"Structure: -\nValues: -\nDifferences: {result['error']}"
+    structure_same = (
+        result.get("structure_same", True)
+        and not result.get("only_in_pre_mos")
+        and not result.get("only_in_post_mos")
+    )
+    diffs: List[Dict[str, Any]] = result.get("value_differences", [])
+    count = result.get("value_difference_count", len(diffs))
+    items = [
+        f"{i}. {d['tag']} pre: {_short(d['pre'])}, post: {_short(d['post'])}"
+        for i, d in enumerate(diffs[:MAX_LISTED_DIFFERENCES], 1)
+    ]
+    return "\n".join([
+        f"Structure: {'Same' if structure_same else 'Different'}",
+        f"Values: {'Same' if count == 0 else 'Different'} (count: {count})",
+        f"Differences: {'; '.join(items) if items else '-'}",
+    ])
+
+
+def format_diff_context(result: Dict[str, Any]) -> str:
+    """Compact textual diff used as LLM context in place of the full files."""
+    if "error" in result:
+        return f"[DIFF pre -> post]\n(comparison unavailable: {result['error']})"
+    lines = [
+        "[DIFF pre -> post]",
+        f"structure_same={result.get('structure_same')} "
+        f"elements_pre={result.get('total_elements_pre')} elements_post={result.get('total_elements_post')} "
+        f"value_differences={result.get('value_difference_count', len(result.get('value_differences', [])))}",
+    ]
+    for d in result.get("value_differences", []):
+        lines.append(f"{d.get('path', d['tag'])}: pre={_short(d['pre'])} post={_short(d['post'])}")
+    for dn in result.get("only_in_pre_mos", []):
+        lines.append(f"only in pre: {dn}")
+    for dn in result.get("only_in_post_mos", []):
+        lines.append(f"only in post: {dn}")
+    for p in result.get("only_in_pre_paths", []):
+        lines.append(f"path only in pre: {p}")
+    for p in result.get("only_in_post_paths", []):
+        lines.append(f"path only in post: {p}")
+    if len(lines) == 2:
+        lines.append("(no differences)")
+    return "\n".join(lines)
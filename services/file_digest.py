@@ -0,0 +1,50 @@
+from typing import Tuple
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+from services.metrics import span
+
+
+MAX_CACHED_FILES = 512  # least recently digested paths are forgotten past this
+
+_CACHE: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of the file contents, memoised on (mtime, size) so unchanged files are not re-read."""
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    with _LOCK:
+        cached = _CACHE.get(key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            _CACHE.move_to_end(key)
+            return cached[2]
+    h = hashlib.sha256()
+    with span("file.digest"), open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _LOCK:
+        _CACHE[key] = (st.st_mtime_ns, st.st_size, digest)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > MAX_CACHED_FILES:
+            _CACHE.popitem(last=False)
+    return digest
+
+
+def forget(path: str) -> None:
+    """Drop the memoised digest of a deleted file."""
+    with _LOCK:
+        _CACHE.pop(os.path.abspath(path), None)
+
+
+def combined_digest(*parts: str) -> str:
+    """Stable digest over several digests/labels, e.g. a pre/post pair plus a format version."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
@@ -0,0 +1,373 @@
+"""Snapshot history of repeated configuration dumps, stored as deltas per ManagedElement.
+
+Each dump is parsed once (streaming, one ENBFunction/ManagedElement at a time) into
+``(DN, parameter) -> value`` pairs. Per node, DN, parameter and value strings are
+interned into tables; a path is a (DN id, parameter id) pair held in two ``array``
+columns. A snapshot is stored only as the paths whose value changed since the
+previous snapshot (value id 0 marks a removed parameter), appended to one change
+log shared by all snapshots of the node. Ingesting an unchanged dump therefore
+costs one offset, and storage grows with the amount of change, not the number of
+dumps.
+
+Every path also keeps the log positions of its own changes, so "value of path p
+at snapshot s" is a bisect, "diff between snapshots a and b" only looks at paths
+touched between them, and a parameter's history is read straight off its log.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from urllib.parse import quote, unquote
+
+from services.comparator import XmlSource, _iter_units, _StreamStats
+from services.file_digest import file_digest, forget
+from services.mo_tree import build_mo_tree, iter_mos
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: only threads of one process are serialised
+    fcntl = None
+
+
+MAGIC = b"CMHIST1\0"
+_SECTIONS = ("path_dn", "path_param", "log_path", "log_value", "snap_offsets")
+
+
+def _node_id(dn: str) -> Optional[str]:
+    for part in dn.split(","):
+        tag, _, mo_id = part.partition("=")
+        if tag == "ManagedElement":
+            return mo_id
+    return None
+
+
+def parse_dump(source: XmlSource) -> Dict[str, List[Tuple[str, str, str]]]:
+    """(DN, parameter, value) triples per ManagedElement id, in document order.
+
+    Content outside every ManagedElement (file header and footer, whose timestamp
+    changes on every export) is not part of any node's configuration and is skipped.
+    """
+    out: Dict[str, List[Tuple[str, str, str]]] = {}
+    for dn, elem in _iter_units(source, _StreamStats()):
+        node = _node_id(dn)
+        if node is None:
+            continue
+        rows = out.setdefault(node, [])
+        for mo in iter_mos(build_mo_tree(elem, dn)):
+            rows.extend((mo.dn, name, value) for name, value in mo.params.items())
+    return out
+
+
+class _Interner:
+    def __init__(self, items: Iterable[str] = ()) -> None:
+        self.items: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for s in items:
+            self.get(s)
+
+    def get(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.items)
+            self.items.append(s)
+        return i
+
+
+class NodeHistory:
+    """All snapshots of one ManagedElement."""
+
+    def __init__(self, node_id: str) -> None:
+        self.node_id = node_id
+        self.dns = _Interner()
+        self.params = _Interner()
+        self.values = _Interner([""])  # id 0: parameter absent
+        self.path_dn = array("I")
+        self.path_param = array("I")
+        self._path_ids: Dict[Tuple[int, int], int] = {}
+        # Change log, grouped by snapshot: entries of snapshot s are [snap_offsets[s], snap_offsets[s + 1])
+        self.log_path = array("I")
+        self.log_value = array("I")
+        self.snap_offsets = array("Q", [0])
+        self.snapshots: List[Dict[str, Any]] = []  # label, timestamp, digest per snapshot
+        self.current = array("I")  # value id per path at the latest snapshot
+        self._path_log: List[array] = []  # log positions per path, ascending
+        self._lock = threading.Lock()
+
+    def _path(self, dn: str, param: str) -> int:
+        key = (self.dns.get(dn), self.params.get(param))
+        pid = self._path_ids.get(key)
+        if pid is None:
+            pid = self._path_ids[key] = len(self.path_dn)
+            self.path_dn.append(key[0])
+            self.path_param.append(key[1])
+            self.current.append(0)
+            self._path_log.append(array("I"))
+        return pid
+
+    def _log(self, pid: int, vid: int) -> None:
+        self._path_log[pid].append(len(self.log_path))
+        self.log_path.append(pid)
+        self.log_value.append(vid)
+        self.current[pid] = vid
+
+    def ingest(self, rows: Iterable[Tuple[str, str, str]], label: str = "", timestamp: Optional[float] = None, digest: str = "") -> int:
+        """Append a snapshot from (DN, parameter, value) rows; returns its index.
+
+        A dump whose digest equals the latest snapshot's is not stored again.
+        """
+        with self._lock:
+            if digest and self.snapshots and self.snapshots[-1].get("digest") == digest:
+                return len(self.snapshots) - 1
+            seen = bytearray(len(self.current))
+            for dn, param, value in rows:
+                pid = self._path(dn, param)
+                if pid >= len(seen):
+                    seen.extend(b"\0" * (pid + 1 - len(seen)))
+                seen[pid] = 1
+                vid = self.values.get(value)
+                if self.current[pid] != vid:
+                    self._log(pid, vid)
+            for pid, vid in enumerate(self.current):
+                if vid and not seen[pid]:
+                    self._log(pid, 0)
+            self.snap_offsets.append(len(self.log_path))
+            self.snapshots.append({
+                "label": label,
+                "timestamp": time.time() if timestamp is None else timestamp,
+                "digest": digest,
+            })
+            return len(self.snapshots) - 1
+
+    def _value_at(self, pid: int, snapshot: int) -> int:
+        positions = self._path_log[pid]
+        i = bisect_left(positions, self.snap_offsets[snapshot + 1]) - 1
+        return self.log_value[positions[i]] if i >= 0 else 0
+
+    def _check(self, snapshot: int) -> int:
+        if snapshot < 0:
+            snapshot += len(self.snapshots)
+        if not 0 <= snapshot < len(self.snapshots):
+            raise IndexError(f"snapshot {snapshot} out of range (node {self.node_id} has {len(self.snapshots)})")
+        return snapshot
+
+    def _value(self, vid: int) -> Optional[str]:
+        return self.values.items[vid] if vid else None
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return [
+            dict(meta, snapshot=i, changes=self.snap_offsets[i + 1] - self.snap_offsets[i])
+            for i, meta in enumerate(self.snapshots)
+        ]
+
+    def state(self, snapshot: int = -1) -> Dict[Tuple[str, str], str]:
+        """Full (DN, parameter) -> value mapping at ``snapshot``."""
+        s = self._check(snapshot)
+        out: Dict[Tuple[str, str], str] = {}
+        for pid in range(len(self.path_dn)):
+            vid = self._value_at(pid, s)
+            if vid:
+                out[(self.dns.items[self.path_dn[pid]], self.params.items[self.path_param[pid]])] = self.values.items[vid]
+        return out
+
+    def diff(self, a: int, b: int) -> List[Dict[str, Any]]:
+        """Parameters whose value differs between snapshots ``a`` and ``b`` (None = absent).
+
+        Only paths with log entries between the two snapshots are examined.
+        """
+        a, b = self._check(a), self._check(b)
+        lo, hi = min(a, b), max(a, b)
+        touched = sorted(set(self.log_path[self.snap_offsets[lo + 1]:self.snap_offsets[hi + 1]]))
+        out = []
+        for pid in touched:
+            va, vb = self._value_at(pid, a), self._value_at(pid, b)
+            if va != vb:
+                out.append({
+                    "dn": self.dns.items[self.path_dn[pid]],
+                    "param": self.params.items[self.path_param[pid]],
+                    "pre": self._value(va),
+                    "post": self._value(vb),
+                })
+        return out
+
+    def history(self, param: str, mo: str = "") -> List[Dict[str, Any]]:
+        """Every recorded value of ``param`` on MOs matching ``mo``.
+
+        ``param`` matches a parameter name or its last path segment; ``mo`` matches
+        a whole DN, a trailing part of it (``EUtranCellFDD=Sec8``) or, empty, any MO.
+        """
+        out = []
+        for pid in range(len(self.path_dn)):
+            name = self.params.items[self.path_param[pid]]
+            if name != param and name.rsplit("/", 1)[-1].split("[", 1)[0] != param:
+                continue
+            dn = self.dns.items[self.path_dn[pid]]
+            if mo and dn != mo and not dn.endswith("," + mo):
+                continue
+            changes = []
+            for pos in self._path_log[pid]:
+                s = bisect_left(self.snap_offsets, pos + 1) - 1
+                changes.append({
+                    "snapshot": s,
+                    "label": self.snapshots[s]["label"],
+                    "timestamp": self.snapshots[s]["timestamp"],
+                    "value": self._value(self.log_value[pos]),
+                })
+            out.append({"dn": dn, "param": name, "changes": changes})
+        return out
+
+    def save(self, path: str) -> None:
+        """Write the node atomically: a JSON header with the string tables, then the array columns."""
+        with self._lock:
+            arrays = {name: getattr(self, name) for name in _SECTIONS}
+            header = {
+                "node_id": self.node_id,
+                "dns": self.dns.items,
+                "params": self.params.items,
+                "values": self.values.items,
+                "snapshots": self.snapshots,
+                "sections": {name: [arr.typecode, len(arr)] for name, arr in arrays.items()},
+            }
+            header_bytes = json.dumps(header).encode("utf-8")
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(MAGIC)
+                    f.write(struct.pack("<I", len(header_bytes)))
+                    f.write(header_bytes)
+                    for arr in arrays.values():
+                        f.write(arr.tobytes())
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+
+    @classmethod
+    def load(cls, path: str) -> Optional["NodeHistory"]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if data[:len(MAGIC)] != MAGIC:
+            return None
+        (header_len,) = struct.unpack_from("<I", data, len(MAGIC))
+        pos = len(MAGIC) + 4
+        header = json.loads(data[pos:pos + header_len].decode("utf-8"))
+        pos += header_len
+        self = cls(header["node_id"])
+        self.dns = _Interner(header["dns"])
+        self.params = _Interner(header["params"])
+        self.values = _Interner(header["values"])
+        self.snapshots = header["snapshots"]
+        for name in _SECTIONS:
+            typecode, count = header["sections"][name]
+            arr = array(typecode)
+            nbytes = count * arr.itemsize
+            arr.frombytes(data[pos:pos + nbytes])
+            pos += nbytes
+            setattr(self, name, arr)
+        # Derived state: path lookup, latest values and per-path log positions
+        self._path_ids = {(d, p): i for i, (d, p) in enumerate(zip(self.path_dn, self.path_param))}
+        self.current = array("I", bytes(4 * len(self.path_dn)))
+        self._path_log = [array("I") for _ in range(len(self.path_dn))]
+        for i, (pid, vid) in enumerate(zip(self.log_path, self.log_value)):
+            self._path_log[pid].append(i)
+            self.current[pid] = vid
+        return self
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class HistoryStore:
+    """NodeHistory per ManagedElement, persisted one file per node under ``root_dir``.
+
+    Several gunicorn workers share ``root_dir``. Each caches the nodes it has read
+    and reloads one whenever its file changed on disk. Ingestion holds an exclusive
+    lock on the node's ``.lock`` file while it reloads, appends and saves, so no
+    worker writes a snapshot over one appended by another.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None) -> None:
+        self.root_dir = root_dir
+        self._nodes: Dict[str, NodeHistory] = {}
+        self._stamps: Dict[str, Optional[Tuple[int, int]]] = {}  # node id -> file (mtime, size) when loaded
+        self._lock = threading.Lock()
+        self._ingest_lock = threading.Lock()
+
+    def _file(self, node_id: str) -> str:
+        return os.path.join(self.root_dir, quote(node_id, safe="") + ".hist")
+
+    def node(self, node_id: str) -> Optional[NodeHistory]:
+        with self._lock:
+            node = self._nodes.get(node_id)
+            if self.root_dir:
+                stamp = _stamp(self._file(node_id))
+                if stamp is not None and (node is None or self._stamps.get(node_id) != stamp):
+                    node = NodeHistory.load(self._file(node_id))
+                    if node is not None:
+                        self._nodes[node_id] = node
+                        self._stamps[node_id] = stamp
+            return node
+
+    @contextmanager
+    def _locked(self, node_id: str):
+        """Exclusive over threads of this worker and, through flock, over other workers.
+
+        The lock lives in a side file because ``save`` replaces the ``.hist`` file
+        itself, so a lock on that would not be seen by the next writer.
+        """
+        with self._ingest_lock:
+            if not self.root_dir or fcntl is None:
+                yield
+                return
+            os.makedirs(self.root_dir, exist_ok=True)
+            with open(self._file(node_id) + ".lock", "a+b") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def nodes(self) -> List[str]:
+        found = set(self._nodes)
+        if self.root_dir and os.path.isdir(self.root_dir):
+            found.update(unquote(n[:-len(".hist")]) for n in os.listdir(self.root_dir) if n.endswith(".hist"))
+        return sorted(found)
+
+    def ingest(self, path: str, label: str = "", timestamp: Optional[float] = None) -> Dict[str, int]:
+        """Parse one dump file and append a snapshot to every ManagedElement in it."""
+        # Uploads arrive as one-off temp files: nothing to gain from memoising their digest
+        digest = file_digest(path)
+        forget(path)
+        if timestamp is None:
+            timestamp = os.path.getmtime(path)
+        out: Dict[str, int] = {}
+        for node_id, rows in parse_dump(path).items():
+            with self._locked(node_id):
+                # Appends go onto the latest saved state, not onto this worker's cached copy
+                node = self.node(node_id)
+                if node is None:
+                    with self._lock:
+                        node = self._nodes.setdefault(node_id, NodeHistory(node_id))
+                out[node_id] = node.ingest(rows, label or os.path.basename(path), timestamp, digest)
+                if self.root_dir:
+                    node.save(self._file(node_id))
+                    with self._lock:
+                        self._stamps[node_id] = _stamp(self._file(node_id))
+        return out
+
@@ -0,0 +1,181 @@
+"""In-process counters, histograms and timing spans, rendered in Prometheus text format.
+
+Recording is a ``perf_counter`` pair, a bisect over the bucket bounds and a short
+lock per metric, so spans can wrap hot-path stages without measurable cost. Every
+process keeps its own registry (each gunicorn worker exports its own series).
+
+``span(stage)`` feeds the shared ``xmlchat_stage_seconds`` histogram and, inside a
+request opened with ``start_request``, also collects the stage durations for a
+``Server-Timing`` header.
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import threading
+import time
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1e3, 4e3, 16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0.0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_fmt(v)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels.get(n, "")) for n in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="%s"' % _fmt(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {n}"
+
+
+_REGISTRY: Dict[str, object] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _register(metric):
+    with _REGISTRY_LOCK:
+        # Re-registering returns the existing metric, so module reloads do not duplicate series
+        return _REGISTRY.setdefault(metric.name, metric)
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help, labelnames))
+
+
+def histogram(name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS, labelnames: Sequence[str] = ()) -> Histogram:
+    return _register(Histogram(name, help, buckets, labelnames))
+
+
+def render() -> str:
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    lines: List[str] = []
+    for m in metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram("xmlchat_stage_seconds", "Wall time per instrumented stage", labelnames=("stage",))
+
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("xmlchat_timings", default=None)
+
+
+def start_request():
+    """Begin collecting stage timings for the current request; returns a token for ``end_request``."""
+    return _timings.set([])
+
+
+def end_request(token) -> List[Tuple[str, float]]:
+    timings = _timings.get() or []
+    _timings.reset(token)
+    return timings
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def timed(stage: str):
+    """Decorator form of ``span``."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def server_timing(timings: List[Tuple[str, float]], total_sec: Optional[float] = None) -> str:
+    """``Server-Timing`` header value; repeated stages (e.g. two gateway calls) are summed."""
+    merged: Dict[str, float] = {}
+    for stage, sec in timings:
+        merged[stage] = merged.get(stage, 0.0) + sec
+    parts = [f"{stage};dur={sec * 1000:.2f}" for stage, sec in merged.items()]
+    if total_sec is not None:
+        parts.append(f"total;dur={total_sec * 1000:.2f}")
+    return ", ".join(parts)
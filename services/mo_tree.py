@@ -0,0 +1,261 @@
+"""Managed-object tree keyed by distinguished name, with Merkle digests per subtree.
+
+Every element carrying an ``id`` attribute is a managed object (MO); its DN is the
+chain of ``Tag=id`` pairs from the document root, e.g.
+``SubNetwork=ANIEMS,ManagedElement=x,ENBFunction=x,EUtranCellFDD=Sec8``. Leaves below
+an MO that are not themselves MOs become its parameters, named by their path inside
+the MO without the ``attributes`` wrapper (``pci``, ``triggerType/event/b1NrHysteresis``).
+
+Repeated siblings without an ``id`` (``event`` lists, repeated leaves) are list
+entries. Each is named by a digest of its content, ``triggerType/event[#1a2b3c4d]/...``,
+not by its position, so inserting one entry does not renumber the ones after it.
+The diff reports list entries whole: added, removed, or changed where a removal
+and an addition fall in the same list.
+
+Each MO's digest covers its parameters and its children's digests, so two trees are
+compared by descending only where digests differ and children are matched by DN
+rather than by position.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import Counter
+import hashlib
+import re
+import xml.etree.ElementTree as ET
+
+
+# A parameter path up to the first list entry, and what follows inside that entry
+_ENTRY_RE = re.compile(r"^(.*?)\[#([0-9a-f]+(?:\.\d+)?)\](?:/(.*))?$")
+
+
+def _local(tag: str) -> str:
+    return tag.split('}')[-1] if '}' in tag else tag
+
+
+def _leaf_value(elem: ET.Element) -> str:
+    attrs = " ".join(f"{k}={v}" for k, v in sorted(elem.attrib.items()))
+    text = (elem.text or "").strip()
+    return (attrs + "|" + text).strip("|")
+
+
+class MONode:
+    __slots__ = ("dn", "tag", "params", "children", "digest")
+
+    def __init__(self, dn: str, tag: str) -> None:
+        self.dn = dn
+        self.tag = tag
+        self.params: Dict[str, str] = {}
+        self.children: Dict[str, "MONode"] = {}
+        self.digest = b""
+
+
+def _entry_digest(elem: ET.Element) -> str:
+    """Digest of a list entry's content: tags, attributes and text, with nesting."""
+    h = hashlib.blake2b(digest_size=4)
+    stack: List[Optional[ET.Element]] = [elem]
+    while stack:
+        e = stack.pop()
+        if e is None:
+            h.update(b")")
+            continue
+        h.update(_local(e.tag).encode("utf-8"))
+        h.update(_leaf_value(e).encode("utf-8"))
+        h.update(b"(")
+        stack.append(None)
+        stack.extend(reversed(list(e)))
+    return h.hexdigest()
+
+
+def _add_param(params: Dict[str, str], name: str, value: str) -> None:
+    # The same path reached twice outside a list (e.g. two wrappers) keeps document order via an index suffix
+    if name in params:
+        n = 1
+        while f"{name}[{n}]" in params:
+            n += 1
+        name = f"{name}[{n}]"
+    params[name] = value
+
+
+def build_mo_tree(root: ET.Element, dn: Optional[str] = None) -> MONode:
+    """Build the MO tree under ``root``; ``dn`` overrides the root's own DN (e.g. for a streamed unit)."""
+    tag = _local(root.tag)
+    if dn is None:
+        dn = f"{tag}={root.get('id')}" if root.get('id') is not None else ""
+    top = MONode(dn, tag)
+    for k, v in sorted(root.attrib.items()):
+        if k != "id":
+            top.params[f"@{k}"] = v
+    nodes: List[MONode] = [top]
+    # (element, owning MO, parameter path inside that MO); explicit stack keeps document order
+    stack: List[Tuple[ET.Element, MONode, str]] = [(root, top, "")]
+    while stack:
+        elem, mo, rel = stack.pop()
+        pending: List[Tuple[ET.Element, MONode, str]] = []
+        tags = [c.tag for c in elem]
+        repeated = Counter(tags) if len(set(tags)) < len(tags) else {}
+        entries: set = set()
+        for child in elem:
+            ctag = _local(child.tag)
+            cid = child.get('id')
+            if cid is not None:
+                key = f"{ctag}={cid}"
+                if key in mo.children:
+                    n = 1
+                    while f"{key}[{n}]" in mo.children:
+                        n += 1
+                    key = f"{key}[{n}]"
+                node = MONode(f"{mo.dn},{key}" if mo.dn else key, ctag)
+                for k, v in sorted(child.attrib.items()):
+                    if k != "id":
+                        node.params[f"@{k}"] = v
+                mo.children[key] = node
+                nodes.append(node)
+                pending.append((child, node, ""))
+                continue
+            name = ctag
+            if repeated.get(child.tag, 0) > 1 and ctag != "attributes":
+                # List entry: named by content; identical entries are numbered among themselves
+                name = base = f"{ctag}[#{_entry_digest(child)}"
+                n = 0
+                while name in entries:
+                    n += 1
+                    name = f"{base}.{n}"
+                entries.add(name)
+                name += "]"
+            crel = f"{rel}/{name}" if rel else ("" if ctag == "attributes" and len(child) else name)
+            if len(child):
+                pending.append((child, mo, crel))
+            else:
+                _add_param(mo.params, crel, _leaf_value(child))
+        stack.extend(reversed(pending))
+
+    # Children are always created after their parent, so a reverse sweep is a post-order.
+    for node in reversed(nodes):
+        h = hashlib.blake2b(digest_size=16)
+        for k in sorted(node.params):
+            h.update(k.encode("utf-8"))
+            h.update(b"=")
+            h.update(node.params[k].encode("utf-8"))
+            h.update(b"\0")
+        for key in sorted(node.children):
+            h.update(key.encode("utf-8"))
+            h.update(node.children[key].digest)
+        node.digest = h.digest()
+    return top
+
+
+def iter_mos(root: MONode) -> Iterator[MONode]:
+    """All MOs in document order."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(node.children.values())))
+
+
+def _list_entry(name: str, lists: set) -> Optional[Tuple[str, str, Optional[str]]]:
+    """(list path, entry, path inside the entry) for a parameter in one of ``lists``, else None.
+
+    A single sibling is not a list entry when built, but is one if the other tree
+    has a list at the same path.
+    """
+    m = _ENTRY_RE.match(name)
+    if m is not None:
+        return m.group(1), f"{m.group(1)}[#{m.group(2)}]", m.group(3)
+    if name in lists:
+        return name, name, None
+    i = name.find("/")
+    while i != -1:
+        if name[:i] in lists:
+            return name[:i], name[:i], name[i + 1:]
+        i = name.find("/", i + 1)
+    return None
+
+
+def _list_entries(params: Dict[str, str], lists: set) -> Dict[str, List[str]]:
+    """List path -> rendered content of each entry, in document order."""
+    rendered: Dict[str, Dict[str, str]] = {}
+    for name, value in params.items():
+        found = _list_entry(name, lists)
+        if found is None:
+            continue
+        path, entry, inner = found
+        entries = rendered.setdefault(path, {})
+        item = value if inner is None else f"{inner}={value}"
+        entries[entry] = f"{entries[entry]}, {item}" if entry in entries else item
+    return {path: list(entries.values()) for path, entries in rendered.items()}
+
+
+def _unmatched(entries: List[str], other: List[str]) -> List[str]:
+    left = Counter(other)
+    out = []
+    for e in entries:
+        if left[e]:
+            left[e] -= 1
+        else:
+            out.append(e)
+    return out
+
+
+def _diff_lists(a: MONode, b: MONode, lists: set) -> Iterator[Dict[str, Any]]:
+    pre_lists, post_lists = _list_entries(a.params, lists), _list_entries(b.params, lists)
+    for path in sorted(lists):
+        pre, post = pre_lists.get(path, []), post_lists.get(path, [])
+        # Equal content matches whatever the order; what is left was removed, added or changed
+        removed, added = _unmatched(pre, post), _unmatched(post, pre)
+        for i in range(max(len(removed), len(added))):
+            yield {
+                "kind": "value",
+                "tag": path.rsplit('/', 1)[-1],
+                "mo": a.tag,
+                "dn": a.dn,
+                "param": path,
+                "path": f"{a.dn}/{path}" if a.dn else path,
+                "pre": removed[i] if i < len(removed) else None,
+                "post": added[i] if i < len(added) else None,
+            }
+
+
+def diff_mo_trees(pre: MONode, post: MONode) -> Iterator[Dict[str, Any]]:
+    """Yield exact differences between two MO trees, skipping subtrees with equal digests.
+
+    ``kind`` is ``value`` for a parameter whose value changed, appeared (``pre`` None) or
+    disappeared (``post`` None), and ``only_in_pre``/``only_in_post`` for whole MOs.
+    A list entry is one ``value`` difference named by its list path, with the entry's
+    content as ``pre`` and/or ``post``.
+    """
+    stack: List[Tuple[MONode, MONode]] = [(pre, post)]
+    while stack:
+        a, b = stack.pop()
+        if a.digest == b.digest:
+            continue
+        names = set(a.params) | set(b.params)
+        lists = {m.group(1) for m in (_ENTRY_RE.match(n) for n in names if "[#" in n) if m}
+        for name in sorted(names):
+            if lists and _list_entry(name, lists) is not None:
+                continue  # list entries, compared whole below
+            pv = a.params.get(name)
+            qv = b.params.get(name)
+            if pv != qv:
+                yield {
+                    "kind": "value",
+                    "tag": name.rsplit('/', 1)[-1],
+                    "mo": a.tag,
+                    "dn": a.dn,
+                    "param": name,
+                    "path": f"{a.dn}/{name}" if a.dn else name,
+                    "pre": pv,
+                    "post": qv,
+                }
+        if lists:
+            yield from _diff_lists(a, b, lists)
+        pending: List[Tuple[MONode, MONode]] = []
+        for key, child in a.children.items():
+            other = b.children.get(key)
+            if other is None:
+                yield {"kind": "only_in_pre", "tag": child.tag, "dn": child.dn}
+            else:
+                pending.append((child, other))
+        for key, child in b.children.items():
+            if key not in a.children:
+                yield {"kind": "only_in_post", "tag": child.tag, "dn": child.dn}
+        stack.extend(reversed(pending))
@@ -0,0 +1,198 @@
+"""Parameter lookup index over a pre/post pair, answering simple lookups without the LLM.
+
+Every leaf parameter of every managed object is indexed by its namespace-stripped
+leaf name (``pci``, ``earfcnDl``, ``administrativeState``) with its DN and its pre
+and post values. ``ParamIndex.resolve`` recognises questions such as "pci of cell
+3", "earfcn in post" or "adminState of RadioObj 7": a known parameter name (exact,
+an alias, or an unambiguous prefix) plus optionally an MO reference and a side.
+Anything it cannot pin down to a handful of rows returns None, and the caller
+falls back to retrieval and the gateway.
+"""
+from typing import Dict, List, Optional, Tuple
+import re
+
+from services.history_store import parse_dump
+
+
+MAX_ROWS = 12  # a lookup matching more rows than this is not a lookup
+MAX_QUERY_TOKENS = 14
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_\-]+")
+_INDEX_SUFFIX_RE = re.compile(r"\[(?:\d+|#[0-9a-f]+(?:\.\d+)?)\]$")  # position or list-entry suffix
+# Questions asking for reasoning rather than values go to the model
+_REASONING = {"why", "how", "explain", "should", "recommend", "impact", "meaning", "mean", "describe", "suggest", "could"}
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "is", "are", "was", "what", "whats", "which", "value", "values",
+    "show", "me", "get", "give", "tell", "list", "and", "to", "set", "configured", "current", "please", "with",
+    "pre", "post", "before", "after", "xml", "file", "both", "id", "at", "its", "their", "all",
+}
+_POST_WORDS = {"post", "after", "new"}
+_PRE_WORDS = {"pre", "before", "old"}
+PARAM_ALIASES = {
+    "adminstate": ["administrativeState", "adminState"],
+    "admin": ["administrativeState", "adminState"],
+    "earfcn": ["earfcnDl", "earfcnUl", "dlEarfcn"],
+    "enbid": ["enbId"],
+    "txpower": ["maximumTransmissionPower"],
+}
+MO_ALIASES = {
+    "cell": "EUtranCellFDD",
+    "cells": "EUtranCellFDD",
+    "sector": "EUtranCellFDD",
+    "radio": "RadioObj",
+    "neighbour": "EUtranNeighbourCell",
+    "neighbor": "EUtranNeighbourCell",
+    "enb": "ENBFunction",
+}
+
+
+def leaf_name(param: str) -> str:
+    return _INDEX_SUFFIX_RE.sub("", param.rsplit("/", 1)[-1])
+
+
+def _components(dn: str) -> List[Tuple[str, str]]:
+    return [tuple(p.split("=", 1)) for p in dn.split(",") if "=" in p]  # type: ignore[misc]
+
+
+def _id_matches(mo_id: str, wanted: str) -> bool:
+    # "3" matches "3" and "Sec3"; anything else must match exactly (case-insensitively)
+    mo_id, wanted = mo_id.lower(), wanted.lower()
+    if mo_id == wanted:
+        return True
+    digits = re.search(r"(\d+)$", mo_id)
+    return wanted.isdigit() and digits is not None and int(digits.group(1)) == int(wanted) and not mo_id.isdigit()
+
+
+def short_dn(dn: str) -> str:
+    """DN below the ManagedElement/ENBFunction, which is the same for every MO of a node."""
+    parts = dn.split(",")
+    keep = [p for p in parts if not p.startswith(("SubNetwork=", "ManagedElement=", "ENBFunction="))]
+    return ",".join(keep) or parts[-1]
+
+
+class ParamIndex:
+    def __init__(self) -> None:
+        self.dns: List[str] = []
+        self.params: List[str] = []
+        self.pre: List[Optional[str]] = []
+        self.post: List[Optional[str]] = []
+        self.by_name: Dict[str, List[int]] = {}  # lowercased leaf name -> row ids
+        self.names: Dict[str, str] = {}  # lowercased leaf name -> leaf name as written
+        self.mo_tags: Dict[str, str] = {}  # lowercased MO tag -> tag
+
+    @classmethod
+    def build(cls, pre_path: str, post_path: str) -> "ParamIndex":
+        self = cls()
+        rows: Dict[Tuple[str, str], int] = {}
+        for side, path in (("pre", pre_path), ("post", post_path)):
+            for triples in parse_dump(path).values():
+                for dn, param, value in triples:
+                    if param.startswith("@"):
+                        continue
+                    i = rows.get((dn, param))
+                    if i is None:
+                        i = rows[(dn, param)] = len(self.dns)
+                        self.dns.append(dn)
+                        self.params.append(param)
+                        self.pre.append(None)
+                        self.post.append(None)
+                        name = leaf_name(param)
+                        self.by_name.setdefault(name.lower(), []).append(i)
+                        self.names.setdefault(name.lower(), name)
+                        for tag, _ in _components(dn):
+                            self.mo_tags.setdefault(tag.lower(), tag)
+                    getattr(self, side)[i] = value
+        return self
+
+    def __len__(self) -> int:
+        return len(self.dns)
+
+    def approx_bytes(self) -> int:
+        return sum(len(d) + len(p) + 120 for d, p in zip(self.dns, self.params)) + 80 * len(self.by_name)
+
+    def _param_names(self, token: str) -> List[str]:
+        if token in self.by_name:
+            return [token]
+        aliased = [a.lower() for a in PARAM_ALIASES.get(token, ()) if a.lower() in self.by_name]
+        if aliased:
+            return aliased
+        if len(token) >= 4:
+            prefixed = [n for n in self.by_name if n.startswith(token)]
+            if 0 < len(prefixed) <= 3:
+                return prefixed
+        return []
+
+    def _mo_tag(self, token: str) -> Optional[str]:
+        tag = MO_ALIASES.get(token, token)
+        return self.mo_tags.get(tag.lower())
+
+    def resolve(self, query: str) -> Optional[str]:
+        """A direct answer for a parameter lookup, or None when the query is not one."""
+        tokens = [t.lower() for t in _TOKEN_RE.findall(query or "")]
+        if not tokens or len(tokens) > MAX_QUERY_TOKENS or _REASONING & set(tokens):
+            return None
+        want_pre = bool(_PRE_WORDS & set(tokens))
+        want_post = bool(_POST_WORDS & set(tokens))
+
+        names: List[str] = []
+        mo_filters: List[Tuple[Optional[str], str]] = []  # (tag or None for any, id)
+        unknown: List[str] = []
+        i = 0
+        while i < len(tokens):
+            tok = tokens[i]
+            joined = tok + tokens[i + 1] if i + 1 < len(tokens) else ""
+            tag = self._mo_tag(tok)
+            if tag is not None and i + 1 < len(tokens) and tokens[i + 1] not in _STOPWORDS and not self._param_names(tokens[i + 1]):
+                mo_filters.append((tag, tokens[i + 1]))
+                i += 2
+                continue
+            if joined and joined in self.by_name:  # "enb id" -> enbId
+                names.append(joined)
+                i += 2
+                continue
+            found = self._param_names(tok)
+            if found:
+                names.extend(n for n in found if n not in names)
+            elif tag is not None:
+                pass  # an MO type on its own narrows nothing
+            elif re.fullmatch(r"[a-z]+\d+", tok) and tok not in _STOPWORDS:
+                mo_filters.append((None, tok))  # a bare id such as "sec8"
+            elif tok not in _STOPWORDS:
+                unknown.append(tok)
+            i += 1
+        if not names or unknown:
+            return None
+
+        # Rows of the named MO itself come first; rows of MOs below it only when it has none
+        own: List[int] = []
+        below: List[int] = []
+        for name in names:
+            for r in self.by_name[name]:
+                comps = _components(self.dns[r])
+                if all(any((tag is None or t == tag) and _id_matches(v, want) for t, v in comps) for tag, want in mo_filters):
+                    last_tag, last_id = comps[-1] if comps else ("", "")
+                    is_own = not mo_filters or any(
+                        (tag is None or last_tag == tag) and _id_matches(last_id, want) for tag, want in mo_filters
+                    )
+                    (own if is_own else below).append(r)
+        matched = own or below
+        if not matched or len(matched) > MAX_ROWS:
+            return None
+        both = want_pre == want_post
+        lines = []
+        for r in matched:
+            label = f"{short_dn(self.dns[r])} {self.names[leaf_name(self.params[r]).lower()]}"
+            pre, post = self.pre[r], self.post[r]
+            if both:
+                if pre == post:
+                    lines.append(f"{label}: {_show(pre)} (pre and post)")
+                else:
+                    lines.append(f"{label}: pre {_show(pre)}, post {_show(post)}")
+            else:
+                side, value = ("post", post) if want_post else ("pre", pre)
+                lines.append(f"{label} ({side}): {_show(value)}")
+        return "\n".join(lines)
+
+
+def _show(value: Optional[str]) -> str:
+    return "(absent)" if value is None else (value or '""')
@@ -1,4 +1,5 @@
 from typing import List, Dict
+import hashlib
 
 
 SYSTEM_PROMPT = (
@@ -46,3 +47,5 @@ def build_general_messages(user_query: str) -> List[Dict[str, str]]:
     ]
 
 
+# Changes whenever either system prompt changes; part of the answer-cache key
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + "\0" + SYSTEM_GENERAL).encode("utf-8")).hexdigest()[:16]
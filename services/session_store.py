@@ -0,0 +1,242 @@
+"""Uploaded pre/post pairs, indexed in the background and kept under a memory budget.
+
+Each session owns a directory ``<root>/<session id>/`` holding ``pre.xml`` and
+``post.xml``; that directory is the source of truth. The in-memory side (RAG index
+and computed diff) is an LRU cache over it: entries are sized with a rough byte
+estimate, the least recently used ones are dropped once the budget is exceeded, and
+a dropped or never-seen session (e.g. one uploaded through another gunicorn worker)
+is reloaded on its next use, as is one whose files were replaced (a re-upload
+through another worker) since it was loaded. Reloads go through the index snapshot
+cache, so they memory-map the existing index instead of re-tokenizing.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+import json
+import os
+import re
+import shutil
+import threading
+
+from rag.indexer import RAGIndexer
+from rag.retriever import Retriever
+from rag.snapshot import remove_snapshots
+from services.comparator import compare_xml_streaming
+from services.file_digest import file_digest, forget
+from services.param_index import ParamIndex
+
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_.\-]{1,64}$")
+
+
+class SessionNotReady(Exception):
+    """The session is still being indexed; ask again later."""
+
+
+class Session:
+    """One pre/post pair with its retriever, and a diff and parameter index memoised by file digests."""
+
+    def __init__(self, session_id: str, pre_path: str, post_path: str, indexer: RAGIndexer) -> None:
+        self.session_id = session_id
+        self.pre_path = pre_path
+        self.post_path = post_path
+        self.indexer = indexer
+        self.retriever = Retriever(indexer)
+        self._comparison: Dict[tuple, Dict] = {}
+        self._param_index: Dict[tuple, ParamIndex] = {}
+
+    def comparison(self) -> Dict:
+        key = (file_digest(self.pre_path), file_digest(self.post_path))
+        result = self._comparison.get(key)
+        if result is None:
+            result = compare_xml_streaming(self.pre_path, self.post_path)
+            self._comparison = {key: result}
+        return result
+
+    def param_index(self) -> ParamIndex:
+        key = (file_digest(self.pre_path), file_digest(self.post_path))
+        index = self._param_index.get(key)
+        if index is None:
+            index = ParamIndex.build(self.pre_path, self.post_path)
+            self._param_index = {key: index}
+        return index
+
+    def approx_bytes(self) -> int:
+        return (
+            self.indexer.approx_bytes()
+            + sum(len(json.dumps(r)) for r in self._comparison.values())
+            + sum(ix.approx_bytes() for ix in self._param_index.values())
+        )
+
+
+def valid_session_id(session_id: str) -> bool:
+    # Session ids become directory names, so nothing that could leave the root
+    return bool(_SESSION_ID_RE.match(session_id or "")) and session_id not in (".", "..")
+
+
+class SessionStore:
+    def __init__(
+        self,
+        root_dir: str,
+        max_bytes: int,
+        tags: Iterable[str],
+        max_chars_per_chunk: int,
+        index_cache_dir: Optional[str] = None,
+        workers: int = 2,
+        build_workers: int = 1,
+        parallel_min_bytes: int = 16 << 20,
+    ) -> None:
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.tags = frozenset(tags)
+        self.max_chars_per_chunk = max_chars_per_chunk
+        self.index_cache_dir = index_cache_dir
+        self.build_workers = build_workers
+        self.parallel_min_bytes = parallel_min_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="session-index")
+        # session id -> [future of the loaded Session, accounted bytes, (pre, post) digests loaded]; most recently used last
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _dir(self, session_id: str) -> str:
+        return os.path.join(self.root_dir, session_id)
+
+    def _paths(self, session_id: str):
+        d = self._dir(session_id)
+        return os.path.join(d, "pre.xml"), os.path.join(d, "post.xml")
+
+    def register(self, session_id: str, pre_stream, post_stream) -> None:
+        """Store an uploaded pair (file-like objects) and start indexing it in the background."""
+        if not valid_session_id(session_id):
+            raise ValueError(f"invalid session id: {session_id!r}")
+        pre_path, post_path = self._paths(session_id)
+        os.makedirs(self._dir(session_id), exist_ok=True)
+        with self._lock:
+            self._discard(session_id)
+        for stream, path in ((pre_stream, pre_path), (post_stream, post_path)):
+            tmp = f"{path}.upload"
+            with open(tmp, "wb") as f:
+                shutil.copyfileobj(stream, f, 1 << 20)
+            os.replace(tmp, path)
+        self._submit(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        if not valid_session_id(session_id):
+            return False
+        with self._lock:
+            self._discard(session_id)
+        if not os.path.isdir(self._dir(session_id)):
+            return False
+        if self.index_cache_dir:
+            remove_snapshots(self.index_cache_dir, *self._paths(session_id))
+        shutil.rmtree(self._dir(session_id), ignore_errors=True)
+        for path in self._paths(session_id):
+            forget(path)
+        return True
+
+    def exists(self, session_id: str) -> bool:
+        return valid_session_id(session_id) and all(os.path.isfile(p) for p in self._paths(session_id))
+
+    def status(self, session_id: str) -> Optional[str]:
+        """"indexing", "ready", "error", "on_disk" (not loaded in this process) or None if unknown."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+        if entry is not None:
+            future: Future = entry[0]
+            if not future.done():
+                return "indexing"
+            return "error" if future.exception() is not None else "ready"
+        return "on_disk" if self.exists(session_id) else None
+
+    def get(self, session_id: str, wait_sec: float = 0.0) -> Session:
+        """The loaded session, reloading it from disk if needed.
+
+        Raises KeyError for unknown ids and SessionNotReady when indexing takes longer
+        than ``wait_sec``; an indexing failure is re-raised.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+        if entry is not None and entry[0].done() and entry[2] != self._digests(session_id):
+            # Replaced on disk since it was loaded: drop the stale index and reload
+            with self._lock:
+                if self._entries.get(session_id) is entry:
+                    self._discard(session_id)
+            entry = None
+        if entry is None:
+            if not self.exists(session_id):
+                raise KeyError(session_id)
+            entry = self._submit(session_id)
+        try:
+            return entry[0].result(timeout=wait_sec)
+        except FutureTimeout:
+            raise SessionNotReady(session_id) from None
+
+    def _digests(self, session_id: str) -> Optional[Tuple[str, str]]:
+        try:
+            return tuple(file_digest(p) for p in self._paths(session_id))  # type: ignore[return-value]
+        except OSError:
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def _submit(self, session_id: str) -> list:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                return entry
+            entry = [None, 0, None]
+            self._entries[session_id] = entry
+            entry[0] = self._executor.submit(self._load, session_id, entry)
+            return entry
+
+    def _load(self, session_id: str, entry: list) -> Session:
+        pre_path, post_path = self._paths(session_id)
+        # Taken before indexing: a replacement during the load shows up as a mismatch later
+        entry[2] = self._digests(session_id)
+        indexer = RAGIndexer(
+            self.max_chars_per_chunk, tags=self.tags, workers=self.build_workers, parallel_min_bytes=self.parallel_min_bytes,
+        )
+        if self.index_cache_dir:
+            indexer.load_or_build(pre_path, post_path, self.index_cache_dir)
+        else:
+            indexer.build(pre_path, post_path)
+        session = Session(session_id, pre_path, post_path, indexer)
+        session.comparison()
+        session.param_index()
+        size = session.approx_bytes()
+        with self._lock:
+            self.loads += 1
+            if self._entries.get(session_id) is entry:
+                entry[1] = size
+                self._bytes += size
+                self._evict(keep=session_id)
+        return session
+
+    def _discard(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict(self, keep: str) -> None:
+        # Only finished entries are sized; ones still loading are skipped, and the
+        # entry just loaded stays even if it alone exceeds the budget
+        for sid in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if sid == keep or not self._entries[sid][0].done():
+                continue
+            self._discard(sid)
+            self.evictions += 1
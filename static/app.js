@@ -80,6 +80,79 @@ function formatAnswer(raw) {
   return `<div class=\"structured\">${html}</div>`;
 }
 
+// The server's own message for a failed request (busy, session still indexing,
+// unknown session...), falling back to the status when the body is not JSON.
+async function errorMessage(resp) {
+  try {
+    const data = await resp.json();
+    if (data.error || data.answer) return data.answer || data.error;
+  } catch (err) {
+    // not JSON
+  }
+  return `Server error (HTTP ${resp.status}).`;
+}
+
+async function askOnce(q, bubble) {
+  const resp = await fetch("/api/chat", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ query: q, full: true }),
+  });
+  if (!resp.ok) {
+    bubble.textContent = await errorMessage(resp);
+    return;
+  }
+  const data = await resp.json();
+  bubble.innerHTML = formatAnswer(data.answer || JSON.stringify(data));
+}
+
+// Relay /api/chat/stream server-sent events into the bubble as tokens arrive.
+// Partial text is re-rendered on every delta; the three-line comparison
+// layout kicks in as soon as all three lines are present.
+async function askStreaming(q, bubble) {
+  const resp = await fetch("/api/chat/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ query: q }),
+  });
+  if (!resp.ok) {
+    bubble.textContent = await errorMessage(resp);
+    return;
+  }
+  // No readable body: this browser cannot stream, ask for the whole answer instead
+  if (!resp.body) return askOnce(q, bubble);
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let answer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      raw.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      });
+      if (!data) continue;
+      const msg = JSON.parse(data);
+      if (event === "error") {
+        answer = msg.answer || msg.error || "Error contacting server.";
+      } else if (msg.delta) {
+        answer += msg.delta;
+      }
+      bubble.innerHTML = formatAnswer(answer);
+      chatEl.scrollTop = chatEl.scrollHeight;
+    }
+  }
+  if (!answer) bubble.textContent = "(empty answer)";
+}
+
 formEl.addEventListener("submit", async (e) => {
   e.preventDefault();
   const q = inputEl.value.trim();
@@ -87,17 +160,14 @@ formEl.addEventListener("submit", async (e) => {
   appendMessage("user", q);
   inputEl.value = "";
   appendMessage("bot", "Thinking...");
+  const bubble = chatEl.lastChild.querySelector(".bubble");
   try {
-    const resp = await fetch("/api/chat", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ query: q, full: true }),
-    });
-    const data = await resp.json();
-    const bubble = chatEl.lastChild.querySelector(".bubble");
-    bubble.innerHTML = formatAnswer(data.answer || JSON.stringify(data));
+    if (window.ReadableStream && window.TextDecoder) {
+      await askStreaming(q, bubble);
+    } else {
+      await askOnce(q, bubble);
+    }
   } catch (err) {
-    chatEl.lastChild.querySelector(".bubble").textContent =
-      "Error contacting server.";
+    bubble.textContent = "Error contacting server.";
   }
 });
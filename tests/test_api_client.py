@@ -0,0 +1,40 @@
+from api_client import GATEWAY_FALLBACKS, RakutenAIClient
+from benchmarks.stub_gateway import StubState, serve
+from services.concurrency import UpstreamLimiter
+
+
+def test_stream_decodes_utf8_without_charset():
+    server = serve(0, StubState(answer="設定 は ok"))
+    try:
+        client = RakutenAIClient(base_url=f"http://127.0.0.1:{server.server_address[1]}", api_key="x", model="stub")
+        deltas = list(client.chat_stream([{"role": "user", "content": "q"}]))
+    finally:
+        server.shutdown()
+    assert deltas[0] == "設定"
+    assert "".join(deltas) == "設定 は ok"
+
+
+def _fallback_mode(limiter):
+    """Which way the fallback ran for a grounded call made while holding one of ``limiter``'s slots."""
+    server = serve(0, StubState(not_found=True, latency_ms=20))
+    try:
+        client = RakutenAIClient(base_url=f"http://127.0.0.1:{server.server_address[1]}", api_key="x", model="stub")
+        before = {m: GATEWAY_FALLBACKS.value(mode=m) for m in ("serial", "speculative")}
+        answer = limiter.run(lambda: client.chat_with_fallback(
+            [{"role": "user", "content": "Question: q"}], [{"role": "user", "content": "q"}],
+            needs_fallback=lambda a: a.startswith("Not found"), speculative=True, fallback_slot=limiter.try_acquire,
+        ))
+    finally:
+        server.shutdown()
+    assert answer.startswith("stub answer")
+    assert limiter.active == 0
+    (mode,) = [m for m, n in before.items() if GATEWAY_FALLBACKS.value(mode=m) > n]
+    return mode
+
+
+def test_speculative_fallback_takes_its_own_slot():
+    assert _fallback_mode(UpstreamLimiter(2)) == "speculative"
+
+
+def test_speculation_is_dropped_when_no_slot_is_free():
+    assert _fallback_mode(UpstreamLimiter(1)) == "serial"
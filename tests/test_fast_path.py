@@ -0,0 +1,27 @@
+import pytest
+
+from services.fast_path import is_compare_query
+
+
+@pytest.mark.parametrize("query", [
+    "compare pre and post",
+    "What changed between pre and post?",
+    "what are the differences between the before and after files",
+    "diff pre vs post xml",
+    "Show me all changes in post",
+])
+def test_pre_post_comparisons_take_the_fast_path(query):
+    assert is_compare_query(query)
+
+
+@pytest.mark.parametrize("query", [
+    "what is the difference between RadioObj 7 and RadioObj 8",
+    "difference between earfcnDl and earfcnUl",
+    "change pci to 5",
+    "what changes if I lock the cell",
+    "what changed in pci between pre and post",
+    "compare",
+    "pci of cell 3",
+])
+def test_other_questions_fall_through(query):
+    assert not is_compare_query(query)
@@ -0,0 +1,41 @@
+import xml.etree.ElementTree as ET
+
+from services.mo_tree import build_mo_tree, diff_mo_trees
+from services.param_index import leaf_name
+
+
+def _cell(events, rep=("1", "2")):
+    body = "".join(
+        f"<event><eventId>{e}</eventId><hysteresis>{h}</hysteresis></event>" for e, h in events
+    )
+    reps = "".join(f"<rep>{r}</rep>" for r in rep)
+    return build_mo_tree(ET.fromstring(
+        f'<EUtranCellFDD id="Sec1"><attributes><pci>7</pci>{reps}'
+        f"<triggerType>{body}</triggerType></attributes></EUtranCellFDD>"
+    ))
+
+
+EVENTS = [(f"B{i}", str(i)) for i in range(8)]
+
+
+def test_inserted_list_entry_is_one_addition():
+    post = EVENTS[:1] + [("A3", "9")] + EVENTS[1:]
+    diffs = list(diff_mo_trees(_cell(EVENTS), _cell(post)))
+    assert len(diffs) == 1
+    (d,) = diffs
+    assert d["param"] == "triggerType/event" and d["pre"] is None
+    assert d["post"] == "eventId=A3, hysteresis=9"
+
+
+def test_list_entries_compare_by_content():
+    assert list(diff_mo_trees(_cell(EVENTS), _cell(EVENTS[::-1]))) == []
+    changed = EVENTS[:3] + [("B3", "5")] + EVENTS[4:]
+    (d,) = diff_mo_trees(_cell(EVENTS), _cell(changed))
+    assert (d["pre"], d["post"]) == ("eventId=B3, hysteresis=3", "eventId=B3, hysteresis=5")
+    (d,) = diff_mo_trees(_cell(EVENTS, rep=("1", "1")), _cell(EVENTS, rep=("1",)))
+    assert (d["param"], d["pre"], d["post"]) == ("rep", "1", None)
+
+
+def test_repeated_leaf_names_strip_entry_suffix():
+    names = [n for n in _cell(EVENTS).params if n.startswith("rep")]
+    assert len(names) == 2 and {leaf_name(n) for n in names} == {"rep"}
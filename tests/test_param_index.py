@@ -0,0 +1,42 @@
+from services.param_index import ParamIndex
+
+DUMP = """<?xml version="1.0" encoding="UTF-8"?>
+<bulkCmConfigDataFile><configData>
+<SubNetwork id="ANIEMS"><ManagedElement id="n1"><ENBFunction id="n1">
+  <RadioObj id="7">
+    <attributes><adminState>locked</adminState></attributes>
+    <RadioExternalAlarm id="1"><attributes><adminState>enabled</adminState></attributes></RadioExternalAlarm>
+    <RadioExternalAlarm id="2"><attributes><adminState>enabled</adminState></attributes></RadioExternalAlarm>
+  </RadioObj>
+  <RadioObj id="8">
+    <attributes><radioType>radio-nokia</radioType></attributes>
+    <RadioExternalAlarm id="1"><attributes><adminState>enabled</adminState></attributes></RadioExternalAlarm>
+  </RadioObj>
+  <EUtranCellFDD id="Sec1">
+    <attributes><pci>286</pci></attributes>
+    <LTEService id="Sec1">
+      <EUtranNeighbourCell id="594"><attributes><pci>485</pci></attributes></EUtranNeighbourCell>
+      <EUtranNeighbourCell id="772"><attributes><pci>499</pci></attributes></EUtranNeighbourCell>
+    </LTEService>
+  </EUtranCellFDD>
+</ENBFunction></ManagedElement></SubNetwork>
+</configData></bulkCmConfigDataFile>
+"""
+
+
+def _index(tmp_path):
+    pre, post = tmp_path / "pre.xml", tmp_path / "post.xml"
+    pre.write_text(DUMP)
+    post.write_text(DUMP)
+    return ParamIndex.build(str(pre), str(post))
+
+
+def test_named_mo_rows_outrank_its_descendants(tmp_path):
+    index = _index(tmp_path)
+    assert index.resolve("adminState of RadioObj 7") == "RadioObj=7 adminState: locked (pre and post)"
+    assert index.resolve("pci of cell Sec1") == "EUtranCellFDD=Sec1 pci: 286 (pre and post)"
+
+
+def test_descendant_rows_when_the_named_mo_has_none(tmp_path):
+    answer = _index(tmp_path).resolve("adminState of RadioObj 8")
+    assert answer == "RadioObj=8,RadioExternalAlarm=1 adminState: enabled (pre and post)"
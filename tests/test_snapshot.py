@@ -0,0 +1,82 @@
+import os
+import shutil
+
+from rag.indexer import RAGIndexer
+from rag.snapshot import load_snapshot
+
+
+def _pair(tmp_path):
+    pre, post = tmp_path / "pre.xml", tmp_path / "post.xml"
+    shutil.copy("pre.xml", pre)
+    shutil.copy("post.xml", post)
+    return str(pre), str(post)
+
+
+def test_truncated_snapshot_is_rebuilt(tmp_path):
+    pre, post = _pair(tmp_path)
+    cache = str(tmp_path / "cache")
+    RAGIndexer(800).load_or_build(pre, post, cache)
+    (path,) = [os.path.join(cache, n) for n in os.listdir(cache)]
+    size = os.path.getsize(path)
+    for cut in (size - 8, size // 2, 200):  # past any trailing padding, mid-sections, mid-header
+        with open(path, "r+b") as f:
+            f.truncate(cut)
+        assert load_snapshot(path) is None
+        indexer = RAGIndexer(800)
+        assert indexer.load_or_build(pre, post, cache) is False
+        assert indexer.top_k("EUtranCellFDD", 3)
+        assert load_snapshot(path) is not None
+
+
+def test_superseded_snapshots_are_removed(tmp_path):
+    pre, post = _pair(tmp_path)
+    cache = str(tmp_path / "cache")
+    RAGIndexer(800).load_or_build(pre, post, cache)
+    first = os.listdir(cache)
+    with open(post, "a") as f:
+        f.write("\n")
+    RAGIndexer(800).load_or_build(pre, post, cache)
+    second = os.listdir(cache)
+    assert len(second) == 1 and second != first
+
+
+def test_unreadable_cache_dir_falls_back_to_a_build(tmp_path):
+    pre, post = _pair(tmp_path)
+    cache = tmp_path / "cache"
+    cache.write_text("not a directory")
+    indexer = RAGIndexer(800)
+    assert indexer.load_or_build(pre, post, str(cache)) is False
+    assert indexer.top_k("EUtranCellFDD", 3)
+    assert load_snapshot(str(tmp_path)) is None  # a directory, not a snapshot
+    empty = tmp_path / "empty.idx"
+    empty.write_bytes(b"")
+    assert load_snapshot(str(empty)) is None
+
+
+def _truncate(path):
+    with open(path, "r+b") as f:
+        f.truncate(100)
+
+
+def test_index_without_a_snapshot_survives_truncated_sources(tmp_path):
+    pre, post = _pair(tmp_path)
+    cache = tmp_path / "cache"
+    cache.write_text("not a directory")
+    indexer = RAGIndexer(800)
+    indexer.load_or_build(pre, post, str(cache))
+    _truncate(pre)
+    _truncate(post)
+    chunks = indexer.top_k("EUtranCellFDD", 3)
+    assert chunks and all(c.text for c in chunks)
+
+
+def test_full_refresh_serves_from_its_snapshot(tmp_path):
+    pre, post = _pair(tmp_path)
+    cache = str(tmp_path / "cache")
+    indexer = RAGIndexer(800)
+    indexer.refresh(pre, post, cache)  # nothing indexed yet: a full build
+    assert indexer.digest == indexer.content_digest(pre, post)
+    assert load_snapshot(os.path.join(cache, f"{indexer.digest}.idx")) is not None
+    _truncate(pre)
+    _truncate(post)
+    assert indexer.top_k("EUtranCellFDD", 3)